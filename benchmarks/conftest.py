@@ -0,0 +1,35 @@
+import pytest
+from emulator import YatickerVirtual
+
+from yaticker import sinks
+from yaticker.providers import ReplayProvider, YFinanceProvider
+from yaticker.yaticker import YaTicker
+
+# (period, interval) of the data: the dashboard default, and a long intraday chart
+DATA_SIZES = {"5d-1h": ("5d", "1h"), "5d-1m": ("5d", "1m")}
+
+
+@pytest.fixture
+def replay():
+    """Offline, deterministic data for every fetch of the benchmark"""
+    provider = ReplayProvider()
+    YaTicker.set_provider(provider)
+    YaTicker.invalidate()
+    yield provider
+    YaTicker.invalidate()
+    YaTicker.set_provider(YFinanceProvider())
+
+
+@pytest.fixture(params=list(DATA_SIZES))
+def ohlcv(request, replay):
+    """Synthetic OHLCV bars of AMC, in the sizes of DATA_SIZES"""
+    period, interval = DATA_SIZES[request.param]
+    return replay.history("AMC", period=period, interval=interval)
+
+
+@pytest.fixture
+def dashboard(replay, tmp_path):
+    """Emulated e-paper dashboard keeping its frames in memory"""
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text("watchlist: [AMC]\n")
+    return YatickerVirtual(config_file=str(config_file), sink=sinks.MemorySink())
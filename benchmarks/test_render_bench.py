@@ -0,0 +1,50 @@
+import matplotlib.pyplot as plt
+import pytest
+from util import util
+
+from yaticker.dashboard import Dashboard, FrameRenderer
+
+
+def test_stock_graph(benchmark, ohlcv):
+    image = benchmark(Dashboard.stock_graph, ohlcv)
+    assert (264, 116) == image.size
+
+
+@pytest.mark.parametrize("chart_engine", ["matplotlib", "native"])
+def test_chart_image(benchmark, ohlcv, chart_engine):
+    renderer = FrameRenderer(264, 176, chart_engine=chart_engine)
+    image = benchmark(renderer.chart_image, ohlcv)
+    assert (264, 116) == image.size
+
+
+def test_set_size(benchmark, ohlcv):
+    fig, ax = plt.subplots()
+    ax.plot(ohlcv["Close"].to_numpy())
+    try:
+        # size in inches of a 264x116 pixels chart, as saved with a tight bounding box
+        converged = benchmark(util.set_size, fig, (264 / 117, 116 / 117), dpi=117)
+    finally:
+        plt.close(fig)
+    assert converged
+
+
+def test_render_stock(benchmark, dashboard, ohlcv):
+    stock_info = {"previousClose": float(ohlcv["Close"].iloc[0])}
+    image = benchmark(dashboard.render_stock, "AMC", stock_info, ohlcv)
+    assert (264, 176) == image.size
+
+
+def test_display_stock(benchmark, dashboard):
+    # fetch (cached after the first round), render and output to the sink
+    benchmark(dashboard.display_stock, "AMC", period="5d", interval="1h")
+    assert dashboard.sink.frames > 0
+
+
+@pytest.mark.parametrize(
+    "place", [util.place_text, util.place_text_right, util.place_centered_text]
+)
+def test_place_text(benchmark, place):
+    image = util.empty_image(264, 176)
+    benchmark(
+        place, img=image, text="$1,234.56", font_size=48, font_name="Roboto-Medium"
+    )
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import yaticker
+
+# entry points of setup.py, by module
+ENTRY_POINTS = ["cli", "yaticker.yaticker", "emulator"]
+
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_startup(benchmark, module):
+    """Starts a new interpreter importing the entry point, as the console scripts do"""
+    package_parent = os.path.dirname(os.path.dirname(yaticker.__file__))
+
+    def start():
+        subprocess.run(
+            [sys.executable, "-c", f"import {module}"], cwd=package_parent, check=True
+        )
+
+    benchmark.pedantic(start, rounds=5, warmup_rounds=1)
@@ -0,0 +1,66 @@
+from concurrent import futures
+from wsgiref.util import setup_testing_defaults
+
+import bottle
+import pytest
+
+from yaticker import formats
+
+# concurrent clients of the /ticker route, and requests sent by each
+CLIENTS = 8
+REQUESTS = 10
+
+
+def call(path):
+    """Calls the web app, returns the body"""
+    environ = {}
+    setup_testing_defaults(environ)
+    environ["PATH_INFO"], _, environ["QUERY_STRING"] = path.partition("?")
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = status
+
+    body = b"".join(bottle.default_app()(environ, start_response))
+    assert response["status"].startswith("200"), body
+    return body
+
+
+@pytest.mark.parametrize("serialize", [formats.to_index_json, formats.to_columns_json])
+def test_serialize(benchmark, ohlcv, serialize):
+    benchmark(serialize, ohlcv)
+
+
+def test_fetch(benchmark, replay):
+    from yaticker.yaticker import YaTicker
+
+    def fetch():
+        # every round misses the cache
+        YaTicker.invalidate()
+        return YaTicker.get_ticker_data(ticker="AMC", period="5d", interval="1m")
+
+    benchmark(fetch)
+
+
+@pytest.mark.parametrize("query", ["", "&format=columns"])
+def test_ticker_route_concurrent(benchmark, replay, query):
+    # the route is registered when the module is imported
+    from yaticker.yaticker import YaTicker  # noqa: F401
+
+    paths = [
+        f"/ticker/{symbol}?period=5d&interval=1m{query}"
+        for symbol in ("amc", "gme", "amzn", "fb")
+    ]
+    executor = futures.ThreadPoolExecutor(max_workers=CLIENTS)
+
+    def clients():
+        def client(number):
+            for request in range(REQUESTS):
+                call(paths[(number + request) % len(paths)])
+
+        list(executor.map(client, range(CLIENTS)))
+
+    try:
+        benchmark(clients)
+    finally:
+        executor.shutdown()
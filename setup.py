@@ -31,6 +31,8 @@ setup(
     keywords="web-app terminal-app finance stocks crypto ticker",
     package_dir={"": "yaticker"},
     packages=find_packages(where="yaticker"),
+    # the entry points, next to the packages
+    py_modules=["cli", "emulator", "epaper"],
     python_requires=">=3.8, <4",
     install_requires=[
         "requests>=2.25.1",
@@ -46,8 +48,15 @@ setup(
     extras_require={
         "dev": ["check-manifest"],
         "test": ["coverage"],
+        "formats": ["msgpack", "pyarrow"],
+    },
+    entry_points={
+        "console_scripts": [
+            "yaticker=cli:cli",
+            "yaticker-web=yaticker.yaticker:main",
+            "yaticker-emulator=emulator:main",
+        ]
     },
-    entry_points={"console_scripts": ["yaticker=cli:main"]},
     project_urls={
         "Bug Reports": "https://github.com/sebasrp/yaticker/issues",
         "Source": "https://github.com/sebasrp/yaticker",
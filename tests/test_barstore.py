@@ -0,0 +1,71 @@
+import unittest
+
+import pandas as pd
+
+from yaticker import barstore
+
+
+def bars(start, periods, freq="1min", close=None):
+    index = pd.date_range(start, periods=periods, freq=freq, tz="America/New_York")
+    close = close if close is not None else list(range(periods))
+    return pd.DataFrame({"Close": close}, index=index)
+
+
+class TestBarStore(unittest.TestCase):
+    def test_merge_bars_overwrites_last_bar(self):
+        known = bars("2021-06-24 10:00", 3, close=[1, 2, 3])
+        new = bars("2021-06-24 10:02", 2, close=[4, 5])
+        merged = barstore.merge_bars(known, new)
+        self.assertListEqual([1, 2, 4, 5], list(merged["Close"]))
+
+    def test_merge_bars_empty(self):
+        known = bars("2021-06-24 10:00", 3)
+        self.assertIs(known, barstore.merge_bars(known, known.iloc[0:0]))
+
+    def test_trim_bars_minutes(self):
+        trimmed = barstore.trim_bars(bars("2021-06-24 10:00", 10), "5m")
+        self.assertEqual(5, len(trimmed))
+
+    def test_trim_bars_trading_days(self):
+        daily = bars("2021-06-20", 10, freq="1D")
+        self.assertEqual(2, len(barstore.trim_bars(daily, "2d")))
+        self.assertEqual(10, len(barstore.trim_bars(daily, "max")))
+
+    def test_update_fetches_tail_only(self):
+        calls = []
+        now = pd.Timestamp.now(tz="America/New_York").floor("min")
+
+        def fetch(period=None, start=None):
+            calls.append((period, start))
+            if start is None:
+                return bars(now - pd.Timedelta(minutes=9), 10)
+            start = pd.Timestamp(start, unit="s", tz="UTC").tz_convert(
+                "America/New_York"
+            )
+            return bars(start, 2, close=[100, 101])
+
+        store = barstore.BarStore()
+        self.assertEqual(10, len(store.update("amzn", "10m", "1m", fetch)))
+        updated = store.update("AMZN", "10m", "1m", fetch)
+        self.assertEqual(("10m", None), calls[0])
+        # yfinance is given the POSIX timestamp of the last known bar
+        self.assertEqual((None, int(now.timestamp())), calls[1])
+        self.assertEqual(10, len(updated))
+        self.assertListEqual([100, 101], list(updated["Close"][-2:]))
+
+    def test_update_longer_period_refetches(self):
+        calls = []
+        now = pd.Timestamp.now(tz="America/New_York").floor("min")
+
+        def fetch(period=None, start=None):
+            calls.append((period, start))
+            return bars(now - pd.Timedelta(minutes=9), 10)
+
+        store = barstore.BarStore()
+        store.update("AMZN", "5m", "1m", fetch)
+        store.update("AMZN", "10m", "1m", fetch)
+        self.assertListEqual([("5m", None), ("10m", None)], calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
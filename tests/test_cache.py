@@ -0,0 +1,138 @@
+import threading
+import time
+import unittest
+from concurrent import futures
+
+from yaticker import cache, periods
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return predicate()
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.cache = cache.TTLCache(maxsize=2, timer=self.timer)
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get("foo"))
+        self.assertEqual(1, self.cache.stats["misses"])
+
+    def test_get_fresh(self):
+        self.cache.set("foo", 1, ttl=10)
+        self.timer.now = 9
+        self.assertEqual(1, self.cache.get("foo"))
+        self.assertEqual(1, self.cache.stats["hits"])
+
+    def test_get_expired(self):
+        self.cache.set("foo", 1, ttl=10)
+        self.timer.now = 10
+        self.assertIsNone(self.cache.get("foo"))
+        self.assertNotIn("foo", self.cache)
+
+    def test_lru_eviction(self):
+        self.cache.set("foo", 1, ttl=10)
+        self.cache.set("bar", 2, ttl=10)
+        self.cache.get("foo")
+        self.cache.set("baz", 3, ttl=10)
+        self.assertIn("foo", self.cache)
+        self.assertNotIn("bar", self.cache)
+        self.assertEqual(1, self.cache.stats["evictions"])
+
+    def test_get_or_load(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return "value"
+
+        self.assertEqual("value", self.cache.get_or_load("foo", loader, ttl=10))
+        self.assertEqual("value", self.cache.get_or_load("foo", loader, ttl=10))
+        self.assertEqual(1, len(calls))
+
+    def test_get_or_load_coalesced(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "value"
+
+        with futures.ThreadPoolExecutor(max_workers=4) as executor:
+            leader = executor.submit(self.cache.get_or_load, "foo", loader, 10)
+            started.wait(5)
+            followers = [
+                executor.submit(self.cache.get_or_load, "foo", loader, 10)
+                for _ in range(3)
+            ]
+            wait_until(lambda: self.cache.stats["coalesced"] == 3)
+            release.set()
+            results = [f.result(5) for f in [leader] + followers]
+        self.assertListEqual(["value"] * 4, results)
+        self.assertEqual(1, len(calls))
+
+    def test_get_or_load_error_shared(self):
+        def loader():
+            raise ConnectionError("offline")
+
+        self.assertRaises(ConnectionError, self.cache.get_or_load, "foo", loader, 10)
+        self.assertNotIn("foo", self.cache)
+
+    def test_get_or_load_stale_while_revalidate(self):
+        refreshed = threading.Event()
+
+        def loader():
+            refreshed.set()
+            return "new"
+
+        self.cache.set("foo", "old", ttl=10)
+        self.timer.now = 15
+        value = self.cache.get_or_load("foo", loader, ttl=10, stale_ttl=10)
+        self.assertEqual("old", value)
+        self.assertTrue(refreshed.wait(5))
+        self.assertTrue(wait_until(lambda: self.cache.get("foo") == "new"))
+        self.assertEqual(1, self.cache.stats["stale_hits"])
+
+    def test_get_or_load_too_stale(self):
+        self.cache.set("foo", "old", ttl=10)
+        self.timer.now = 25
+        value = self.cache.get_or_load("foo", lambda: "new", ttl=10, stale_ttl=10)
+        self.assertEqual("new", value)
+
+    def test_invalidate(self):
+        self.cache.set(("data", "FOO"), 1, ttl=10)
+        self.cache.set(("data", "BAR"), 2, ttl=10)
+        self.assertTrue(self.cache.invalidate(("data", "FOO")))
+        self.assertFalse(self.cache.invalidate(("data", "FOO")))
+        self.assertEqual(1, self.cache.invalidate_if(lambda key: key[1] == "BAR"))
+        self.assertEqual(0, len(self.cache))
+
+    def test_data_ttl(self):
+        self.assertEqual(60, cache.data_ttl("1m"))
+        self.assertEqual(cache.MAX_DATA_TTL, cache.data_ttl("1d"))
+        self.assertEqual(cache.MAX_DATA_TTL, cache.data_ttl("max"))
+
+    def test_to_seconds(self):
+        self.assertEqual(60, periods.to_seconds("1m"))
+        self.assertEqual(86400, periods.to_seconds("1440m"))
+        self.assertEqual(3 * 30 * 86400, periods.to_seconds("3mo"))
+        self.assertRaises(ValueError, periods.to_seconds, "ytd")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from yaticker.chart import ChartRenderer
+from yaticker.dashboard import Dashboard
+from yaticker.providers import ReplayProvider
+
+
+class TestChart(unittest.TestCase):
+    def setUp(self):
+        self.provider = ReplayProvider()
+
+    def test_render_exact_size(self):
+        data = self.provider.history("AMC", interval="1m", period="1d")
+        for show_volume in (False, True):
+            renderer = ChartRenderer(width=200, height=100, show_volume=show_volume)
+            image = renderer.render(data)
+            self.assertEqual("L", image.mode)
+            self.assertEqual((200, 100), image.size)
+
+    def test_render_reuses_figure(self):
+        renderer = ChartRenderer(show_volume=True)
+        figure = renderer._figure
+        figures = plt.get_fignums()
+        first = renderer.render(
+            self.provider.history("AMC", interval="1h", period="5d")
+        )
+        second = renderer.render(
+            self.provider.history("GME", interval="1h", period="5d")
+        )
+        self.assertIs(figure, renderer._figure)
+        self.assertEqual(2, len(figure.axes))
+        self.assertEqual(1, len(renderer._price_axes.lines))
+        self.assertListEqual(figures, plt.get_fignums())
+        self.assertFalse(np.array_equal(np.asarray(first), np.asarray(second)))
+
+    def test_render_is_stable(self):
+        renderer = ChartRenderer()
+        data = self.provider.history("AMC", interval="1h", period="5d")
+        first = np.asarray(renderer.render(data))
+        renderer.render(self.provider.history("GME", interval="1m", period="1d"))
+        self.assertTrue(np.array_equal(first, np.asarray(renderer.render(data))))
+
+    def test_render_flat_data(self):
+        data = self.provider.history("AMC", interval="1h", period="5d")
+        data["Close"] = 1.0
+        image = ChartRenderer().render(data)
+        self.assertEqual((264, 116), image.size)
+
+    def test_render_long_labels(self):
+        data = self.provider.history("AMC", interval="1h", period="5d")
+        for price in (90000, 0.0096):
+            prices = data.copy()
+            prices["Close"] *= price / prices["Close"].max()
+            for show_volume in (False, True):
+                for image in (
+                    ChartRenderer(show_volume=show_volume).render(prices),
+                    Dashboard.stock_graph(prices, show_volume=show_volume),
+                ):
+                    # the price labels are not clipped by the left edge
+                    self.assertEqual(255, np.asarray(image)[:, 0].min(), price)
+
+
+if __name__ == "__main__":
+    unittest.main()
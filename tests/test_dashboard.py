@@ -1,12 +1,16 @@
 import os
 import pathlib
+import pickle
+import tempfile
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
+import matplotlib.pyplot as plt
 import yaml
-from PIL import Image
 
-from yaticker.dashboard import Dashboard
+from yaticker import metrics
+from yaticker.dashboard import Dashboard, FrameRenderer
+from yaticker.providers import ReplayProvider, YFinanceProvider
 from yaticker.yaticker import YaTicker
 
 
@@ -39,8 +43,53 @@ class TestUtil(unittest.TestCase):
         self.assertEqual(300, dashboard.update_frequency)
         self.assertEqual(False, dashboard.show_volume)
         self.assertEqual("5d", dashboard.period)
+        self.assertEqual("1h", dashboard.interval)
+        self.assertEqual(False, dashboard.batch_fetch)
+        self.assertEqual(False, dashboard.incremental)
+        self.assertEqual("yfinance", dashboard.provider)
+        self.assertEqual(0, dashboard.prefetch)
+        self.assertEqual("matplotlib", dashboard.chart_engine)
+        self.assertEqual(False, dashboard.pipeline)
+        self.assertEqual(0, dashboard.render_processes)
+        self.assertEqual(True, dashboard.partial_refresh)
+        self.assertEqual(10, dashboard.full_refresh)
+        self.assertEqual(60, dashboard.sleep_timeout)
+        self.assertEqual(False, dashboard.metrics_enabled)
+        self.assertEqual(600, dashboard.metrics_interval)
         self.assertEqual(["AMZN", "FB", "APPL"], dashboard.watchlist)
 
+    @patch.object(Dashboard, "__abstractmethods__", set())
+    def test_settings_lines(self):
+        dashboard = Dashboard(width=264, height=176, dpi=117)
+        # only the main settings when nothing else changed
+        self.assertEqual(10, len(dashboard.settings_lines()))
+        dashboard._prefetch = 3
+        dashboard._chart_engine = "native"
+        lines = dashboard.settings_lines()
+        self.assertListEqual(["prefetch: 3", "chart: native"], lines[10:])
+        dashboard._partial_refresh = False
+        dashboard._metrics = True
+        dashboard.display_image = Mock()
+        with patch("yaticker.dashboard.util.place_text") as place_text:
+            dashboard.display_settings()
+        # too many lines for a column: the rest is on the right half
+        columns = [call.kwargs for call in place_text.call_args_list]
+        self.assertListEqual([0, 132], [column["x_offset"] for column in columns])
+        self.assertIn("metrics: True", columns[1]["text"])
+        dashboard.display_image.assert_called_once()
+
+    @patch.object(Dashboard, "__abstractmethods__", set())
+    def test_replay_dir_expanded(self):
+        self.addCleanup(YaTicker.set_provider, YFinanceProvider())
+        config = {"provider": "replay", "replaydir": "~/replay"}
+        with tempfile.TemporaryDirectory() as home, patch.dict(
+            os.environ, {"HOME": home}
+        ), patch.object(Dashboard, "load_config", return_value=config):
+            Dashboard(width=264, height=176, dpi=117)
+            replay_dir = os.path.join(home, "replay")
+            self.assertEqual(replay_dir, YaTicker.provider._directory)
+            self.assertTrue(os.path.isdir(replay_dir))
+
     def test_load_config(self):
         expected_config = self.config_dict
         actual_config = Dashboard.load_config(self.TEST_CONFIG_NAME)
@@ -52,15 +101,96 @@ class TestUtil(unittest.TestCase):
         self.assertDictEqual(expected_config, actual_config)
 
     def test_stock_graph_resolution(self):
+        YaTicker.set_provider(ReplayProvider())
+        self.addCleanup(YaTicker.set_provider, YFinanceProvider())
         data = YaTicker.get_ticker_data(ticker="amc", period="5d", interval="1h")
-        stock_image = Image.open(
-            Dashboard.stock_graph(data, filename="test_candle.png")
-        )
+        stock_image = Dashboard.stock_graph(data)
         width, height = stock_image.size
         print(f"directory: {pathlib.Path().absolute()}")
         self.assertAlmostEqual(264, width, delta=1)
         self.assertAlmostEqual(116, height, delta=1)
 
+    def test_stock_graph_exact_size(self):
+        data = ReplayProvider().history("AMC", interval="1m", period="1d")
+        for show_volume in (False, True):
+            stock_image = Dashboard.stock_graph(
+                data, show_volume=show_volume, width=200, height=100
+            )
+            self.assertEqual((200, 100), stock_image.size)
+
+    def test_stock_graph_in_memory(self):
+        data = ReplayProvider().history("AMC", interval="1h", period="5d")
+        figures = plt.get_fignums()
+        files = set(os.listdir())
+        stock_image = Dashboard.stock_graph(data)
+        self.assertEqual("L", stock_image.mode)
+        self.assertListEqual(figures, plt.get_fignums())
+        self.assertSetEqual(files, set(os.listdir()))
+
+    @patch.object(Dashboard, "__abstractmethods__", set())
+    def test_chart_image_engines(self):
+        data = ReplayProvider().history("AMC", interval="1h", period="5d")
+        for engine in ("matplotlib", "mplfinance", "native"):
+            dashboard = Dashboard(width=264, height=176, dpi=117)
+            dashboard._chart_engine = engine
+            stock_image = dashboard.chart_image(data)
+            self.assertEqual((264, 116), stock_image.size)
+
+    @patch.object(Dashboard, "__abstractmethods__", set())
+    def test_schedule_watchlist(self):
+        dashboard = Dashboard(width=264, height=176, dpi=117)
+        loop = Mock()
+        dashboard.schedule_watchlist(loop)
+        loop.call_every.assert_called_once_with(
+            300, loop.submit, dashboard.display_next_stock, delay=0
+        )
+        dashboard._cycle = False
+        self.assertIsNone(dashboard.schedule_watchlist(loop))
+        loop.submit.assert_called_once_with(dashboard.display_next_stock)
+
+    @patch.object(Dashboard, "__abstractmethods__", set())
+    def test_schedule_watchlist_pipeline(self):
+        dashboard = Dashboard(width=264, height=176, dpi=117)
+        dashboard._pipeline = True
+        stages = Mock()
+        loop = Mock()
+        with patch.object(Dashboard, "start_display_pipeline", return_value=stages):
+            dashboard.schedule_watchlist(loop)
+            dashboard.schedule_watchlist(loop)
+        loop.on_stop.assert_called_once_with(dashboard._stop_pipeline)
+        self.assertEqual(2, stages.cancel.call_count)
+        loop.call_every.assert_called_with(300, dashboard.submit_next_stock, delay=0)
+        dashboard.submit_next_stock()
+        stages.submit.assert_called_once_with("AMZN", replace_oldest=True)
+
+    @patch.object(Dashboard, "__abstractmethods__", set())
+    def test_schedule_metrics(self):
+        dashboard = Dashboard(width=264, height=176, dpi=117)
+        loop = Mock()
+        self.assertIsNone(dashboard.schedule_metrics(loop))
+        dashboard._metrics = True
+        dashboard.schedule_metrics(loop)
+        loop.call_every.assert_called_once_with(600, metrics.registry.log_summary)
+
+    def test_frame_renderer_pickle(self):
+        renderer = FrameRenderer(264, 176, show_volume=True, chart_engine="native")
+        data = ReplayProvider().history("AMC", interval="1h", period="5d")
+        renderer.chart_image(data)
+        copy = pickle.loads(pickle.dumps(renderer))
+        self.assertEqual(renderer.settings, copy.settings)
+        self.assertEqual(
+            renderer.chart_image(data).tobytes(), copy.chart_image(data).tobytes()
+        )
+
+    def test_chart_layout(self):
+        Dashboard.chart_layout.cache_clear()
+        price, volume = Dashboard.chart_layout(264, 116, 117, show_volume=True)
+        self.assertEqual(price[0], volume[0])
+        self.assertGreater(price[1], volume[1] + volume[3])
+        self.assertLessEqual(price[1] + price[3], 1)
+        Dashboard.chart_layout(264, 116, 117, show_volume=True)
+        self.assertEqual(1, Dashboard.chart_layout.cache_info().hits)
+
 
 if __name__ == "__main__":
     unittest.main()
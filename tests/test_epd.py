@@ -0,0 +1,177 @@
+import threading
+import time
+import unittest
+
+from PIL import Image, ImageDraw
+
+from yaticker import epd
+
+
+class FakeDriver(epd.Driver):
+    """Records the refreshes instead of driving a panel"""
+
+    FAST = True
+    PARTIAL = True
+
+    def __init__(self):
+        self.refreshes = []
+        self.sleeps = 0
+        # cleared to hold the refreshes, like a slow panel
+        self.ready = threading.Event()
+        self.ready.set()
+
+    def full(self, image):
+        self.ready.wait()
+        self.refreshes.append((epd.FULL, None))
+
+    def fast(self, image):
+        self.refreshes.append((epd.FAST, None))
+
+    def partial(self, image, box):
+        self.refreshes.append((epd.PARTIAL, box))
+
+    def sleep(self):
+        self.sleeps += 1
+
+
+def frame(price="$12.34", line=0):
+    image = Image.new("1", (264, 176), 255)
+    draw = ImageDraw.Draw(image)
+    draw.line((0, 100 - line, 263, line), fill=0)
+    draw.text((150, 130), price, fill=0)
+    return image
+
+
+class TestEPD(unittest.TestCase):
+    def test_dirty_box(self):
+        self.assertIsNone(epd.dirty_box(frame(), frame()))
+        box = epd.dirty_box(frame(), frame(price="$12.35"))
+        self.assertEqual(0, box[0] % 8)
+        self.assertEqual(0, box[1] % 8)
+        self.assertGreaterEqual(box[0], 144)
+        self.assertGreaterEqual(box[1], 128)
+        self.assertLessEqual(box[2], 264)
+        self.assertLessEqual(box[3], 176)
+
+    def test_update(self):
+        driver = FakeDriver()
+        updater = epd.FrameUpdater(driver)
+        self.assertEqual(epd.FULL, updater.update(frame()))
+        self.assertEqual(epd.SKIP, updater.update(frame()))
+        self.assertEqual(epd.PARTIAL, updater.update(frame(price="$12.35")))
+        self.assertEqual(epd.FAST, updater.update(frame(line=50)))
+        self.assertEqual(3, len(driver.refreshes))
+        _, box = driver.refreshes[1]
+        self.assertEqual(epd.dirty_box(frame(), frame(price="$12.35")), box)
+        self.assertEqual(4, updater.stats["updates"])
+        self.assertEqual(1, updater.stats["skipped"])
+        full_bytes = 264 * 176 // 4
+        partial_bytes = (box[2] - box[0]) * (box[3] - box[1]) // 8
+        self.assertEqual(
+            full_bytes + partial_bytes + full_bytes // 2, updater.stats["bytes"]
+        )
+
+    def test_periodic_full_refresh(self):
+        driver = FakeDriver()
+        updater = epd.FrameUpdater(driver, full_every=3)
+        modes = [updater.update(frame(price=f"${i}")) for i in range(7)]
+        cycle = [epd.FULL, epd.PARTIAL, epd.PARTIAL]
+        self.assertListEqual(cycle * 2 + [epd.FULL], modes)
+
+    def test_partial_disabled(self):
+        updater = epd.FrameUpdater(FakeDriver(), partial_ratio=0)
+        updater.update(frame())
+        self.assertEqual(epd.FAST, updater.update(frame(price="$12.35")))
+
+    def test_full_only_driver(self):
+        driver = FakeDriver()
+        driver.FAST = driver.PARTIAL = False
+        updater = epd.FrameUpdater(driver)
+        updater.update(frame())
+        self.assertEqual(epd.FULL, updater.update(frame(price="$12.35")))
+        self.assertEqual(epd.SKIP, updater.update(frame(price="$12.35")))
+
+    def test_reset(self):
+        updater = epd.FrameUpdater(FakeDriver())
+        updater.update(frame())
+        updater.reset()
+        self.assertIsNone(updater.frame)
+        self.assertEqual(epd.FULL, updater.update(frame()))
+
+
+class TestDisplaySession(unittest.TestCase):
+    def setUp(self):
+        self.driver = FakeDriver()
+        self.keys = []
+        self.session = epd.DisplaySession(
+            epd.FrameUpdater(self.driver),
+            idle_timeout=0.05,
+            on_sleep=lambda: self.keys.append("initialized"),
+        )
+        self.session.start()
+        self.addCleanup(self.session.stop, 5)
+
+    def test_latest_frame_wins(self):
+        self.driver.ready.clear()
+        self.session.show(frame(price="$1"))
+        # the worker is busy with the first frame, the second is superseded
+        time.sleep(0.05)
+        self.session.show(frame(price="$2"))
+        self.session.show(frame(price="$3"))
+        self.driver.ready.set()
+        self.assertTrue(self.session.flush(5))
+        self.assertEqual(2, len(self.driver.refreshes))
+        self.assertEqual(1, self.session.stats["dropped"])
+        self.assertEqual(
+            epd.frame_digest(frame(price="$3")),
+            epd.frame_digest(self.session.updater.frame),
+        )
+
+    def test_show_does_not_block(self):
+        self.driver.ready.clear()
+        start = time.monotonic()
+        self.session.show(frame())
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertFalse(self.session.flush(0.05))
+        self.driver.ready.set()
+        self.assertTrue(self.session.flush(5))
+
+    def test_sleep_when_idle(self):
+        self.session.show(frame())
+        self.session.flush(5)
+        self.assertFalse(self.session.asleep)
+        deadline = time.monotonic() + 5
+        while not self.session.asleep and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(self.session.asleep)
+        self.assertEqual(1, self.driver.sleeps)
+        self.assertListEqual(["initialized"], self.keys)
+        # the panel lost the frame while asleep: no partial refresh
+        self.session.show(frame(price="$12.35"))
+        self.session.flush(5)
+        self.assertEqual(epd.FULL, self.driver.refreshes[-1][0])
+
+    def test_identical_frame_does_not_wake(self):
+        self.session.show(frame())
+        self.session.flush(5)
+        self.session.stop(5)
+        self.assertTrue(self.session.asleep)
+        self.session.start()
+        self.session.show(frame())
+        self.session.flush(5)
+        self.assertTrue(self.session.asleep)
+        self.assertEqual(1, len(self.driver.refreshes))
+
+    def test_stop_pushes_pending_frame(self):
+        self.driver.ready.clear()
+        self.session.show(frame(price="$1"))
+        time.sleep(0.05)
+        self.session.show(frame(price="$2"))
+        self.driver.ready.set()
+        self.session.stop(5)
+        self.assertEqual(2, len(self.driver.refreshes))
+        self.assertEqual(1, self.driver.sleeps)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+from PIL import Image, ImageDraw
+from util import fonts, util
+
+
+class TestFonts(unittest.TestCase):
+    def setUp(self):
+        fonts.cache_clear()
+
+    def test_font_path_default(self):
+        self.assertEqual(
+            fonts.font_path(fonts.DEFAULT_FONT), fonts.font_path("NotAFont-Regular")
+        )
+
+    def test_get_font_cached(self):
+        font = fonts.get_font("Roboto-Medium", 20)
+        self.assertIs(font, fonts.get_font("Roboto-Medium", 20))
+        self.assertIsNot(font, fonts.get_font("Roboto-Medium", 10))
+        self.assertEqual(2, fonts.cache_info()["fonts"].misses)
+
+    def test_text_size(self):
+        width, height = fonts.text_size("Roboto-Medium", 20, "AMC")
+        self.assertGreater(width, 0)
+        self.assertGreater(height, 0)
+        lines_width, lines_height = fonts.text_size("Roboto-Medium", 20, "AMC\nAMC")
+        self.assertEqual(width, lines_width)
+        self.assertGreater(lines_height, height)
+
+    def test_place_text_as_drawn(self):
+        for mode in ("1", "L"):
+            image = Image.new(mode, (100, 50), 255)
+            expected = image.copy()
+            util.place_text(image, "$12.3", 5, 10, 20, "Roboto-Medium")
+            ImageDraw.Draw(expected).text(
+                (5, 10), "$12.3", font=fonts.get_font("Roboto-Medium", 20), fill=0
+            )
+            self.assertTrue(np.array_equal(np.asarray(expected), np.asarray(image)))
+
+    def test_place_text_right_loads_font_once(self):
+        image = util.empty_image(width=264, height=176)
+        for _ in range(3):
+            util.place_text_right(image, "$12.3", font_size=48, font_name="Roboto")
+            util.place_centered_text(image, "AMC", font_size=48, font_name="Roboto")
+        info = fonts.cache_info()
+        self.assertEqual(1, info["fonts"].misses)
+        self.assertEqual(2, info["masks"].misses)
+        self.assertEqual(4, info["masks"].hits)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import unittest
+
+import pandas as pd
+
+from yaticker import formats
+
+
+def bars(periods=6):
+    index = pd.date_range(
+        "2021-06-24 10:00", periods=periods, freq="1min", tz="America/New_York"
+    )
+    return pd.DataFrame(
+        {
+            "Open": [float(i) for i in range(periods)],
+            "High": [float(i + 1) for i in range(periods)],
+            "Low": [float(i - 1) for i in range(periods)],
+            "Close": [float(i) + 0.5 for i in range(periods)],
+            "Volume": [10] * periods,
+        },
+        index=index,
+    )
+
+
+class TestFormats(unittest.TestCase):
+    def test_select_columns(self):
+        selected = formats.select_columns(bars(), ["close", "Volume"])
+        self.assertListEqual(["Close", "Volume"], list(selected.columns))
+        self.assertRaises(ValueError, formats.select_columns, bars(), ["foo"])
+
+    def test_parse_timestamp(self):
+        expected = pd.Timestamp("2021-06-24 14:01", tz="UTC")
+        self.assertEqual(expected, formats.parse_timestamp("1624543260"))
+        self.assertEqual(expected, formats.parse_timestamp("2021-06-24T14:01Z"))
+        self.assertEqual(
+            expected, formats.parse_timestamp("2021-06-24 10:01", "America/New_York")
+        )
+        self.assertRaises(ValueError, formats.parse_timestamp, "foo")
+
+    def test_since(self):
+        since = formats.parse_timestamp("2021-06-24 10:03", "America/New_York")
+        self.assertEqual(2, len(formats.since(bars(), since)))
+
+    def test_downsample(self):
+        downsampled = formats.downsample(bars(), 2)
+        self.assertListEqual([0.0, 3.0], list(downsampled["Open"]))
+        self.assertListEqual([3.0, 6.0], list(downsampled["High"]))
+        self.assertListEqual([-1.0, 2.0], list(downsampled["Low"]))
+        self.assertListEqual([2.5, 5.5], list(downsampled["Close"]))
+        self.assertListEqual([30, 30], list(downsampled["Volume"]))
+        self.assertListEqual(
+            [bars().index[0], bars().index[3]], list(downsampled.index)
+        )
+        self.assertEqual(6, len(formats.downsample(bars(), 10)))
+        self.assertRaises(ValueError, formats.downsample, bars(), 0)
+
+    def test_to_columns_json(self):
+        data = bars(2)
+        data.iloc[1, 0] = float("nan")
+        columns = json.loads(formats.to_columns_json(data))
+        self.assertListEqual([1624543200000, 1624543260000], columns["timestamp"])
+        self.assertListEqual([0.0, None], columns["Open"])
+
+    def test_to_csv(self):
+        self.assertEqual(7, len(formats.to_csv(bars()).splitlines()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+
+import pandas as pd
+
+from yaticker import barstore, history
+
+
+def bars(start, periods):
+    index = pd.date_range(start, periods=periods, freq="1min", tz="America/New_York")
+    return pd.DataFrame(
+        {"Close": [float(i) for i in range(periods)], "Volume": range(periods)},
+        index=index,
+    )
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = history.HistoryStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_missing(self):
+        self.assertIsNone(self.store.load("AMZN", "1m"))
+
+    def test_save_load(self):
+        expected = bars("2021-06-24 10:00", 5)
+        self.store.save("amzn", "1m", expected, "1d")
+        actual, period = self.store.load("AMZN", "1m")
+        self.assertEqual("1d", period)
+        self.assertListEqual(list(expected.index), list(actual.index))
+        self.assertEqual("America/New_York", str(actual.index.tz))
+        self.assertListEqual(list(expected["Close"]), list(actual["Close"]))
+        self.assertListEqual(list(expected["Volume"]), list(actual["Volume"]))
+
+    def test_delete(self):
+        self.store.save("AMZN", "1m", bars("2021-06-24 10:00", 5), "1d")
+        self.store.delete("AMZN", "1m")
+        self.assertIsNone(self.store.load("AMZN", "1m"))
+
+    def test_mismatching_files_are_a_miss(self):
+        self.store.save("AMZN", "1m", bars("2021-06-24 10:00", 5), "1d")
+        # a crash between the two replaces leaves the sidecar of the previous bars
+        with open(self.store._path("AMZN", "1m", "json"), "w") as f:
+            f.write('{"columns": ["Close"], "tz": null, "period": "1d"}')
+        self.assertIsNone(self.store.load("AMZN", "1m"))
+
+    def test_bar_store_warm_start_and_offline(self):
+        now = pd.Timestamp.now(tz="America/New_York").floor("min")
+        stored = bars(now - pd.Timedelta(minutes=9), 10)
+        self.store.save("AMZN", "1m", stored, "10m")
+
+        def offline(period=None, start=None):
+            raise ConnectionError("offline")
+
+        bar_store = barstore.BarStore(history=self.store)
+        self.assertEqual(10, len(bar_store.known("AMZN", "10m", "1m")))
+        updated = bar_store.update("AMZN", "10m", "1m", offline)
+        self.assertListEqual(list(stored["Close"]), list(updated["Close"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+
+from test_web import call
+
+from yaticker import metrics
+from yaticker.providers import ReplayProvider
+from yaticker.yaticker import YaTicker
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles(self):
+        histogram = metrics.Histogram()
+        for value in range(1, 101):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(100, snapshot["count"])
+        self.assertEqual(5050, snapshot["sum"])
+        self.assertEqual(51, snapshot["p50"])
+        self.assertEqual(96, snapshot["p95"])
+        self.assertEqual(100, snapshot["p99"])
+
+    def test_window(self):
+        histogram = metrics.Histogram(window=10)
+        for value in range(100):
+            histogram.observe(value)
+        self.assertEqual(100, histogram.count)
+        self.assertEqual(90, histogram.quantile(0))
+        self.assertEqual(0.0, metrics.Histogram().quantile(0.5))
+
+
+class TestRegistry(unittest.TestCase):
+    def test_disabled(self):
+        registry = metrics.Registry()
+        self.assertIs(metrics.NULL_TIMER, registry.timer("fetch"))
+        with registry.timer("fetch"):
+            pass
+        registry.increment("fetch_errors")
+        self.assertEqual(42, registry.timed("double")(lambda x: x * 2)(21))
+        collected = registry.collect()
+        self.assertDictEqual({}, collected["timings"])
+        self.assertDictEqual({}, collected["counters"])
+
+    def test_timed(self):
+        registry = metrics.Registry(enabled=True)
+
+        @registry.timed("fetch")
+        def fetch(symbol):
+            if symbol is None:
+                raise ValueError("no symbol")
+            return symbol
+
+        self.assertEqual("AMC", fetch("AMC"))
+        with self.assertRaises(ValueError):
+            fetch(None)
+        collected = registry.collect()
+        self.assertEqual(2, collected["timings"]["fetch"]["count"])
+        self.assertDictEqual({"fetch_errors": 1}, collected["counters"])
+
+    def test_gauges(self):
+        registry = metrics.Registry()
+        registry.gauge("hit_ratio", lambda: metrics.hit_ratio(3, 1))
+        registry.gauge("broken", lambda: 1 / 0)
+        with self.assertLogs(level="ERROR"):
+            gauges = registry.collect()["gauges"]
+        self.assertDictEqual({"hit_ratio": 0.75}, gauges)
+        self.assertIsNone(metrics.hit_ratio(0, 0))
+
+    def test_prometheus(self):
+        registry = metrics.Registry(enabled=True)
+        registry.observe("chart", 0.5)
+        registry.increment("fetch_errors", 2)
+        registry.gauge("cache_hit_ratio", lambda: 0.5)
+        registry.gauge("unknown", lambda: None)
+        lines = registry.prometheus().splitlines()
+        self.assertIn(
+            'yaticker_stage_seconds{stage="chart",quantile="0.99"} 0.5', lines
+        )
+        self.assertIn('yaticker_stage_seconds_count{stage="chart"} 1', lines)
+        self.assertIn("yaticker_fetch_errors_total 2", lines)
+        self.assertIn("yaticker_cache_hit_ratio 0.5", lines)
+        self.assertNotIn("unknown", registry.prometheus())
+        self.assertIn("chart n=1 p50=500.0ms", registry.summary())
+
+
+@patch.object(YaTicker, "provider", ReplayProvider())
+class TestMetricsRoute(unittest.TestCase):
+    def setUp(self):
+        YaTicker.invalidate()
+        metrics.registry.clear()
+        metrics.registry.enable()
+        self.addCleanup(metrics.registry.clear)
+        self.addCleanup(metrics.registry.enable, False)
+
+    def test_metrics(self):
+        call("/ticker/amzn?period=1d&interval=1h")
+        call("/ticker/amzn?period=1d&interval=1h")
+        status, headers, body = call("/metrics")
+        self.assertEqual(200, status)
+        self.assertTrue(headers["content-type"].startswith("text/plain"))
+        lines = body.decode().splitlines()
+        self.assertIn('yaticker_stage_seconds_count{stage="ticker_data"} 2', lines)
+        # the cache is shared by the whole process, so are its statistics
+        self.assertIn("# TYPE yaticker_cache_hit_ratio gauge", lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+import yaticker
+from yaticker.nativechart import (
+    NativeChartRenderer,
+    datetime_format,
+    lttb_downsample,
+    minmax_downsample,
+    nice_ticks,
+)
+from yaticker.providers import ReplayProvider
+
+
+class TestNativeChart(unittest.TestCase):
+    def setUp(self):
+        self.provider = ReplayProvider()
+
+    def test_minmax_downsample(self):
+        values = np.random.default_rng(0).normal(size=10000).cumsum()
+        x, y = minmax_downsample(values, 200)
+        self.assertEqual(800, len(x))
+        self.assertEqual(199, x.max())
+        self.assertEqual(values.min(), y.min())
+        self.assertEqual(values.max(), y.max())
+        self.assertEqual(values[0], y[0])
+        self.assertEqual(values[-1], y[-1])
+
+    def test_minmax_downsample_few_values(self):
+        values = np.arange(10, dtype="float64")
+        x, y = minmax_downsample(values, 200)
+        self.assertEqual(0, x[0])
+        self.assertEqual(199, x[-1])
+        self.assertTrue(np.array_equal(values, y))
+
+    def test_lttb_downsample(self):
+        values = np.random.default_rng(0).normal(size=10000).cumsum()
+        x, y = lttb_downsample(values, 200)
+        self.assertEqual(200, len(y))
+        self.assertEqual((0, 199), (x[0], x[-1]))
+        self.assertTrue(np.all(np.diff(x) > 0))
+        self.assertEqual((values[0], values[-1]), (y[0], y[-1]))
+
+    def test_nice_ticks(self):
+        ticks, decimals = nice_ticks(783.2, 968.4)
+        self.assertListEqual([800, 900], ticks.tolist())
+        self.assertEqual(0, decimals)
+        ticks, decimals = nice_ticks(0.52, 0.61)
+        self.assertListEqual([0.55, 0.6], ticks.round(2).tolist())
+        self.assertEqual(2, decimals)
+        ticks, decimals = nice_ticks(0.1, 0.17)
+        self.assertListEqual([0.1, 0.125, 0.15], ticks.round(3).tolist())
+        self.assertEqual(3, decimals)
+
+    def test_datetime_format(self):
+        data = self.provider.history("AMC", interval="1h", period="5d")
+        self.assertEqual("%-d/%-m", datetime_format(data.index))
+        data = self.provider.history("AMC", interval="1m", period="1d")
+        self.assertEqual("%H:%M", datetime_format(data.index))
+
+    def test_render_exact_size(self):
+        data = self.provider.history("AMC", interval="1m", period="5d")
+        for show_volume in (False, True):
+            renderer = NativeChartRenderer(
+                width=200, height=100, show_volume=show_volume
+            )
+            image = renderer.render(data)
+            self.assertEqual("L", image.mode)
+            self.assertEqual((200, 100), image.size)
+            # something was drawn
+            self.assertLess(np.asarray(image).min(), 128)
+
+    def test_render_lttb(self):
+        data = self.provider.history("AMC", interval="1m", period="1d")
+        image = NativeChartRenderer(downsample="lttb").render(data)
+        self.assertEqual((264, 116), image.size)
+        with self.assertRaises(ValueError):
+            NativeChartRenderer(downsample="foo")
+
+    def test_render_missing_values(self):
+        data = self.provider.history("AMC", interval="1h", period="5d")
+        data.loc[data.index[:10], "Close"] = np.nan
+        image = NativeChartRenderer(show_volume=True).render(data)
+        self.assertEqual((264, 116), image.size)
+        data["Close"] = np.nan
+        image = NativeChartRenderer().render(data)
+        self.assertEqual(255, np.asarray(image).min())
+
+    def test_no_matplotlib(self):
+        code = "import sys, yaticker.nativechart; print('matplotlib' in sys.modules)"
+        # from where the package is importable, whether installed or not
+        package_parent = os.path.dirname(os.path.dirname(yaticker.__file__))
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=package_parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual("False", output.stdout.strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
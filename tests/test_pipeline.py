@@ -0,0 +1,239 @@
+import functools
+import multiprocessing
+import queue
+import threading
+import time
+import unittest
+from concurrent import futures
+from itertools import cycle
+
+from yaticker import pipeline
+from yaticker.dashboard import FrameRenderer, render_frame
+from yaticker.providers import ReplayProvider
+
+
+class TestPipeline(unittest.TestCase):
+    def test_frames_in_order(self):
+        prefetcher = pipeline.FramePrefetcher(
+            iter(["FOO", "BAR", "BAZ"]),
+            fetch=lambda symbol: symbol.lower(),
+            render=lambda symbol, data: f"{symbol}:{data}",
+        ).start()
+        frames = [prefetcher.get(timeout=5) for _ in range(3)]
+        prefetcher.stop()
+        self.assertListEqual(
+            [("FOO", "FOO:foo"), ("BAR", "BAR:bar"), ("BAZ", "BAZ:baz")], frames
+        )
+
+    def test_failures_skipped(self):
+        def fetch(symbol):
+            if symbol == "BAR":
+                raise ConnectionError("offline")
+            return None if symbol == "BAZ" else symbol
+
+        prefetcher = pipeline.FramePrefetcher(
+            iter(["FOO", "BAR", "BAZ", "QUX"]),
+            fetch=fetch,
+            render=lambda symbol, data: data,
+            backoff=0.01,
+        ).start()
+        frames = [prefetcher.get(timeout=5) for _ in range(2)]
+        prefetcher.stop()
+        self.assertListEqual([("FOO", "FOO"), ("QUX", "QUX")], frames)
+
+    def test_backoff_after_failures(self):
+        fetched = []
+
+        def fetch(symbol):
+            fetched.append(symbol)
+            return None
+
+        prefetcher = pipeline.FramePrefetcher(
+            cycle(["FOO"]), fetch=fetch, render=lambda symbol, data: data, depth=1
+        ).start()
+        with self.assertRaises(queue.Empty):
+            prefetcher.get(timeout=0.5)
+        prefetcher.stop()
+        # waits 1s after the first failure instead of fetching again right away
+        self.assertEqual(1, len(fetched))
+
+    def test_stale_frame_prepared_again(self):
+        rendered = []
+
+        def render(symbol, data):
+            rendered.append(threading.current_thread())
+            return f"{symbol}:{time.monotonic()}"
+
+        prefetcher = pipeline.FramePrefetcher(
+            iter(["FOO", "BAR"]), fetch=lambda symbol: symbol, render=render
+        ).start()
+        self.assertEqual("FOO", prefetcher.get(timeout=5)[0])
+        time.sleep(0.2)
+        # BAR is too old: prepared again, after the frames already in the queue
+        symbol, frame = prefetcher.get(timeout=5, max_age=0.1)
+        prefetcher.stop()
+        self.assertEqual("BAR", symbol)
+        self.assertLess(time.monotonic() - float(frame.split(":")[1]), 0.1)
+        # always on the render thread, not on the thread calling get
+        self.assertNotIn(threading.current_thread(), rendered)
+        self.assertEqual(3, len(rendered))
+
+    def test_get_nowait(self):
+        prefetcher = pipeline.FramePrefetcher(
+            iter([]), fetch=lambda symbol: symbol, render=lambda symbol, data: data
+        ).start()
+        with self.assertRaises(queue.Empty):
+            prefetcher.get(timeout=0)
+        prefetcher.stop()
+
+    def test_slow_symbol_does_not_stall(self):
+        release = threading.Event()
+
+        def fetch(symbol):
+            if symbol == "SLOW":
+                release.wait(5)
+            return symbol
+
+        prefetcher = pipeline.FramePrefetcher(
+            cycle(["SLOW", "FOO", "BAR"]),
+            fetch=fetch,
+            render=lambda symbol, data: data,
+            depth=3,
+        ).start()
+        first, _ = prefetcher.get(timeout=5)
+        release.set()
+        prefetcher.stop()
+        self.assertNotEqual("SLOW", first)
+
+
+class TestDisplayPipeline(unittest.TestCase):
+    def display_sink(self, count):
+        frames = []
+        done = threading.Event()
+
+        def display(frame):
+            frames.append(frame)
+            if len(frames) == count:
+                done.set()
+
+        return frames, done, display
+
+    def test_frames_in_order(self):
+        frames, done, display = self.display_sink(4)
+        stages = pipeline.DisplayPipeline(
+            fetch=lambda symbol: symbol.lower(),
+            render=lambda symbol, data: f"{symbol}:{data}",
+            display=display,
+        ).start()
+        self.addCleanup(stages.stop, 5)
+        for symbol in ["FOO", "BAR", "BAZ", "QUX"]:
+            stages.submit(symbol, timeout=5)
+        self.assertTrue(done.wait(5))
+        self.assertListEqual(["FOO:foo", "BAR:bar", "BAZ:baz", "QUX:qux"], frames)
+        self.assertEqual(4, stages.stats["displayed"])
+
+    def test_failures_skipped(self):
+        frames, done, display = self.display_sink(2)
+
+        def fetch(symbol):
+            if symbol == "BAR":
+                raise ConnectionError("offline")
+            return None if symbol == "BAZ" else symbol
+
+        stages = pipeline.DisplayPipeline(
+            fetch=fetch, render=lambda symbol, data: data, display=display
+        ).start()
+        self.addCleanup(stages.stop, 5)
+        for symbol in ["FOO", "BAR", "BAZ", "QUX"]:
+            stages.submit(symbol, timeout=5)
+        self.assertTrue(done.wait(5))
+        self.assertListEqual(["FOO", "QUX"], frames)
+        self.assertEqual(1, stages.stats["failed"])
+        self.assertEqual(1, stages.stats["skipped"])
+
+    def test_backpressure(self):
+        release = threading.Event()
+        stages = pipeline.DisplayPipeline(
+            fetch=lambda symbol: symbol,
+            render=lambda symbol, data: data,
+            display=lambda frame: release.wait(5),
+            depth=1,
+        ).start()
+        self.addCleanup(stages.stop, 5)
+        self.addCleanup(release.set)
+        # one symbol per stage, one waiting in each queue, then the pipeline is full
+        with self.assertRaises(queue.Full):
+            for symbol in range(10):
+                stages.submit(symbol, timeout=0.5)
+        self.assertLess(stages.stats["submitted"], 10)
+
+    def test_replace_oldest(self):
+        release = threading.Event()
+        frames = []
+        stages = pipeline.DisplayPipeline(
+            fetch=lambda symbol: symbol,
+            render=lambda symbol, data: data,
+            display=lambda frame: release.wait(5) and frames.append(frame),
+            depth=1,
+        ).start()
+        self.addCleanup(stages.stop, 5)
+        submitted = []
+        with self.assertRaises(queue.Full):
+            for symbol in range(10):
+                stages.submit(symbol, timeout=0.5)
+                submitted.append(symbol)
+        stages.submit("LAST", replace_oldest=True)
+        release.set()
+        self.assertTrue(stages.join(5))
+        # the last symbol waiting to be rendered made room for the new one
+        self.assertListEqual(submitted[:-1] + ["LAST"], frames)
+        self.assertEqual(1, stages.stats["cancelled"])
+
+    def test_cancel_drops_in_flight(self):
+        frames, done, display = self.display_sink(1)
+        release = threading.Event()
+
+        def fetch(symbol):
+            if symbol == "SLOW":
+                release.wait(5)
+            return symbol
+
+        stages = pipeline.DisplayPipeline(
+            fetch=fetch, render=lambda symbol, data: data, display=display
+        ).start()
+        self.addCleanup(stages.stop, 5)
+        stages.submit("SLOW")
+        stages.submit("FOO")
+        stages.cancel()
+        stages.submit("BAR")
+        release.set()
+        self.assertTrue(done.wait(5))
+        stages.stop(5)
+        self.assertListEqual(["BAR"], frames)
+        self.assertEqual(2, stages.stats["cancelled"])
+
+    def test_render_processes(self):
+        data = ReplayProvider().history("AMC", interval="1h", period="5d")
+        renderer = FrameRenderer(264, 176, chart_engine="native")
+        frames, done, display = self.display_sink(2)
+        executor = futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+        # the renderer only carries its settings to the worker process
+        stages = pipeline.DisplayPipeline(
+            fetch=lambda symbol: ({"previousClose": 10.0}, data),
+            render=functools.partial(render_frame, renderer),
+            display=display,
+            render_executor=executor,
+        ).start()
+        self.addCleanup(stages.stop, 5)
+        stages.submit("AMC")
+        stages.submit("AMC")
+        self.assertTrue(done.wait(60))
+        expected = render_frame(renderer, "AMC", ({"previousClose": 10.0}, data))
+        for frame in frames:
+            self.assertEqual(expected.tobytes(), frame.tobytes())
+
+
+if __name__ == "__main__":
+    unittest.main()
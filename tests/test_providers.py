@@ -0,0 +1,81 @@
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from yaticker import providers
+
+
+class TestProviders(unittest.TestCase):
+    def test_generate_deterministic(self):
+        first = providers.ReplayProvider().history("AMZN", interval="1h", period="5d")
+        second = providers.ReplayProvider().history("amzn", interval="1h", period="5d")
+        self.assertEqual(120, len(first))
+        self.assertTrue(first.equals(second))
+
+    def test_generate_per_symbol(self):
+        provider = providers.ReplayProvider()
+        amzn = provider.history("AMZN", interval="1m", period="1d")
+        fb = provider.history("FB", interval="1m", period="1d")
+        self.assertFalse(amzn["Close"].equals(fb["Close"]))
+
+    def test_max_bars(self):
+        provider = providers.ReplayProvider(max_bars=50)
+        self.assertEqual(50, len(provider.history("AMZN", interval="1m", period="max")))
+
+    def test_history_since(self):
+        provider = providers.ReplayProvider()
+        bars = provider.history("AMZN", interval="1m", period="1d")
+        since = provider.history(
+            "AMZN", interval="1m", start=int(bars.index[-3].timestamp())
+        )
+        self.assertEqual(3, len(since))
+
+    def test_download(self):
+        data = providers.ReplayProvider().download(["AMZN", "FB"], "1d", "1h")
+        self.assertListEqual(["AMZN", "FB"], list(data.columns.levels[0]))
+
+    def test_info(self):
+        info = providers.ReplayProvider().info("amzn")
+        self.assertEqual("AMZN", info["symbol"])
+        self.assertIn("previousClose", info)
+
+    def test_latency(self):
+        provider = providers.ReplayProvider(latency=0.05)
+        start = time.perf_counter()
+        provider.info("AMZN")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+    def test_yfinance_pool(self):
+        provider = providers.YFinanceProvider(pool_size=4)
+        self.assertIsNone(provider._session)
+        adapter = provider._get_session().get_adapter(
+            "https://query1.finance.yahoo.com"
+        )
+        self.assertEqual(4, adapter._pool_maxsize)
+
+    def test_yfinance_timeout(self):
+        import requests
+
+        adapter = providers.session(timeout=5).get_adapter("https://example.com")
+        request = requests.Request("GET", "https://example.com").prepare()
+        with patch.object(requests.adapters.HTTPAdapter, "send") as send:
+            adapter.send(request)
+            adapter.send(request, timeout=1)
+        self.assertListEqual(
+            [5, 1], [call.kwargs["timeout"] for call in send.call_args_list]
+        )
+
+    def test_record_replay(self):
+        source = providers.ReplayProvider(seed=42)
+        with tempfile.TemporaryDirectory() as directory:
+            providers.record(["AMZN"], "1d", "1h", directory, provider=source)
+            replay = providers.ReplayProvider(directory=directory)
+            expected = source.history("AMZN", interval="1h", period="1d")
+            actual = replay.history("AMZN", interval="1h", period="1d")
+            self.assertListEqual(list(expected["Close"]), list(actual["Close"]))
+            self.assertDictEqual(source.info("AMZN"), replay.info("AMZN"))
+
+
+if __name__ == "__main__":
+    unittest.main()
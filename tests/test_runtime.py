@@ -0,0 +1,152 @@
+import threading
+import time
+import unittest
+
+from yaticker.runtime import Buttons, EventLoop, FakeGPIO
+
+
+class TestEventLoop(unittest.TestCase):
+    def setUp(self):
+        self.loop = EventLoop()
+        self.thread = threading.Thread(target=self.loop.run)
+        self.thread.start()
+        self.addCleanup(self.thread.join, 5)
+        self.addCleanup(self.loop.stop)
+
+    def wait(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_call_soon_and_later(self):
+        calls = []
+        self.loop.call_later(0.1, calls.append, "later")
+        self.loop.call_soon(calls.append, "soon")
+        self.assertTrue(self.wait(lambda: len(calls) == 2))
+        self.assertListEqual(["soon", "later"], calls)
+
+    def test_call_every(self):
+        calls = []
+        timer = self.loop.call_every(0.05, calls.append, "tick", delay=0)
+        self.assertTrue(self.wait(lambda: len(calls) >= 3))
+        timer.cancel()
+        count = len(calls)
+        time.sleep(0.15)
+        self.assertLessEqual(len(calls), count + 1)
+
+    def test_idle_loop_sleeps(self):
+        time.sleep(0.3)
+        self.assertEqual(0, self.loop.stats["wakeups"])
+        self.loop.call_every(0.1, lambda: None)
+        time.sleep(0.35)
+        self.assertLessEqual(self.loop.stats["wakeups"], 5)
+
+    def test_jobs_latest_wins(self):
+        started = threading.Event()
+        release = threading.Event()
+        done = []
+
+        def slow_job(name):
+            started.set()
+            release.wait(5)
+            done.append(name)
+
+        self.loop.submit(slow_job, "first")
+        started.wait(5)
+        self.loop.submit(done.append, "second")
+        self.loop.submit(done.append, "third")
+        release.set()
+        self.assertTrue(self.loop.jobs.wait_idle(5))
+        self.assertListEqual(["first", "third"], done)
+        self.assertEqual(1, self.loop.jobs.stats["dropped"])
+
+    def test_jobs_of_other_functions_kept(self):
+        started = threading.Event()
+        release = threading.Event()
+        done = []
+
+        def tick(name):
+            started.set()
+            release.wait(5)
+            done.append(name)
+
+        self.loop.submit(tick, "tick 1")
+        started.wait(5)
+        # a button job is not dropped by the next periodic one
+        self.loop.submit(done.append, "button")
+        self.loop.submit(tick, "tick 2")
+        release.set()
+        self.assertTrue(self.loop.jobs.wait_idle(5))
+        self.assertListEqual(["tick 1", "button", "tick 2"], done)
+        self.assertEqual(0, self.loop.jobs.stats["dropped"])
+
+    def test_cancelled_due_timer_skipped(self):
+        fired = []
+        now = [0.0]
+        loop = EventLoop(timer=lambda: now[0])
+        loop.call_later(1, fired.append, "first")
+        second = loop.call_later(2, fired.append, "second")
+        # both due, the second cancelled behind the first
+        now[0] = 3
+        second.cancel()
+        self.assertListEqual([(fired.append, ("first",))], loop._next_callbacks())
+
+    def test_errors_do_not_stop_the_loop(self):
+        calls = []
+        self.loop.call_soon(lambda: 1 / 0)
+        self.loop.call_soon(calls.append, "after")
+        self.assertTrue(self.wait(lambda: calls))
+        self.assertEqual(1, self.loop.stats["errors"])
+
+
+class TestButtons(unittest.TestCase):
+    KEY = 5
+
+    def setUp(self):
+        self.gpio = FakeGPIO()
+        self.loop = EventLoop()
+        self.presses = []
+        self.buttons = Buttons(
+            self.gpio,
+            self.loop,
+            {self.KEY: lambda: self.presses.append(time.monotonic())},
+            debounce=0.05,
+        )
+        self.buttons.setup()
+        self.thread = threading.Thread(target=self.loop.run)
+        self.thread.start()
+        self.addCleanup(self.thread.join, 5)
+        self.addCleanup(self.loop.stop)
+
+    def test_debounce(self):
+        self.gpio.press(self.KEY, bounces=3)
+        time.sleep(0.1)
+        self.gpio.press(self.KEY)
+        time.sleep(0.05)
+        self.assertEqual(2, len(self.presses))
+        self.assertEqual(3, self.buttons.stats["bounces"])
+        self.assertEqual(self.gpio.HIGH, self.gpio.input(self.KEY))
+
+    def test_setup_again(self):
+        # e.g. after the display released the GPIOs
+        self.gpio.cleanup()
+        self.buttons.setup()
+        self.buttons.setup()
+        self.gpio.press(self.KEY)
+        time.sleep(0.05)
+        self.assertEqual(1, len(self.presses))
+
+    def test_latency_while_rendering(self):
+        started = threading.Event()
+        self.loop.submit(lambda: (started.set(), time.sleep(0.5)))
+        started.wait(5)
+        pressed = time.monotonic()
+        self.gpio.press(self.KEY)
+        time.sleep(0.1)
+        self.assertEqual(1, len(self.presses))
+        self.assertLess(self.presses[0] - pressed, 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
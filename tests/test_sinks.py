@@ -0,0 +1,99 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import yaml
+from emulator import YatickerVirtual
+from PIL import Image
+
+from yaticker import sinks
+from yaticker.providers import YFinanceProvider
+from yaticker.yaticker import YaTicker
+
+
+def frame(color=255):
+    return Image.new("1", (264, 176), color)
+
+
+class TestSinks(unittest.TestCase):
+    def test_directory_sink(self):
+        for image_format in sinks.DirectorySink.FORMATS:
+            with tempfile.TemporaryDirectory() as directory:
+                sink = sinks.DirectorySink(directory, image_format=image_format)
+                sink.write(frame(0))
+                sink.write(frame())
+                self.assertEqual(2, sink.frames)
+                self.assertListEqual(
+                    [f"frame-000001.{image_format}", f"frame-000002.{image_format}"],
+                    sorted(os.listdir(directory)),
+                )
+                with Image.open(sink.path(1)) as image:
+                    self.assertEqual((264, 176), image.size)
+                    self.assertEqual(0, image.getextrema()[1])
+
+    def test_memory_sink_ring_buffer(self):
+        sink = sinks.MemorySink(size=2)
+        for color in (0, 255, 0):
+            sink.write(frame(color))
+        self.assertEqual(3, sink.frames)
+        self.assertListEqual(
+            [(255, 255), (0, 0)], [i.getextrema() for i in sink.images]
+        )
+
+    def test_animation_sink(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "frames.gif")
+            sink = sinks.AnimationSink(path)
+            sink.write(frame(0))
+            sink.write(frame())
+            sink.close()
+            with Image.open(path) as image:
+                self.assertEqual(2, image.n_frames)
+
+    def test_multipart_sink(self):
+        sink = sinks.MultipartSink()
+        sink.write(frame(0))
+        parts = []
+        reader = threading.Thread(target=lambda: parts.extend(sink.stream(timeout=5)))
+        reader.start()
+        sink.close()
+        reader.join(5)
+        self.assertEqual(1, len(parts))
+        self.assertTrue(parts[0].startswith(b"--frame\r\nContent-Type: image/png"))
+        self.assertTrue(parts[0].endswith(b"\r\n"))
+
+    def test_open_sink(self):
+        self.assertIsInstance(sinks.open_sink("memory"), sinks.MemorySink)
+        with self.assertRaises(ValueError):
+            sinks.open_sink("printer")
+
+
+class TestYatickerVirtual(unittest.TestCase):
+    def run_cycles(self, **config):
+        config.update(
+            {"provider": "replay", "watchlist": ["AMC", "GME"], "chart": "native"}
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            config_file = os.path.join(directory, "config.yaml")
+            with open(config_file, "w") as outfile:
+                yaml.dump(config, outfile)
+            sink = sinks.MemorySink()
+            virtual = YatickerVirtual(config_file=config_file, sink=sink)
+            self.addCleanup(YaTicker.set_provider, YFinanceProvider())
+            return virtual.run_cycles(cycles=2), sink
+
+    def test_run_cycles(self):
+        report, sink = self.run_cycles()
+        self.assertEqual(4, report["frames"])
+        self.assertEqual(4, len(sink.images))
+        self.assertGreater(report["fps"], 0)
+
+    def test_run_cycles_pipeline(self):
+        report, sink = self.run_cycles(pipeline=True)
+        self.assertEqual(4, report["frames"])
+        self.assertEqual((264, 176), sink.images[0].size)
+
+
+if __name__ == "__main__":
+    unittest.main()
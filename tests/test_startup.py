@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import yaticker
+
+# entry point module: (import time budget in seconds, modules it must not import)
+STARTUP_BUDGETS = {
+    "cli": (0.5, ("bottle", "pandas", "yfinance", "matplotlib")),
+    "yaticker.yaticker": (1.0, ("pandas", "yfinance", "matplotlib", "requests")),
+    "emulator": (1.5, ("pandas", "yfinance", "matplotlib", "mplfinance")),
+}
+
+
+def import_time(module: str):
+    """
+    Imports module in a new interpreter with -X importtime
+    :param module: module to import
+    :return: tuple (import time in seconds, names of the modules imported)
+    """
+    code = f"import json, sys, {module}; print(json.dumps(sorted(sys.modules)))"
+    # from where the entry points are importable, whether installed or not
+    package_parent = os.path.dirname(os.path.dirname(yaticker.__file__))
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=package_parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # lines are "import time: self [us] | cumulative | imported package"
+    for line in output.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6, json.loads(output.stdout)
+    raise AssertionError(f"{module} not found in the import times")
+
+
+class TestStartup(unittest.TestCase):
+    def test_startup_budgets(self):
+        for module, (budget, heavy_modules) in STARTUP_BUDGETS.items():
+            with self.subTest(module=module):
+                seconds, modules = import_time(module)
+                self.assertLess(seconds, budget)
+                for heavy_module in heavy_modules:
+                    self.assertNotIn(heavy_module, modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import queue
+import unittest
+
+import pandas as pd
+
+from yaticker import stream
+
+
+def bars(periods, close=None):
+    index = pd.date_range(
+        "2021-06-24 10:00", periods=periods, freq="1min", tz="America/New_York"
+    )
+    close = close if close is not None else [float(i) for i in range(periods)]
+    return pd.DataFrame({"Close": close}, index=index)
+
+
+class FakeFetch(object):
+    def __init__(self, *frames):
+        self.frames = list(frames)
+        self.calls = 0
+
+    def __call__(self, symbol, period, interval):
+        self.calls += 1
+        return self.frames.pop(0) if len(self.frames) > 1 else self.frames[0]
+
+
+class TestStream(unittest.TestCase):
+    def test_bar_delta_new_bars(self):
+        delta = stream.bar_delta(bars(3), bars(5))
+        self.assertEqual(2, len(delta))
+
+    def test_bar_delta_updated_last_bar(self):
+        delta = stream.bar_delta(bars(3), bars(3, close=[0.0, 1.0, 5.0]))
+        self.assertListEqual([5.0], list(delta["Close"]))
+
+    def test_bar_delta_unchanged(self):
+        self.assertTrue(stream.bar_delta(bars(3), bars(3)).empty)
+        self.assertEqual(3, len(stream.bar_delta(None, bars(3))))
+
+    def test_feed_pushes_delta(self):
+        fetch = FakeFetch(bars(3), bars(4))
+        feed = stream.BarFeed("AMZN", "1d", "1m", fetch, refresh=60)
+        updates = queue.Queue()
+        self.assertEqual(3, len(feed.subscribe(updates)))
+        feed.refresh()
+        event, symbol, delta = updates.get_nowait()
+        self.assertEqual("bars", event)
+        self.assertEqual("AMZN", symbol)
+        self.assertEqual(1, len(delta))
+        feed.refresh()
+        self.assertTrue(updates.empty())
+        self.assertEqual(0, feed.unsubscribe(updates))
+
+    def test_lagging_subscriber_resnapshot(self):
+        fetch = FakeFetch(bars(3), bars(4), bars(5), bars(6))
+        feed = stream.BarFeed("AMZN", "1d", "1m", fetch, refresh=60)
+        updates = queue.Queue(maxsize=1)
+        feed.subscribe(updates)
+        feed.refresh()
+        with self.assertLogs(level="WARNING"):
+            feed.refresh()
+        self.assertEqual("bars", updates.get_nowait()[0])
+        # the missed bar is in the snapshot sent instead of the next delta
+        feed.refresh()
+        event, _, snapshot = updates.get_nowait()
+        self.assertEqual("snapshot", event)
+        self.assertEqual(6, len(snapshot))
+        feed.refresh()
+        self.assertTrue(updates.empty())
+        feed.unsubscribe(updates)
+
+    def test_hub_shares_feeds(self):
+        fetch = FakeFetch(bars(3))
+        hub = stream.FeedHub(fetch, refresh=lambda interval: 60)
+        first, second = queue.Queue(), queue.Queue()
+        hub.subscribe("amzn", "1d", "1m", first)
+        hub.subscribe("AMZN", "1d", "1m", second)
+        self.assertEqual(1, len(hub))
+        self.assertEqual(1, fetch.calls)
+        hub.unsubscribe("AMZN", "1d", "1m", first)
+        self.assertEqual(1, len(hub))
+        hub.unsubscribe("AMZN", "1d", "1m", second)
+        self.assertEqual(0, len(hub))
+
+    def test_hub_subscribe_dropped_feed(self):
+        hub = stream.FeedHub(FakeFetch(bars(3)), refresh=lambda interval: 60)
+        first, second = queue.Queue(), queue.Queue()
+        hub.subscribe("AMZN", "1d", "1m", first)
+        dropped = hub._feeds[("AMZN", "1d", "1m")]
+        subscribe = dropped.subscribe
+
+        def unsubscribe_first(updates):
+            # the only other subscriber leaves while the feed is being subscribed to
+            hub.unsubscribe("AMZN", "1d", "1m", first)
+            return subscribe(updates)
+
+        dropped.subscribe = unsubscribe_first
+        self.assertEqual(3, len(hub.subscribe("AMZN", "1d", "1m", second)))
+        self.assertEqual(0, dropped.subscribers)
+        feed = hub._feeds[("AMZN", "1d", "1m")]
+        self.assertIsNot(dropped, feed)
+        self.assertEqual(1, feed.subscribers)
+        hub.unsubscribe("AMZN", "1d", "1m", second)
+        self.assertEqual(0, len(hub))
+
+    def test_hub_drops_failed_feed(self):
+        def offline(symbol, period, interval):
+            raise ConnectionError("offline")
+
+        hub = stream.FeedHub(offline, refresh=lambda interval: 60)
+        with self.assertRaises(ConnectionError):
+            hub.subscribe("AMZN", "1d", "1m", queue.Queue())
+        self.assertEqual(0, len(hub))
+
+    def test_events(self):
+        hub = stream.FeedHub(FakeFetch(bars(3)), refresh=lambda interval: 60)
+        events = hub.events(["amzn", "fb"], "1d", "1m", heartbeat=0.01)
+        snapshot = next(events)
+        self.assertTrue(snapshot.startswith("event: snapshot\ndata: "))
+        data = json.loads(snapshot.splitlines()[1].replace("data: ", "", 1))
+        self.assertEqual("AMZN", data["symbol"])
+        self.assertEqual(3, len(data["bars"]["Close"]))
+        next(events)
+        self.assertEqual(": keep-alive\n\n", next(events))
+        events.close()
+        self.assertEqual(0, len(hub))
+
+
+if __name__ == "__main__":
+    unittest.main()
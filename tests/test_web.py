@@ -0,0 +1,148 @@
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+from wsgiref.util import setup_testing_defaults
+
+import bottle
+import pandas as pd
+
+from yaticker import web
+from yaticker.providers import ReplayProvider
+from yaticker.yaticker import YaTicker
+
+
+def call(path, headers=None):
+    """Calls the web app, returns (status code, lower case headers, body)"""
+    environ = {}
+    setup_testing_defaults(environ)
+    environ["PATH_INFO"], _, environ["QUERY_STRING"] = path.partition("?")
+    for name, value in (headers or {}).items():
+        environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+    response = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        response["status"] = int(status.split()[0])
+        response["headers"] = {name.lower(): value for name, value in response_headers}
+
+    body = b"".join(bottle.default_app()(environ, start_response))
+    return response["status"], response["headers"], body
+
+
+@patch.object(YaTicker, "provider", ReplayProvider())
+class TestWeb(unittest.TestCase):
+    def setUp(self):
+        YaTicker.invalidate()
+
+    def test_ticker(self):
+        status, headers, body = call("/ticker/amzn?period=1d&interval=1h")
+        self.assertEqual(200, status)
+        self.assertEqual(24, len(json.loads(body)))
+        self.assertIn("etag", headers)
+        self.assertIn("last-modified", headers)
+
+    def test_ticker_not_modified(self):
+        _, headers, _ = call("/ticker/amzn?period=1d&interval=1h")
+        status, _, body = call(
+            "/ticker/amzn?period=1d&interval=1h",
+            {"If-None-Match": headers["etag"]},
+        )
+        self.assertEqual(304, status)
+        self.assertEqual(b"", body)
+
+    def test_ticker_modified_since(self):
+        _, headers, _ = call("/ticker/amzn?period=1d&interval=1h")
+        status, _, _ = call(
+            "/ticker/amzn?period=1d&interval=1h",
+            {"If-Modified-Since": headers["last-modified"]},
+        )
+        self.assertEqual(304, status)
+
+    def test_ticker_etag_changes(self):
+        _, first, _ = call("/ticker/amzn?period=1d&interval=1h")
+        _, second, _ = call("/ticker/fb?period=1d&interval=1h")
+        self.assertNotEqual(first["etag"], second["etag"])
+
+    def test_ticker_gzip(self):
+        status, headers, body = call(
+            "/ticker/amzn?period=1d&interval=1m", {"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(200, status)
+        self.assertEqual("gzip", headers["content-encoding"])
+        self.assertEqual(1440, len(json.loads(gzip.decompress(body))))
+
+    def test_ticker_columns_format(self):
+        status, headers, body = call(
+            "/ticker/amzn?period=1d&interval=1h&format=columns&columns=close"
+        )
+        self.assertEqual(200, status)
+        columns = json.loads(body)
+        self.assertListEqual(["timestamp", "Close"], list(columns))
+        self.assertEqual(24, len(columns["Close"]))
+
+    def test_ticker_csv_format(self):
+        status, headers, body = call("/ticker/amzn?period=1d&interval=1h&format=csv")
+        self.assertEqual(200, status)
+        self.assertEqual("text/csv", headers["content-type"])
+        self.assertEqual(25, len(body.splitlines()))
+
+    def test_ticker_since_maxpoints(self):
+        status, _, body = call(
+            "/ticker/amzn?period=1d&interval=1m&format=columns"
+            "&since=2021-06-24T12:00-04:00&maxpoints=60"
+        )
+        self.assertEqual(200, status)
+        self.assertEqual(60, len(json.loads(body)["timestamp"]))
+
+    def test_ticker_bad_request(self):
+        self.assertEqual(400, call("/ticker/amzn?format=foo")[0])
+        self.assertEqual(400, call("/ticker/amzn?columns=foo")[0])
+        self.assertEqual(400, call("/ticker/amzn?maxpoints=foo")[0])
+        self.assertEqual(400, call("/ticker/amzn?since=foo")[0])
+
+    def test_ticker_unknown_symbol(self):
+        # no bars, not even indexed by timestamp
+        with patch.object(YaTicker.provider, "history", return_value=pd.DataFrame()):
+            for query in ["", "?format=columns", "?format=csv", "?since=1624536000"]:
+                status, headers, _ = call(f"/ticker/bad{query}")
+                self.assertEqual(200, status, query)
+                self.assertNotIn("etag", headers)
+
+    def test_tickers(self):
+        status, headers, body = call(
+            "/tickers?symbols=amzn,fb&period=1d&interval=1h&format=columns"
+        )
+        self.assertEqual(200, status)
+        tickers = json.loads(body)
+        self.assertListEqual(["AMZN", "FB"], list(tickers))
+        self.assertEqual(24, len(tickers["FB"]["Close"]))
+        status, _, _ = call(
+            "/tickers?symbols=amzn,fb&period=1d&interval=1h&format=columns",
+            {"If-None-Match": headers["etag"]},
+        )
+        self.assertEqual(304, status)
+
+    def test_tickers_unknown_symbol(self):
+        YaTicker.cache.set(("data", "BAD", "1d", "1h"), pd.DataFrame(), 60)
+        for symbols in ["amzn,bad", "bad,amzn"]:
+            status, _, body = call(
+                f"/tickers?symbols={symbols}&period=1d&interval=1h&format=columns"
+                "&since=2021-06-24T12:00"
+            )
+            self.assertEqual(200, status, symbols)
+            tickers = json.loads(body)
+            self.assertListEqual([], tickers["BAD"]["timestamp"])
+            self.assertLess(0, len(tickers["AMZN"]["timestamp"]))
+
+    def test_tickers_bad_request(self):
+        self.assertEqual(400, call("/tickers")[0])
+        self.assertEqual(400, call("/tickers?symbols=amzn&format=csv")[0])
+
+    def test_server_adapter(self):
+        self.assertEqual("wsgiref", web.server_adapter("wsgiref"))
+        self.assertIs(web.ThreadingWSGIRefServer, web.server_adapter("threaded"))
+        self.assertIsNotNone(web.server_adapter("auto"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,117 @@
+import asyncio
+import time
 import unittest
+from unittest.mock import Mock, patch
+
+import pandas as pd
+
+from yaticker.providers import ReplayProvider
+from yaticker.yaticker import BAR_COLUMNS, YaTicker
 
 
 class TestYaticker(unittest.TestCase):
+    def setUp(self):
+        YaTicker.invalidate()
+
     def test_init(self):
         self.assertEqual(True, True)
 
+    @patch.object(YaTicker, "provider")
+    def test_get_ticker_data_cached(self, provider):
+        first = YaTicker.get_ticker_data("amzn", period="1d", interval="1m")
+        second = YaTicker.get_ticker_data("AMZN", period="1d", interval="1m")
+        self.assertIs(first, second)
+        provider.history.assert_called_once_with("amzn", period="1d", interval="1m")
+
+    @patch.object(YaTicker, "provider")
+    def test_invalidate(self, provider):
+        YaTicker.get_ticker_info("AMZN")
+        YaTicker.get_ticker_data("AMZN", period="1d", interval="1m")
+        YaTicker.get_ticker_info("FB")
+        self.assertEqual(2, YaTicker.invalidate("amzn"))
+        YaTicker.get_ticker_info("AMZN")
+        self.assertEqual(3, provider.info.call_count)
+
+    @patch.object(YaTicker, "provider", ReplayProvider())
+    def test_get_watchlist_data(self):
+        data = YaTicker.get_watchlist_data(["amzn", "fb"], period="1d", interval="1h")
+        self.assertListEqual(["AMZN", "FB"], list(data))
+        self.assertEqual(24, len(data["FB"]))
+
+    @patch.object(YaTicker, "provider")
+    def test_get_watchlist_data_drops_empty_rows(self, provider):
+        columns = pd.MultiIndex.from_product([["AMZN", "FB"], ["Close", "Volume"]])
+        nan = float("nan")
+        provider.download.return_value = pd.DataFrame(
+            [[1, 10, 2, 20], [nan, nan, nan, nan], [3, 30, nan, nan]], columns=columns
+        )
+        data = YaTicker.get_watchlist_data(["amzn", "fb"], period="1d", interval="1h")
+        self.assertListEqual([1, 3], list(data["AMZN"]["Close"]))
+        self.assertListEqual([2], list(data["FB"]["Close"]))
+
+    @patch.object(YaTicker, "provider", ReplayProvider())
+    def test_get_watchlist_data_counts_each_lookup_once(self):
+        YaTicker.get_ticker_data("AMZN", period="1d", interval="1h")
+        before = YaTicker.cache.stats
+        YaTicker.get_watchlist_data(["amzn", "fb"], period="1d", interval="1h")
+        after = YaTicker.cache.stats
+        self.assertEqual(1, after["hits"] - before["hits"])
+        self.assertEqual(1, after["misses"] - before["misses"])
+
+    @patch.object(YaTicker, "provider")
+    def test_cached_columns_do_not_depend_on_the_call(self, provider):
+        index = pd.date_range("2021-06-24 10:00", periods=2, freq="1h")
+        bars = pd.DataFrame({column: [1.0, 2.0] for column in BAR_COLUMNS}, index=index)
+        provider.history.return_value = bars.assign(Dividends=0.0)
+        provider.download.return_value = pd.concat(
+            {"FB": bars.assign(**{"Adj Close": 1.0})}, axis=1
+        )
+        history = YaTicker.get_ticker_data("AMZN", period="1d", interval="1h")
+        watchlist = YaTicker.get_watchlist_data(["fb"], period="1d", interval="1h")
+        self.assertListEqual(BAR_COLUMNS, list(history.columns))
+        self.assertListEqual(BAR_COLUMNS, list(watchlist["FB"].columns))
+
+    def test_split_tickers_data(self):
+        columns = pd.MultiIndex.from_product([["AMZN", "FB"], ["Close", "Volume"]])
+        data = pd.DataFrame([[1, 10, 2, 20], [3, 30, 4, 40]], columns=columns)
+        split = YaTicker.split_tickers_data(data, ["AMZN", "FB", "FOO"])
+        self.assertListEqual(["AMZN", "FB"], list(split))
+        self.assertListEqual([2, 4], list(split["FB"]["Close"]))
+
+    def test_split_tickers_data_single(self):
+        data = pd.DataFrame({"Close": [1, 2]})
+        split = YaTicker.split_tickers_data(data, ["AMZN"])
+        self.assertIs(data, split["AMZN"])
+
+    @patch.object(YaTicker, "provider", Mock(wraps=ReplayProvider()))
+    def test_get_watchlist_data_merges_cached(self):
+        cached = YaTicker.get_ticker_data("AMZN", period="1d", interval="1h")
+        data = YaTicker.get_watchlist_data(["amzn", "fb"], period="1d", interval="1h")
+        self.assertIs(cached, data["AMZN"])
+        YaTicker.provider.download.assert_called_once_with(
+            ["FB"], period="1d", interval="1h"
+        )
+        self.assertIs(
+            data["FB"], YaTicker.get_ticker_data("FB", period="1d", interval="1h")
+        )
+
+    @patch.object(YaTicker, "provider", ReplayProvider(latency=0.2))
+    def test_get_watchlist_data_async_concurrent(self):
+        watchlist = ["AMZN", "FB", "AAPL", "MSFT", "TSLA"]
+        start = time.perf_counter()
+        data = asyncio.run(
+            YaTicker.get_watchlist_data_async(watchlist, period="1d", interval="1h")
+        )
+        self.assertLess(time.perf_counter() - start, 0.2 * len(watchlist))
+        self.assertListEqual(watchlist, list(data))
+
+    @patch.object(YaTicker, "provider", ReplayProvider(latency=0.5))
+    def test_get_watchlist_data_async_timeout(self):
+        data = asyncio.run(
+            YaTicker.get_watchlist_data_async(["AMZN"], period="1d", timeout=0.1)
+        )
+        self.assertDictEqual({}, data)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,5 @@
 import click
 
-from yaticker.yaticker import YaTicker
-
 
 @click.command()
 @click.option("--interval", default="5m", help="Interval/granularity of the data")
@@ -11,6 +9,9 @@ from yaticker.yaticker import YaTicker
 )
 def cli(tickers, period, interval):
     """Simple console client for yaticker"""
+    # not needed to parse the arguments (e.g. --help)
+    from yaticker.yaticker import YaTicker
+
     data = YaTicker.get_tickers_data(
         tickers_string=tickers, period=period, interval=interval
     )
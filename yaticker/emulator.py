@@ -1,31 +1,146 @@
 import logging
+import threading
+import time
 
+import click
+
+from yaticker import metrics, sinks
 from yaticker.dashboard import Dashboard
 
 
 class YatickerVirtual(Dashboard):
-    """This emulates the size of the epaper 2in7, but displays the output to the console"""
+    """
+    This emulates the size of the epaper 2in7, but outputs the frames to a sink: the
+    image viewer by default, or files, memory or a stream to run headless
+    """
 
     def __init__(
-        self, width=264, height=176, dpi=117, config_file="yaticker/config.yaml"
+        self,
+        width=264,
+        height=176,
+        dpi=117,
+        config_file="yaticker/config.yaml",
+        sink=None,
     ):
         super().__init__(width=width, height=height, dpi=dpi, config_file=config_file)
+        self._sink = sink if sink is not None else sinks.ViewerSink()
+
+    @property
+    def sink(self):
+        return self._sink
 
     def display_image(self, img):
         try:
-            img.show()
+            self._sink.write(img)
         except Exception as e:
             logging.info(f"Exception: {e}")
         return
 
+    def run_cycles(self, cycles=1):
+        """
+        Displays every stock of the watchlist cycles times, as fast as possible (the
+        update frequency is ignored), through the pipeline if it is enabled
+        :param cycles: number of passes through the watchlist
+        :return: dict with the number of frames output, the seconds it took and the
+            frames per second
+        """
+        count = cycles * len(self.watchlist)
+        frames = self._sink.frames
+        start = time.perf_counter()
+        if self.pipeline:
+            stages = self.start_display_pipeline()
+            try:
+                for _ in range(count):
+                    stages.submit(next(self._watchlist_cycle))
+                stages.join()
+            finally:
+                stages.stop()
+        else:
+            for _ in range(count):
+                self.display_next_stock()
+        seconds = time.perf_counter() - start
+        frames = self._sink.frames - frames
+        return {
+            "frames": frames,
+            "seconds": seconds,
+            "fps": frames / seconds if seconds else 0.0,
+        }
+
+
+def serve_frames(sink, host, port):
+    """Serves the frames of a MultipartSink on http://host:port/, in the background"""
+    import bottle
+
+    from yaticker import web
+
+    app = bottle.Bottle()
+
+    @app.route("/")
+    def frames():
+        bottle.response.content_type = sink.CONTENT_TYPE
+        return sink.stream()
+
+    server = threading.Thread(
+        target=bottle.run,
+        kwargs={
+            "app": app,
+            "host": host,
+            "port": port,
+            "server": web.ThreadingWSGIRefServer,
+            "quiet": True,
+        },
+        name="yaticker-frames",
+        daemon=True,
+    )
+    server.start()
+    logging.info(f"Frames served on http://{host}:{port}/")
+
 
-def main():
+@click.command()
+@click.option(
+    "--sink",
+    "kind",
+    default="viewer",
+    type=click.Choice(["viewer", "png", "pbm", "memory", "gif", "multipart"]),
+    help="Where the frames go",
+)
+@click.option(
+    "--output", default=None, help="Directory of the png/pbm frames, path of the gif"
+)
+@click.option(
+    "--cycles",
+    default=0,
+    help="Displays the watchlist this many times as fast as possible, then prints the fps",
+)
+@click.option("--config", default="yaticker/config.yaml", help="Configuration file")
+@click.option("--port", default=8081, help="Port the multipart stream is served on")
+def main(kind, output, cycles, config, port):
+    """Emulates the e-paper dashboard"""
     logging.basicConfig(level=logging.DEBUG)
+    sink = sinks.open_sink(kind, output)
     try:
-        virtual = YatickerVirtual()
-        virtual.display_settings()
+        if kind == "multipart":
+            serve_frames(sink, "0.0.0.0", port)
+        virtual = YatickerVirtual(config_file=config, sink=sink)
+        if cycles > 0:
+            report = virtual.run_cycles(cycles)
+            print(
+                f"{report['frames']} frames in {report['seconds']:.2f}s: "
+                f"{report['fps']:.1f} frames per second"
+            )
+            if virtual.metrics_enabled:
+                metrics.registry.log_summary()
+        else:
+            virtual.display_settings()
+            if kind != "viewer":
+                # headless: cycles through the watchlist as the e-paper dashboard does
+                virtual.cycle_through_watchlist()
+    except KeyboardInterrupt:
+        logging.info("ctrl + c:")
     except Exception as e:
         logging.error(e, exc_info=True)
+    finally:
+        sink.close()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,58 @@
 import logging
-import time
 
 import RPi.GPIO as GPIO
 from waveshare_epd import epd2in7
 
+from yaticker import epd, metrics, runtime
 from yaticker.dashboard import Dashboard
 
 
+class Waveshare2in7(epd.Driver):
+    """
+    Driver of the Waveshare 2.7inch e-Paper HAT. Fast refreshes are black and white
+    full refreshes, partial refreshes need a V2 panel (display_Partial).
+    The panel is only initialized when waking up or switching refresh mode.
+    """
+
+    FAST = True
+
+    def __init__(self, panel):
+        self._panel = panel
+        self._mode = None
+        self.PARTIAL = hasattr(panel, "display_Partial")
+
+    def _init(self, mode, init):
+        if self._mode != mode:
+            init()
+            self._mode = mode
+
+    def full(self, image):
+        self._init("4gray", self._panel.Init_4Gray)
+        self._panel.display_4Gray(self._panel.getbuffer_4Gray(image))
+
+    def fast(self, image):
+        if hasattr(self._panel, "display_Fast"):
+            self._init("fast", self._panel.init_Fast)
+            self._panel.display_Fast(self._panel.getbuffer(image))
+        else:
+            self._init("bw", self._panel.init)
+            self._panel.display(self._panel.getbuffer(image))
+
+    def partial(self, image, box):
+        left, upper, right, lower = box
+        if image.width > image.height:
+            # the panel is vertical: the frame is rotated as getbuffer does
+            image = image.rotate(90, expand=True)
+            box = (upper, image.height - right, lower, image.height - left)
+        region = image.crop(box).convert("1")
+        self._init("bw", self._panel.init)
+        self._panel.display_Partial(region.tobytes(), *box)
+
+    def sleep(self):
+        self._panel.sleep()
+        self._mode = None
+
+
 class EPaper2in7(Dashboard):
     EPD = epd2in7.EPD()
 
@@ -25,62 +71,72 @@ class EPaper2in7(Dashboard):
     ):
         # EPD default orientation is vertical, we swap the default height / width
         super().__init__(width=width, height=height, dpi=dpi, config_file=config_file)
+        self._updater = epd.FrameUpdater(
+            Waveshare2in7(self.EPD),
+            full_every=self.full_refresh,
+            partial_ratio=0.3 if self.partial_refresh else 0,
+        )
+        # sleeping the panel releases the GPIOs, the keys are set up again
+        self._session = epd.DisplaySession(
+            self._updater,
+            idle_timeout=self.sleep_timeout,
+            on_sleep=self.initialize_keys,
+        )
+        # button presses and the watchlist cycle are handled by a single event loop
+        self._loop = runtime.EventLoop()
+        self._buttons = runtime.Buttons(
+            GPIO,
+            self._loop,
+            {
+                self.KEY_1: self.btn_1_press,
+                self.KEY_2: self.btn_2_press,
+                self.KEY_3: self.btn_3_press,
+                self.KEY_4: self.btn_4_press,
+            },
+        )
+        self._cycle_timer = None
+        self.schedule_metrics(self._loop)
         self.initialize_keys()
+        self._session.start()
 
     def initialize_keys(self):
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setup(self.KEY_1, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.setup(self.KEY_2, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.setup(self.KEY_3, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.setup(self.KEY_4, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        self._buttons.setup()
 
     def btn_1_press(self):
-        self.cycle_through_watchlist()
+        # (re)starts cycling through the watchlist from the next stock
+        if self._cycle_timer is not None:
+            self._cycle_timer.cancel()
+        self._cycle_timer = self.schedule_watchlist(self._loop)
 
     def btn_2_press(self):
-        self.display_message("Key 2 pressed")
+        self._loop.submit(self.display_message, "Key 2 pressed")
 
     def btn_3_press(self):
-        self.display_message("Key 3 pressed")
+        self._loop.submit(self.display_message, "Key 3 pressed")
 
     def btn_4_press(self):
-        self.display_settings()
+        self._loop.submit(self.display_settings)
 
     def display_image(self, img):
         try:
-            epd = epd2in7.EPD()
-            epd.Init_4Gray()
-            epd.display_4Gray(epd.getbuffer_4Gray(img))
-            epd.sleep()
-            self.initialize_keys()
+            # pushed by the display worker: the keys stay responsive
+            self._session.show(img)
         except Exception as e:
             logging.info(f"Exception: {e}")
         return
 
     def run(self):
         try:
-            while True:
-                key_1_state = GPIO.input(self.KEY_1)
-                key_2_state = GPIO.input(self.KEY_2)
-                key_3_state = GPIO.input(self.KEY_3)
-                key_4_state = GPIO.input(self.KEY_4)
-
-                if not key_1_state:
-                    self.btn_1_press()
-                    time.sleep(0.2)
-                if not key_2_state:
-                    self.btn_2_press()
-                    time.sleep(0.2)
-                if not key_3_state:
-                    self.btn_3_press()
-                    time.sleep(0.2)
-                if not key_4_state:
-                    self.btn_4_press()
-                    time.sleep(0.2)
+            # sleeps until a button is pressed or a refresh is due
+            self._loop.run()
         except Exception as e:
             logging.error(e, exc_info=True)
         except KeyboardInterrupt:
             logging.info("ctrl + c:")
+            self._session.stop(timeout=30)
+            logging.info(f"Refreshes: {self._updater.stats}")
+            if self.metrics_enabled:
+                metrics.registry.log_summary()
             epd2in7.epdconfig.module_exit()
             GPIO.cleanup()
             exit()
@@ -0,0 +1,123 @@
+import functools
+import logging
+import os
+
+from PIL import Image, ImageDraw, ImageFont
+
+# fonts shipped with yaticker are looked up first, then the ones of the system
+FONT_DIRS = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts"),
+    os.path.expanduser("~/.fonts"),
+    os.path.expanduser("~/.local/share/fonts"),
+    "/usr/local/share/fonts",
+    "/usr/share/fonts",
+]
+FONT_EXTENSIONS = (".ttf", ".otf")
+DEFAULT_FONT = "DejaVuSans"
+
+
+@functools.lru_cache(maxsize=1)
+def font_files():
+    """
+    Scans FONT_DIRS (once) for font files
+    :return: dict font name (file name without extension) -> path of the font file
+    """
+    files = {}
+    for directory in FONT_DIRS:
+        for root, _, names in os.walk(directory):
+            for name in names:
+                font_name, extension = os.path.splitext(name)
+                if extension.lower() in FONT_EXTENSIONS:
+                    files.setdefault(font_name, os.path.join(root, name))
+    return files
+
+
+@functools.lru_cache(maxsize=32)
+def font_path(font_name):
+    """
+    Resolves a font name (e.g. "Roboto-Medium") to its font file, DEFAULT_FONT when
+    it is not installed
+    :param font_name: name of the font, or path of a font file
+    :return: path of the font file, None if neither the font nor DEFAULT_FONT exist
+    """
+    if font_name and os.path.isfile(font_name):
+        return font_name
+    files = font_files()
+    if font_name in files:
+        return files[font_name]
+    logging.debug(f"Font {font_name} not found, using {DEFAULT_FONT}")
+    return files.get(DEFAULT_FONT)
+
+
+@functools.lru_cache(maxsize=64)
+def get_font(font_name, font_size):
+    """
+    Loads a font, once per name and size
+    :param font_name: name of the font, see font_path
+    :param font_size: size of the font, in pixels
+    :return: the font, Pillow's default font if no font file was found
+    """
+    path = font_path(font_name)
+    try:
+        return ImageFont.truetype(path or f"{DEFAULT_FONT}.ttf", font_size)
+    except OSError:
+        logging.error(f"Unable to load the font {font_name}, using the default font")
+        return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=1024)
+def text_size(font_name, font_size, text):
+    """
+    Measures the text, offset included (as the deprecated FreeTypeFont.getsize)
+    :param font_name: name of the font
+    :param font_size: size of the font, in pixels
+    :param text: text to measure
+    :return: tuple (width, height) of the text, in pixels
+    """
+    font = get_font(font_name, font_size)
+    if "\n" in text:
+        draw = ImageDraw.Draw(Image.new("1", (1, 1)))
+        _, _, right, bottom = draw.multiline_textbbox((0, 0), text, font=font)
+        return right, bottom
+    try:
+        _, _, right, bottom = font.getbbox(text)
+        return right, bottom
+    except AttributeError:
+        # bitmap fonts of Pillow < 9.2
+        return font.getsize(text)
+
+
+@functools.lru_cache(maxsize=256)
+def text_mask(font_name, font_size, text, mode="1"):
+    """
+    Renders the text once, to be pasted on images with Image.paste(fill, box, mask).
+    Labels such as symbols and dates are drawn again on every frame
+    :param font_name: name of the font
+    :param font_size: size of the font, in pixels
+    :param text: text to render
+    :param mode: "1" for aliased text on 1-bit images, "L" for antialiased text
+    :return: the text mask, its origin being the origin of the text
+    """
+    width, height = text_size(font_name, font_size, text)
+    mask = Image.new(mode, (max(width, 1), max(height, 1)), 0)
+    ImageDraw.Draw(mask).text(
+        (0, 0), text, font=get_font(font_name, font_size), fill=255
+    )
+    return mask
+
+
+def cache_info():
+    """
+    :return: dict cache name -> functools cache statistics of the font caches
+    """
+    return {
+        "fonts": get_font.cache_info(),
+        "sizes": text_size.cache_info(),
+        "masks": text_mask.cache_info(),
+    }
+
+
+def cache_clear():
+    """Forgets the fonts (e.g. after installing new ones) and everything drawn"""
+    for cached in (font_files, font_path, get_font, text_size, text_mask):
+        cached.cache_clear()
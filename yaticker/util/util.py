@@ -2,12 +2,13 @@ import socket
 import textwrap
 from tempfile import NamedTemporaryFile
 
-import requests
-from matplotlib.image import imread
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+from util import fonts
 
 
 def is_connected(url="http://www.google.com/", timeout=3):
+    import requests
+
     try:
         requests.head(url, timeout=timeout)
         return True
@@ -63,6 +64,8 @@ def get_percentage_diff(current, previous):
 
 # see https://kavigupta.org/2019/05/18/Setting-the-size-of-figures-in-matplotlib/
 def get_size(fig, dpi=100):
+    from matplotlib.image import imread
+
     with NamedTemporaryFile(suffix=".png") as f:
         fig.savefig(f.name, bbox_inches="tight", dpi=dpi)
         height, width, _channels = imread(f.name).shape
@@ -109,8 +112,13 @@ def place_text(
     """
     Put some text at a location on the image.
     """
+    if img.mode in ("1", "L"):
+        # the text is rendered once, and then pasted for every frame
+        mask = fonts.text_mask(font_name, font_size, text, img.mode)
+        img.paste(fill, (round(x_offset), round(y_offset)), mask)
+        return
     draw = ImageDraw.Draw(img)
-    font = ImageFont.truetype("/usr/share/fonts/TTF/DejaVuSans.ttf", font_size)
+    font = fonts.get_font(font_name, font_size)
     draw.text((x_offset, y_offset), text, font=font, fill=fill)
 
 
@@ -126,9 +134,8 @@ def place_centered_text(
     """
     Put some centered text at a location on the image.
     """
-    font = ImageFont.truetype("/usr/share/fonts/TTF/DejaVuSans.ttf", font_size)
     img_width, img_height = img.size
-    text_width, _ = font.getsize(text)
+    text_width, _ = fonts.text_size(font_name, font_size, text)
     text_height = font_size
     draw_x = (img_width - text_width) // 2 + x_offset
     draw_y = (img_height - text_height) // 2 + y_offset
@@ -144,9 +151,8 @@ def place_text_right(
     font_name="Forum-Regular",
     fill=0,
 ):
-    font = ImageFont.truetype("/usr/share/fonts/TTF/DejaVuSans.ttf", font_size)
     img_width, img_height = img.size
-    text_width, _ = font.getsize(text)
+    text_width, _ = fonts.text_size(font_name, font_size, text)
     draw_x = (img_width - text_width) + x_offset
     draw_y = y_offset
     place_text(img, text, draw_x, draw_y, font_size, font_name, fill)
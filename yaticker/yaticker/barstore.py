@@ -0,0 +1,166 @@
+import logging
+import threading
+
+from yaticker import periods
+
+
+def merge_bars(bars, new_bars):
+    """
+    Merges newly retrieved bars into already known ones. New bars overwrite the
+    known bars from their first timestamp onwards (e.g. the still forming last bar).
+    :param bars: known bars
+    :param new_bars: bars retrieved since the last known one
+    :return: the merged bars
+    """
+    if new_bars is None or new_bars.empty:
+        return bars
+    if bars is None or bars.empty:
+        return new_bars
+    import pandas as pd
+
+    return pd.concat([bars[bars.index < new_bars.index[0]], new_bars])
+
+
+def trim_bars(bars, period: str):
+    """
+    Drops the bars older than period, counted back from the last bar
+    :param bars: bars, indexed by timestamp
+    :param period: period to keep, e.g. "1440m", "5d", "1mo", "ytd" or "max"
+    :return: the trimmed bars
+    """
+    if bars.empty or period == "max":
+        return bars
+    last = bars.index[-1]
+    if period == "ytd":
+        return bars[bars.index >= last.replace(month=1, day=1).normalize()]
+    if period.endswith("d"):
+        # like yfinance, a period in days is a number of trading days
+        days = int(period[:-1])
+        dates = bars.index.normalize()
+        unique_dates = dates.unique()
+        if len(unique_dates) <= days:
+            return bars
+        return bars[dates >= unique_dates[-days]]
+    import pandas as pd
+
+    return bars[bars.index > last - pd.Timedelta(seconds=periods.to_seconds(period))]
+
+
+def _span(period: str) -> float:
+    """Approximate length of a period in seconds, used to compare periods"""
+    if period == "max":
+        return float("inf")
+    if period == "ytd":
+        return periods.to_seconds("1y")
+    return periods.to_seconds(period)
+
+
+class BarStore(object):
+    """
+    Keeps the bars already retrieved per (symbol, interval) so that refreshes only
+    retrieve the bars newer than the last known one.
+    When a history store is set, bars are persisted to disk and loaded back lazily
+    (e.g. after a reboot), and served from there when the network is unavailable.
+    """
+
+    def __init__(self, history=None):
+        self._bars = {}
+        self._lock = threading.Lock()
+        self.history = history
+
+    def __len__(self):
+        with self._lock:
+            return len(self._bars)
+
+    def get(self, symbol: str, interval: str):
+        """Returns the known bars of symbol, None if there are none"""
+        with self._lock:
+            entry = self._bars.get((symbol.upper(), interval))
+        return None if entry is None else entry[0]
+
+    def put(self, symbol: str, period: str, interval: str, bars):
+        """Stores the bars of symbol, covering period"""
+        with self._lock:
+            self._bars[(symbol.upper(), interval)] = (trim_bars(bars, period), period)
+
+    def known(self, symbol: str, period: str, interval: str):
+        """
+        Returns the known bars of symbol without any network access, loading them from
+        the history store if they are not in memory yet
+        :return: the bars of the last period, None if there are none
+        """
+        bars = self.get(symbol, interval)
+        if bars is None and self.history is not None:
+            entry = self.history.load(symbol, interval)
+            if entry is not None:
+                self.put(symbol, entry[1], interval, entry[0])
+                bars = self.get(symbol, interval)
+        if bars is None or bars.empty:
+            return None
+        return trim_bars(bars, period)
+
+    def clear(self, symbol: str = None):
+        with self._lock:
+            if symbol is None:
+                self._bars.clear()
+                return
+            for key in [key for key in self._bars if key[0] == symbol.upper()]:
+                del self._bars[key]
+
+    def update(self, symbol: str, period: str, interval: str, fetch):
+        """
+        Brings the bars of symbol up to date and returns them
+        :param symbol: symbol of the stock
+        :param period: time period to return
+        :param interval: granularity of the data
+        :param fetch: callable retrieving bars. Called as fetch(period=period) to retrieve
+            the whole period, or fetch(start=timestamp) to retrieve the bars since timestamp
+            (POSIX timestamp in seconds, as yfinance expects)
+        :return: the bars of the last period
+        """
+        with self._lock:
+            entry = self._bars.get((symbol.upper(), interval))
+        if entry is None and self.history is not None:
+            entry = self.history.load(symbol, interval)
+
+        try:
+            if entry is None or not self._covers(entry, period):
+                bars = fetch(period=period)
+                stored_period = period
+            else:
+                known_bars, stored_period = entry
+                start = int(known_bars.index[-1].timestamp())
+                bars = merge_bars(known_bars, fetch(start=start))
+        except Exception as e:
+            if entry is None or entry[0].empty:
+                raise
+            logging.warning(f"Unable to update {symbol}, using the known bars: {e}")
+            self.put(symbol, entry[1], interval, entry[0])
+            return trim_bars(entry[0], period)
+
+        self.put(symbol, stored_period, interval, bars)
+        stored_bars = self.get(symbol, interval)
+        if self.history is not None:
+            try:
+                self.history.save(symbol, interval, stored_bars, stored_period)
+            except Exception as e:
+                logging.error(f"Unable to save the history of {symbol} ({interval})")
+                logging.error(e, exc_info=True)
+        return trim_bars(stored_bars, period)
+
+    @staticmethod
+    def _covers(entry, period: str) -> bool:
+        """Whether the stored entry can be topped up to serve period"""
+        bars, stored_period = entry
+        if bars.empty:
+            return False
+        try:
+            if _span(stored_period) < _span(period):
+                return False
+            import pandas as pd
+
+            # too old: fetching the missing bars costs as much as the whole period
+            age = pd.Timestamp.now(tz=bars.index.tz) - bars.index[-1]
+            return age.total_seconds() < _span(period)
+        except ValueError:
+            return stored_period == period
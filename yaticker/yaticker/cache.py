@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from yaticker import periods
+
+
+class _Flight(object):
+    """A value being loaded, shared by every caller asking for it meanwhile"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TTLCache(object):
+    """
+    Thread-safe LRU cache where every entry expires after its own time-to-live.
+    Concurrent loads of the same key are coalesced into a single call of the loader.
+    Values are returned as stored: callers must not mutate cached objects.
+    """
+
+    def __init__(self, maxsize: int = 128, timer=time.monotonic):
+        self._maxsize = maxsize
+        self._timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._stale_hits = 0
+        self._coalesced = 0
+        self._flights = {}
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "stale_hits": self._stale_hits,
+                "coalesced": self._coalesced,
+                "size": len(self._entries),
+                "maxsize": self._maxsize,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > self._timer()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key, or default if missing or expired
+        :param key: hashable cache key
+        :param default: value returned on a miss
+        :return:
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self._timer():
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl: float):
+        """
+        Stores value under key for ttl seconds, evicting the least recently used entries if full
+        :param key: hashable cache key
+        :param value: value to store
+        :param ttl: time to live, in seconds
+        :return:
+        """
+        with self._lock:
+            self._entries[key] = (value, self._timer() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_load(
+        self, key, loader, ttl: float, stale_ttl: float = 0, count: bool = True
+    ):
+        """
+        Returns the cached value for key, calling loader() and caching its result on a miss.
+        Callers asking for a key while it is loaded wait for that load instead of
+        calling loader() themselves.
+        :param key: hashable cache key
+        :param loader: callable without arguments producing the value
+        :param ttl: time to live of a freshly loaded value, in seconds
+        :param stale_ttl: for how long past its expiry a value is still returned, while
+            it is reloaded in the background (stale-while-revalidate)
+        :param count: whether the lookup counts as a hit or miss, False when the caller
+            already counted it
+        :return:
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self._timer()
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._hits += count
+                return entry[0]
+            if entry is not None and entry[1] + stale_ttl > now:
+                self._entries.move_to_end(key)
+                self._stale_hits += count
+                if key not in self._flights:
+                    flight = self._flights[key] = _Flight()
+                    threading.Thread(
+                        target=self._revalidate,
+                        args=(key, loader, ttl, flight),
+                        daemon=True,
+                    ).start()
+                return entry[0]
+
+            self._misses += count
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._coalesced += 1
+
+        if leader:
+            self._load(key, loader, ttl, flight)
+        return flight.result()
+
+    def _load(self, key, loader, ttl: float, flight: _Flight):
+        try:
+            flight.value = loader()
+            self.set(key, flight.value, ttl)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _revalidate(self, key, loader, ttl: float, flight: _Flight):
+        self._load(key, loader, ttl, flight)
+        if flight.error is not None:
+            logging.warning(f"Unable to refresh {key}: {flight.error!r}")
+
+    def invalidate(self, key) -> bool:
+        """Removes key from the cache. Returns whether it was present."""
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def invalidate_if(self, predicate) -> int:
+        """Removes every entry whose key matches predicate(key). Returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# how long a ticker info stays fresh: a trading day (6.5 hours)
+INFO_TTL = 6.5 * 60 * 60
+# intraday bars are fresh for one interval; coarser intervals are capped so that
+# the still forming last bar (hence the latest price) is refreshed regularly
+MAX_DATA_TTL = 5 * 60
+
+
+def data_ttl(interval: str) -> float:
+    """
+    Returns how long (in seconds) a series of the given interval stays fresh
+    :param interval: granularity of the data, e.g. "1m", "1h"
+    :return:
+    """
+    try:
+        return min(periods.to_seconds(interval), MAX_DATA_TTL)
+    except ValueError:
+        return MAX_DATA_TTL
@@ -0,0 +1,203 @@
+import functools
+import math
+
+import numpy as np
+from PIL import Image
+from util import fonts
+
+from yaticker import nativechart
+
+# colors of the mplfinance "binance" style
+LINE_COLOR = "#1f77b4"
+VOLUME_UP_COLOR = "#70a800"
+VOLUME_DOWN_COLOR = "#ea0070"
+
+
+@functools.lru_cache(maxsize=16)
+def layout(width, height, dpi, show_volume=False, font_size=8, labels_width=None):
+    """
+    Computes where to place the chart axes so that the figure, tick labels included,
+    is exactly width x height pixels without having to measure a rendering of it
+    :param width: width of the figure, in pixels
+    :param height: height of the figure, in pixels
+    :param dpi: resolution of the figure
+    :param show_volume: whether there is a volume panel below the price
+    :param font_size: size of the tick labels, in points
+    :param labels_width: room taken by the price labels and their ticks, in pixels,
+        as measured by labels_width. Room for about 5 characters if None
+    :return: tuple of axes rectangles (left, bottom, width, height) in figure
+        fractions: the price axes, and the volume axes if show_volume
+    """
+    font_px = font_size * dpi / 72
+    if labels_width is None:
+        # e.g. "1,234"
+        labels_width = 5 * 0.6 * font_px + 2
+    # the price labels on the left, the dates below
+    left = labels_width + 2
+    bottom = font_px + 6
+    # half a label above and on the right for the labels at the edges
+    top = font_px / 2
+    right = 2 * 0.6 * font_px
+
+    axes_width = (width - left - right) / width
+    axes_height = (height - top - bottom) / height
+    if not show_volume:
+        return ((left / width, bottom / height, axes_width, axes_height),)
+    gap = 2 / height
+    volume_height = (axes_height - gap) * 0.25
+    price_bottom = bottom / height + volume_height + gap
+    return (
+        (left / width, price_bottom, axes_width, axes_height - volume_height - gap),
+        (left / width, bottom / height, axes_width, volume_height),
+    )
+
+
+def labels_width(axes, dpi) -> int:
+    """
+    Measures the price labels matplotlib draws for the current limits of axes, as
+    nativechart measures its own
+    :param axes: price axes, its limits already set
+    :param dpi: resolution of the figure
+    :return: width of the longest label plus the ticks and their padding, in pixels
+    """
+    low, high = sorted(axes.get_ylim())
+    ticks = [tick for tick in axes.get_yticks() if low <= tick <= high]
+    labels = axes.yaxis.get_major_formatter().format_ticks(ticks)
+    (tick,) = axes.yaxis.get_major_ticks(1)
+    font_px = round(tick.label1.get_size() * dpi / 72)
+    widths = [
+        fonts.text_size(nativechart.LABEL_FONT, font_px, label)[0] for label in labels
+    ]
+    padding = (tick.get_tick_padding() + tick.get_pad()) * dpi / 72
+    return math.ceil(max(widths, default=0) + padding)
+
+
+def fit_axes(axes, width, height, dpi, show_volume=False):
+    """
+    Places the axes (price, then volume) so that the price labels of the current
+    limits, e.g. "90,000" or "0.0096", fit in the figure
+    """
+    rects = layout(
+        width, height, dpi, show_volume, labels_width=labels_width(axes[0], dpi)
+    )
+    for ax, rect in zip(axes, rects):
+        ax.set_position(rect)
+
+
+class ChartRenderer(object):
+    """
+    Line chart of the close price (and optionally the volume) that builds its figure
+    once and, for every new data, only updates the line data, limits and tick labels
+    before rasterizing again. Like mplfinance, bars are evenly spaced (no gaps for
+    the closed market). Not thread safe: use one renderer per thread.
+    matplotlib is only imported when the first renderer is built.
+    """
+
+    def __init__(self, width=264, height=116, dpi=117, show_volume=False):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.collections import LineCollection
+        from matplotlib.figure import Figure
+        from matplotlib.ticker import FuncFormatter, MaxNLocator, NullFormatter
+
+        self._width = width
+        self._height = height
+        self._dpi = dpi
+        self._show_volume = show_volume
+        self._index = None
+        self._format = "%H:%M"
+
+        self._figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        self._figure.patch.set_facecolor("white")
+        self._canvas = FigureCanvasAgg(self._figure)
+        rects = layout(width, height, dpi, show_volume)
+        self._price_axes = self._add_axes(rects[0])
+        (self._line,) = self._price_axes.plot([], [], color=LINE_COLOR, linewidth=1)
+        self._volume_axes = None
+        if show_volume:
+            self._volume_axes = self._add_axes(rects[1])
+            self._volume = LineCollection([], linewidths=1)
+            self._volume_axes.add_collection(self._volume)
+            self._volume_axes.yaxis.set_major_formatter(NullFormatter())
+            self._volume_axes.tick_params(left=False)
+            self._price_axes.xaxis.set_major_formatter(NullFormatter())
+            self._price_axes.tick_params(bottom=False)
+
+        dates_axes = self._volume_axes if show_volume else self._price_axes
+        dates_axes.xaxis.set_major_locator(MaxNLocator(nbins=4, integer=True))
+        dates_axes.xaxis.set_major_formatter(FuncFormatter(self._format_date))
+
+    @property
+    def size(self):
+        return self._width, self._height
+
+    @property
+    def show_volume(self):
+        return self._show_volume
+
+    def _add_axes(self, rect):
+        from matplotlib.ticker import MaxNLocator
+
+        axes = self._figure.add_axes(rect)
+        for spine in axes.spines.values():
+            spine.set_visible(False)
+        axes.tick_params(labelsize=8, length=2, pad=1)
+        axes.yaxis.set_major_locator(MaxNLocator(nbins=3))
+        axes.margins(0)
+        return axes
+
+    def _format_date(self, x, pos=None):
+        position = int(round(x))
+        if self._index is None or not 0 <= position < len(self._index):
+            return ""
+        return self._index[position].strftime(self._format)
+
+    def render(self, data):
+        """
+        Draws the data
+        :param data: stock data, with at least a Close column (and Open and Volume to
+            show the volume)
+        :return: the chart, as a grayscale PIL image
+        """
+        close = data["Close"].to_numpy(dtype="float64")
+        x = np.arange(len(close))
+        self._index = data.index
+        self._format = nativechart.datetime_format(data.index)
+
+        self._line.set_data(x, close)
+        low, high = np.nanmin(close), np.nanmax(close)
+        padding = (high - low) * 0.05 or abs(high) * 0.01 or 1
+        self._price_axes.set_xlim(0, max(len(close) - 1, 1))
+        self._price_axes.set_ylim(low - padding, high + padding)
+
+        if self._show_volume:
+            volume = data["Volume"].to_numpy(dtype="float64")
+            up = close >= data["Open"].to_numpy(dtype="float64")
+            segments = np.zeros((len(x), 2, 2))
+            segments[:, :, 0] = x[:, None]
+            segments[:, 1, 1] = volume
+            self._volume.set_segments(segments)
+            self._volume.set_color(
+                np.where(up, VOLUME_UP_COLOR, VOLUME_DOWN_COLOR).tolist()
+            )
+            self._volume_axes.set_xlim(0, max(len(close) - 1, 1))
+            self._volume_axes.set_ylim(0, max(np.nanmax(volume), 1))
+
+        fit_axes(
+            [self._price_axes, self._volume_axes],
+            self._width,
+            self._height,
+            self._dpi,
+            self._show_volume,
+        )
+        self._canvas.draw()
+        chart = Image.frombuffer(
+            "RGBA",
+            self._canvas.get_width_height(),
+            self._canvas.buffer_rgba(),
+            "raw",
+            "RGBA",
+            0,
+            1,
+        )
+        # converting copies the pixels out of the canvas buffer, reused next time
+        return chart.convert("L")
@@ -1,23 +1,51 @@
-import inspect
+import functools
 import logging
-import sched
+import multiprocessing
+import os
+import queue
+import threading
 import time
 from abc import ABC, abstractmethod
+from concurrent import futures
 from itertools import cycle
 
 import currency
-import mplfinance as mplf
 import yaml
 from PIL import Image, ImageDraw
-from util import util
+from util import fonts, util
 
-from yaticker import yaticker
+from yaticker import chart, metrics, nativechart, pipeline, providers, runtime, yaticker
 
 matplotlib_logger = logging.getLogger("matplotlib")
 matplotlib_logger.setLevel(logging.ERROR)
 
 
+def _font_cache_hit_ratio():
+    masks = fonts.cache_info()["masks"]
+    return metrics.hit_ratio(masks.hits, masks.misses)
+
+
+metrics.gauge("font_cache_hit_ratio", _font_cache_hit_ratio)
+
+
 class Dashboard(ABC):
+    # settings listed by display_settings only when changed: (label, property, default)
+    OPTIONAL_SETTINGS = [
+        ("interval", "interval", "1h"),
+        ("batch fetch", "batch_fetch", False),
+        ("incremental", "incremental", False),
+        ("history", "history_dir", None),
+        ("provider", "provider", "yfinance"),
+        ("prefetch", "prefetch", 0),
+        ("chart", "chart_engine", "matplotlib"),
+        ("pipeline", "pipeline", False),
+        ("render processes", "render_processes", 0),
+        ("partial refresh", "partial_refresh", True),
+        ("full refresh", "full_refresh", 10),
+        ("sleep timeout", "sleep_timeout", 60),
+        ("metrics", "metrics_enabled", False),
+    ]
+
     @abstractmethod
     def __init__(self, width, height, dpi, config_file=None):
         self._width = width
@@ -28,6 +56,42 @@ class Dashboard(ABC):
         self._update_frequency = self._config.get("updatefrequency", 300)
         self._show_volume = self._config.get("showvolume", False)
         self._period = self._config.get("period", "5d")
+        self._interval = self._config.get("interval", "1h")
+        self._batch_fetch = self._config.get("batchfetch", False)
+        self._incremental = self._config.get("incremental", False)
+        self._prefetch = self._config.get("prefetch", 0)
+        self._chart_engine = self._config.get("chart", "matplotlib")
+        self._partial_refresh = self._config.get("partialrefresh", True)
+        self._full_refresh = self._config.get("fullrefresh", 10)
+        self._sleep_timeout = self._config.get("sleeptimeout", 60)
+        self._metrics = self._config.get("metrics", False)
+        self._metrics_interval = self._config.get("metricsinterval", 600)
+        if self._metrics:
+            metrics.registry.enable()
+        self._pipeline = self._config.get("pipeline", False)
+        self._render_processes = self._config.get("renderprocesses", 0)
+        # built on first use, with the settings above
+        self._frame_renderer = None
+        self._provider = self._config.get("provider", "yfinance")
+        if self._provider == "replay":
+            replay_dir = self._config.get("replaydir", None)
+            if replay_dir is not None:
+                replay_dir = os.path.expanduser(replay_dir)
+            yaticker.YaTicker.set_provider(
+                providers.ReplayProvider(
+                    directory=replay_dir,
+                    latency=self._config.get("replaylatency", 0.0),
+                )
+            )
+        self._history_dir = self._config.get("historydir", None)
+        if self._history_dir is not None:
+            yaticker.YaTicker.set_history_dir(os.path.expanduser(self._history_dir))
+        # symbols displayed at least once, the others can be shown from the history
+        self._displayed = set()
+        # frames prepared in the background when prefetch is set
+        self._prefetcher = None
+        # fetch, render and display stages when pipeline is set
+        self._display_pipeline = None
         self._watchlist = self._config.get("watchlist", ["AMZN", "FB", "APPL"])
         self._watchlist_cycle = cycle(self._watchlist)
 
@@ -59,6 +123,62 @@ class Dashboard(ABC):
     def period(self):
         return self._period
 
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def batch_fetch(self):
+        return self._batch_fetch
+
+    @property
+    def incremental(self):
+        return self._incremental
+
+    @property
+    def prefetch(self):
+        return self._prefetch
+
+    @property
+    def chart_engine(self):
+        return self._chart_engine
+
+    @property
+    def pipeline(self):
+        return self._pipeline
+
+    @property
+    def render_processes(self):
+        return self._render_processes
+
+    @property
+    def partial_refresh(self):
+        return self._partial_refresh
+
+    @property
+    def full_refresh(self):
+        return self._full_refresh
+
+    @property
+    def sleep_timeout(self):
+        return self._sleep_timeout
+
+    @property
+    def metrics_enabled(self):
+        return self._metrics
+
+    @property
+    def metrics_interval(self):
+        return self._metrics_interval
+
+    @property
+    def provider(self):
+        return self._provider
+
+    @property
+    def history_dir(self):
+        return self._history_dir
+
     @property
     def watchlist(self):
         return self._watchlist
@@ -88,10 +208,25 @@ class Dashboard(ABC):
         except Exception as e:
             logging.info(f"Exception: {e}")
 
+    # axes placement of the charts, shared with the persistent renderer
+    chart_layout = staticmethod(chart.layout)
+
     @staticmethod
-    def stock_graph(
-        data, show_volume=False, height=128, width=264, dpi=117, filename="candle.png"
-    ):
+    @metrics.timed("stock_graph")
+    def stock_graph(data, show_volume=False, height=116, width=264, dpi=117):
+        """
+        Renders the stock chart in memory
+        :param data: stock data
+        :param show_volume: whether to draw the volume below the price
+        :param height: height of the chart, in pixels
+        :param width: width of the chart, in pixels
+        :param dpi: resolution of the chart
+        :return: the chart, as a grayscale PIL image
+        """
+        # imported here: they take seconds to import on a Raspberry Pi
+        import matplotlib.pyplot as plt
+        import mplfinance as mplf
+
         fig_size = (width / dpi, height / dpi)
         custom_rc = {
             "font.size": 8,
@@ -100,8 +235,6 @@ class Dashboard(ABC):
             "axes.spines.right": False,
             "axes.spines.top": False,
             "axes.spines.bottom": False,
-            # lets try to have the size behave
-            "figure.figsize": fig_size,
             "axes.xmargin": 0,
             "axes.ymargin": 0,
         }
@@ -116,13 +249,33 @@ class Dashboard(ABC):
             x_axis_datetime_format = "%-d/%-m"
         else:
             x_axis_datetime_format = "%H:%M"
-        fig, _ = mplf.plot(
+
+        # the figure has the exact target size, and the axes are placed so that
+        # everything fits in it: a single rendering, no measuring needed
+        fig = mplf.figure(style=style_settings, figsize=fig_size, dpi=dpi)
+        try:
+            return Dashboard._render_chart(
+                fig,
+                data,
+                show_volume,
+                Dashboard.chart_layout(width, height, dpi, show_volume),
+                x_axis_datetime_format,
+            )
+        finally:
+            # figures are otherwise kept alive by pyplot
+            plt.close(fig)
+
+    @staticmethod
+    def _render_chart(fig, data, show_volume, layout, x_axis_datetime_format):
+        import mplfinance as mplf
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        axes = [fig.add_axes(rect) for rect in layout]
+        mplf.plot(
             data,
-            figsize=fig_size,
+            ax=axes[0],
             type="line",
-            style=style_settings,
-            tight_layout=True,
-            volume=show_volume,
+            volume=axes[1] if show_volume else False,
             # we make the lines thinner
             # see https://github.com/matplotlib/mplfinance/blob/master/examples/widths.ipynb
             update_width_config=dict(line_width=1),
@@ -131,43 +284,423 @@ class Dashboard(ABC):
             datetime_format=x_axis_datetime_format,
             ylabel="",
             ylabel_lower="",
-            scale_padding=0.2,
-            returnfig=True,
         )
-        util.set_size(fig, fig_size)
-        fig.savefig(fname=filename, dpi=dpi, bbox_inches="tight")
-        return filename
+        if show_volume:
+            # dates only below the volume, and no room for the volume labels
+            axes[0].tick_params(labelbottom=False)
+            axes[1].tick_params(labelleft=False)
+        # room for the price labels mplfinance chose, e.g. "90000" or "0.0096"
+        chart.fit_axes(axes, *fig.canvas.get_width_height(), fig.dpi, show_volume)
+
+        # rasterize straight to memory: no PNG encoding, no file
+        canvas = FigureCanvasAgg(fig)
+        canvas.draw()
+        image = Image.frombuffer(
+            "RGBA", canvas.get_width_height(), canvas.buffer_rgba(), "raw", "RGBA", 0, 1
+        )
+        # converting copies the pixels out of the canvas buffer
+        return image.convert("L")
 
-    def display_stock(self, stock="amc", period: str = "5d", interval: str = "1h"):
+    def display_stock(
+        self, stock="amc", period: str = "5d", interval: str = "1h", data=None
+    ):
         """
         Displays the stock data, the stock last price (at the desired coin/fiat)
         :param stock: symbol of the stock to display
         :param period: time period to display
         :param interval: granularity of the data
+        :param data: already retrieved data of the stock. Fetched if None
         :return:
         """
+        stock_data = self.fetch_stock(
+            stock, period=period, interval=interval, data=data
+        )
+        if stock_data is None:
+            return
+        stock_info, data = stock_data
+        image = self.render_stock(stock, stock_info, data)
+        with metrics.timer("display"):
+            self.display_image(image)
+
+    @metrics.timed("fetch")
+    def fetch_stock(
+        self, stock="amc", period: str = "5d", interval: str = "1h", data=None
+    ):
+        """
+        Retrieves the stock info and data
+        :param stock: symbol of the stock
+        :param period: time period to retrieve
+        :param interval: granularity of the data
+        :param data: already retrieved data of the stock. Fetched if None
+        :return: tuple (stock info, data), None if they could not be retrieved
+        """
         try:
             stock_info = yaticker.YaTicker.get_ticker_info(stock)
-            data = yaticker.YaTicker.get_ticker_data(
-                ticker=stock, period=period, interval=interval
-            )
+            if data is None:
+                data = yaticker.YaTicker.get_ticker_data(
+                    ticker=stock,
+                    period=period,
+                    interval=interval,
+                    incremental=self.incremental,
+                )
         except Exception as e:
             logging.error(f"Problem retrieving the data for {stock}... Skipping")
             logging.error(e, exc_info=True)
-            return
+            metrics.increment("fetch_errors")
+            return None
 
         if not stock_info or data.empty:
             logging.error(f"Problem retrieving the data for {stock}... Skipping")
+            return None
+        return stock_info, data
+
+    @property
+    def frame_renderer(self):
+        """Draws the frames, with the settings of the dashboard"""
+        if self._frame_renderer is None:
+            self._frame_renderer = FrameRenderer(
+                self.width, self.height, self.show_volume, self.chart_engine
+            )
+        return self._frame_renderer
+
+    def chart_image(self, data):
+        """
+        Draws the stock chart with the configured chart engine
+        :param data: stock data
+        :return: the chart, as a grayscale PIL image
+        """
+        return self.frame_renderer.chart_image(data)
+
+    def render_stock(self, stock, stock_info, data):
+        """
+        Draws the stock graph, last price and change since the previous close
+        :param stock: symbol of the stock
+        :param stock_info: stock info, as returned by YaTicker.get_ticker_info
+        :param data: stock data, as returned by YaTicker.get_ticker_data
+        :return: the image to display
+        """
+        return self.frame_renderer.render(stock, stock_info, data)
+
+    def display_settings(self):
+        """
+        Displays the currently loaded settings but also current hostname and IP address.
+        Only the settings changed from their default are listed after the main ones,
+        in a second column if they do not fit in the first
+        :return:
+        """
+        try:
+            font_size = 10
+            image = util.empty_image(width=self.width, height=self.height)
+            lines = self.settings_lines()
+            line_height = fonts.text_size("Forum-Regular", font_size, "A\nA")[1]
+            line_height -= fonts.text_size("Forum-Regular", font_size, "A")[1]
+            rows = max(1, self.height // line_height)
+            for first in range(0, len(lines), rows):
+                last = first + rows
+                util.place_text(
+                    img=image,
+                    text="\n".join(lines[first:last]),
+                    x_offset=first // rows * self.width // 2,
+                    font_size=font_size,
+                )
+            self.display_image(image)
+        except Exception as e:
+            logging.info(f"Exception: {e}")
+
+    def settings_lines(self):
+        """Lines of the settings screen, see display_settings"""
+        lines = [
+            "Yaticker info",
+            "-----",
+            f"hostname: {util.get_hostname()}",
+            f"IP: {util.get_ip()}",
+            "-----",
+            f"watchlist: {self.watchlist}",
+            f"cycle: {self.cycle}",
+            f"update frequency: {self.update_frequency}",
+            f"show volume: {self.show_volume}",
+            f"period: {self.period}",
+        ]
+        for label, name, default in self.OPTIONAL_SETTINGS:
+            value = getattr(self, name)
+            if value != default:
+                lines.append(f"{label}: {value}")
+        return lines
+
+    def watchlist_data(self, stock):
+        """
+        Returns the data of stock from a snapshot of the whole watchlist, retrieved in
+        a single batched request (and refreshed when the cached snapshot expires)
+        :param stock: symbol of the stock
+        :return: the stock data, None if the batched request did not return it
+        """
+        try:
+            snapshot = yaticker.YaTicker.get_watchlist_data(
+                self.watchlist, period=self.period, interval=self.interval
+            )
+        except Exception as e:
+            logging.error("Problem retrieving the watchlist data")
+            logging.error(e, exc_info=True)
+            return None
+        return snapshot.get(stock.upper())
+
+    def prepared_data(self, stock):
+        """
+        Returns the data of stock already at hand (stored on disk for a warm start, or
+        from the watchlist snapshot in batch fetch mode), None if it must be fetched
+        :param stock: symbol of the stock
+        :return:
+        """
+        data = None
+        if self.incremental and stock not in self._displayed:
+            # warm start: first display the bars stored on disk, refresh on next pass
+            data = yaticker.YaTicker.get_stored_ticker_data(
+                stock, period=self.period, interval=self.interval
+            )
+        self._displayed.add(stock)
+        if data is None and self.batch_fetch:
+            data = self.watchlist_data(stock)
+        return data
+
+    def display_next_stock(self):
+        stock = next(self._watchlist_cycle)
+        self.display_stock(
+            stock=stock,
+            period=self.period,
+            interval=self.interval,
+            data=self.prepared_data(stock),
+        )
+
+    def prefetch_frames(self):
+        """
+        Starts fetching and rendering the next stocks of the watchlist in the background
+        :return: the started FramePrefetcher
+        """
+
+        def fetch(stock):
+            return self.fetch_stock(
+                stock,
+                period=self.period,
+                interval=self.interval,
+                data=self.prepared_data(stock),
+            )
+
+        def render(stock, stock_data):
+            return self.render_stock(stock, *stock_data)
+
+        return pipeline.FramePrefetcher(
+            self._watchlist_cycle,
+            fetch=fetch,
+            render=render,
+            depth=self.prefetch,
+            workers=self.prefetch,
+            max_backoff=self.update_frequency,
+        ).start()
+
+    def start_display_pipeline(self):
+        """
+        Starts the fetch, render and display stages of the pipeline mode. Frames are
+        rendered on a pool of render_processes processes, or on a thread if 0
+        :return: the started pipeline.DisplayPipeline
+        """
+
+        def fetch(stock):
+            return self.fetch_stock(
+                stock,
+                period=self.period,
+                interval=self.interval,
+                data=self.prepared_data(stock),
+            )
+
+        render_executor = None
+        if self.render_processes > 0:
+            # spawned: forking a process holding the fetch threads is not safe
+            render_executor = futures.ProcessPoolExecutor(
+                max_workers=self.render_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return pipeline.DisplayPipeline(
+            fetch=fetch,
+            render=functools.partial(render_frame, self.frame_renderer),
+            display=metrics.timed("display")(self.display_image),
+            render_executor=render_executor,
+        ).start()
+
+    def submit_next_stock(self):
+        """
+        Queues the next stock of the watchlist in the pipeline. If it is full, the
+        oldest stock still waiting to be rendered is dropped to make room
+        """
+        self._display_pipeline.submit(next(self._watchlist_cycle), replace_oldest=True)
+
+    def schedule_watchlist(self, loop):
+        """
+        Displays the next stock of the watchlist on the job worker of loop now, then
+        every update_frequency seconds if cycle is set. In pipeline mode, the stocks
+        are queued in the pipeline instead: the ones queued before (re)scheduling are
+        dropped, and so is the oldest one waiting when the pipeline is full
+        :param loop: the runtime.EventLoop
+        :return: the runtime.Timer of the cycle, None if not cycling
+        """
+        job = self.display_next_stock
+        if self.cycle and self.prefetch > 0:
+            if self._prefetcher is None:
+                self._prefetcher = self.prefetch_frames()
+                loop.on_stop(self._stop_prefetching)
+            job = self.display_next_prefetched
+        elif self.pipeline:
+            if self._display_pipeline is None:
+                self._display_pipeline = self.start_display_pipeline()
+                loop.on_stop(self._stop_pipeline)
+            # restarting the cycle: the stocks queued so far are outdated
+            self._display_pipeline.cancel()
+            if not self.cycle:
+                self.submit_next_stock()
+                return None
+            return loop.call_every(
+                self.update_frequency, self.submit_next_stock, delay=0
+            )
+        if not self.cycle:
+            loop.submit(job)
+            return None
+        return loop.call_every(self.update_frequency, loop.submit, job, delay=0)
+
+    def display_next_prefetched(self):
+        """
+        Displays the next frame prepared in the background, skipping this cycle if
+        none is ready (the job worker must not wait: the buttons share it). Frames
+        prepared more than update_frequency seconds ago are prepared again
+        """
+        try:
+            _, frame = self._prefetcher.get(timeout=0, max_age=self.update_frequency)
+        except queue.Empty:
+            logging.info("No prefetched frame ready... Skipping")
             return
+        self.display_image(frame)
+
+    def _stop_prefetching(self):
+        self._prefetcher.stop()
+        self._prefetcher = None
+
+    def _stop_pipeline(self):
+        self._display_pipeline.stop(timeout=1)
+        self._display_pipeline = None
+
+    def schedule_metrics(self, loop):
+        """
+        Logs the metrics every metrics_interval seconds, if metrics are enabled
+        :param loop: the runtime.EventLoop
+        :return: the runtime.Timer of the logs, None if not logging
+        """
+        if not self.metrics_enabled or self.metrics_interval <= 0:
+            return None
+        return loop.call_every(self.metrics_interval, metrics.registry.log_summary)
+
+    def cycle_through_watchlist(self):
+        """
+        Displays the next stock of the watchlist. When cycling, blocks displaying the
+        next stock every update_frequency seconds
+        """
+        if not self.cycle:
+            self.display_next_stock()
+            return
+        loop = runtime.EventLoop()
+        self.schedule_watchlist(loop)
+        self.schedule_metrics(loop)
+        loop.run()
+
+
+class FrameRenderer(object):
+    """
+    Draws the frames of the stocks. Only its settings are pickled, so that frames can
+    be rendered by a pool of processes (see render_frame)
+    """
+
+    def __init__(self, width, height, show_volume=False, chart_engine="matplotlib"):
+        self._width = width
+        self._height = height
+        self._show_volume = show_volume
+        self._chart_engine = chart_engine
+        # built on first use, then only updated for every stock
+        self._chart_renderer = None
+        self._chart_lock = threading.Lock()
+
+    @property
+    def width(self):
+        return self._width
 
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def show_volume(self):
+        return self._show_volume
+
+    @property
+    def chart_engine(self):
+        return self._chart_engine
+
+    @property
+    def settings(self):
+        return self.width, self.height, self.show_volume, self.chart_engine
+
+    def __getstate__(self):
+        return self.settings
+
+    def __setstate__(self, settings):
+        self.__init__(*settings)
+
+    @metrics.timed("chart")
+    def chart_image(self, data):
+        """
+        Draws the stock chart with the configured chart engine: "matplotlib" updates
+        a persistent figure, "mplfinance" builds a new figure for every chart and
+        "native" draws straight into the image, without matplotlib
+        :param data: stock data
+        :return: the chart, as a grayscale PIL image
+        """
+        if self.chart_engine == "mplfinance":
+            return Dashboard.stock_graph(data, show_volume=self.show_volume)
+        with self._chart_lock:
+            if self._chart_renderer is None:
+                if self.chart_engine == "native":
+                    renderer = nativechart.NativeChartRenderer
+                else:
+                    renderer = chart.ChartRenderer
+                self._chart_renderer = renderer(show_volume=self.show_volume)
+            return self._chart_renderer.render(data)
+
+    @metrics.timed("render")
+    def render(self, stock, stock_info, data):
+        """
+        Draws the stock graph, last price and change since the previous close
+        :param stock: symbol of the stock
+        :param stock_info: stock info, as returned by YaTicker.get_ticker_info
+        :param data: stock data, as returned by YaTicker.get_ticker_data
+        :return: the image to display
+        """
         # we clear the image first
         image = util.empty_image(width=self.width, height=self.height)
         ImageDraw.Draw(image)
 
         # we draw the stock graph
-        stock_image = Image.open(self.stock_graph(data, show_volume=self.show_volume))
+        stock_image = self.chart_image(data)
         image.paste(stock_image, (0, 0))
 
+        self.draw_labels(image, stock, stock_info, data)
+        return image
+
+    @metrics.timed("text")
+    def draw_labels(self, image, stock, stock_info, data):
+        """
+        Draws the last price, the symbol, the change since the previous close and the
+        date of the last bar over the stock graph
+        :param image: the image to draw on
+        :param stock: symbol of the stock
+        :param stock_info: stock info, as returned by YaTicker.get_ticker_info
+        :param data: stock data, as returned by YaTicker.get_ticker_data
+        """
         # lets define the different text heights here so that we can do calculations easily
         stock_price_font_size = 48
         symbol_font_size = 20
@@ -175,7 +708,7 @@ class Dashboard(ABC):
         last_date_font_size = 10
 
         # we draw the latest stock's price
-        latest_price = data["Close"][-1]
+        latest_price = data["Close"].iloc[-1]
         closing_str = f"{currency.symbol('USD')}{util.number_to_string(latest_price)}"
         y_offset = self.height - (stock_price_font_size + last_date_font_size)
         util.place_text_right(
@@ -226,47 +759,20 @@ class Dashboard(ABC):
             font_name="Roboto-Medium",
         )
 
-        # we display the final image
-        self.display_image(image)
-
-    def display_settings(self):
-        """
-        Displays the currently loaded settings but also current hostname and IP address
-        :return:
-        """
-        try:
-            font_size = 10
-            image = util.empty_image(width=self.width, height=self.height)
-            ImageDraw.Draw(image)
-            info = inspect.cleandoc(
-                f"""
-                Yaticker info
-                -----
-                hostname: {util.get_hostname()}
-                IP: {util.get_ip()}
-                -----
-                watchlist: {self.watchlist}
-                cycle: {self.cycle}
-                update frequency: {self.update_frequency}
-                show volume: {self.show_volume}
-                period: {self.period}
-            """
-            )
-            util.place_text(img=image, text=info, font_size=font_size)
-            self.display_image(image)
-        except Exception as e:
-            logging.info(f"Exception: {e}")
-
-    def cycle_through_watchlist(self):
-        self.display_stock(stock=next(self._watchlist_cycle), period=self.period)
-        if self.cycle is False:
-            return
 
-        s = sched.scheduler(time.time, time.sleep)
+# renderers of the process, kept from one frame to the next (see render_frame)
+_frame_renderers = {}
 
-        def cycle_watchlist(sc):
-            self.display_stock(stock=next(self._watchlist_cycle), period=self.period)
-            s.enter(5, 1, cycle_watchlist, (sc,))
 
-        s.enter(5, 1, cycle_watchlist, (s,))
-        s.run()
+def render_frame(renderer: FrameRenderer, stock, stock_data):
+    """
+    Renders the frame of a stock. In a worker process, the renderer received is
+    replaced by the one of the process with the same settings, whose chart is
+    already built
+    :param renderer: renderer with the settings of the frame
+    :param stock: symbol of the stock
+    :param stock_data: tuple (stock info, data), as returned by Dashboard.fetch_stock
+    :return: the image to display
+    """
+    renderer = _frame_renderers.setdefault(renderer.settings, renderer)
+    return renderer.render(stock, *stock_data)
@@ -0,0 +1,312 @@
+import hashlib
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from PIL import ImageChops
+
+from yaticker import metrics
+
+# how the frames are pushed to the panel
+FULL = "full"
+FAST = "fast"
+PARTIAL = "partial"
+SKIP = "skip"
+
+# partial refreshes cover whole bytes of the panel memory (8 pixels)
+ALIGNMENT = 8
+
+
+class Driver(ABC):
+    """
+    Pushes frames to an e-paper panel. Panels without partial (or fast) refreshes
+    only implement full and leave PARTIAL (or FAST) False.
+    """
+
+    FAST = False
+    PARTIAL = False
+
+    @abstractmethod
+    def full(self, image):
+        """Refreshes the whole panel, in 4 grays, clearing the ghosting"""
+
+    def fast(self, image):
+        """Refreshes the whole panel in black and white, faster than full"""
+        raise NotImplementedError
+
+    def partial(self, image, box):
+        """
+        Refreshes only a region of the panel
+        :param image: the whole frame
+        :param box: region to refresh (left, upper, right, lower), aligned on ALIGNMENT
+        """
+        raise NotImplementedError
+
+    def sleep(self):
+        """Puts the panel in deep sleep, the next refresh wakes it up"""
+
+
+def frame_digest(image) -> bytes:
+    """Digest of the pixels of a frame, to detect identical frames"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.digest()
+
+
+def dirty_box(previous, image):
+    """
+    Smallest region containing every pixel that differs between two frames,
+    extended to ALIGNMENT
+    :return: the region (left, upper, right, lower), None if the frames are identical
+    """
+    box = ImageChops.difference(previous.convert("L"), image.convert("L")).getbbox()
+    if box is None:
+        return None
+    width, height = image.size
+    left, upper, right, lower = box
+    return (
+        left // ALIGNMENT * ALIGNMENT,
+        upper // ALIGNMENT * ALIGNMENT,
+        min(-(-right // ALIGNMENT) * ALIGNMENT, width),
+        min(-(-lower // ALIGNMENT) * ALIGNMENT, height),
+    )
+
+
+def pushed_bytes(mode: str, box) -> int:
+    """Bytes sent to the panel: 2 bits per pixel in 4 grays, 1 in black and white"""
+    left, upper, right, lower = box
+    pixels = (right - left) * (lower - upper)
+    return pixels // 4 if mode == FULL else pixels // 8
+
+
+class FrameUpdater(object):
+    """
+    Keeps the last frame pushed to the panel and picks the cheapest refresh for the
+    next one: none if it is identical, a partial refresh of the changed region if it
+    is small enough, a fast refresh otherwise. Every full_every refreshes, a full
+    refresh clears the ghosting left by the partial and fast ones.
+    """
+
+    def __init__(self, driver: Driver, full_every: int = 10, partial_ratio=0.3):
+        """
+        :param driver: driver of the panel
+        :param full_every: number of refreshes between two full refreshes, 1 to only
+            do full refreshes
+        :param partial_ratio: largest part of the panel updated with a partial
+            refresh, 0 to disable partial refreshes
+        """
+        self._driver = driver
+        self._full_every = max(1, full_every)
+        self._partial_ratio = partial_ratio
+        self._frame = None
+        self._digest = None
+        self._since_full = 0
+        self.stats = {
+            "updates": 0,
+            "skipped": 0,
+            FULL: 0,
+            FAST: 0,
+            PARTIAL: 0,
+            "bytes": 0,
+        }
+
+    @property
+    def driver(self):
+        return self._driver
+
+    @property
+    def frame(self):
+        """Last frame pushed to the panel"""
+        return self._frame
+
+    def plan(self, image):
+        """
+        Picks how to push the frame, without pushing it
+        :return: tuple (refresh mode, region to refresh)
+        """
+        whole = (0, 0) + image.size
+        if self._frame is None or self._frame.size != image.size:
+            return FULL, whole
+        if frame_digest(image) == self._digest:
+            return SKIP, None
+        if self._since_full + 1 >= self._full_every:
+            return FULL, whole
+        box = dirty_box(self._frame, image)
+        if box is None:
+            return SKIP, None
+        if self._driver.PARTIAL:
+            ratio = pushed_bytes(PARTIAL, box) / pushed_bytes(PARTIAL, whole)
+            if ratio <= self._partial_ratio:
+                return PARTIAL, box
+        if self._driver.FAST:
+            return FAST, whole
+        return FULL, whole
+
+    def update(self, image):
+        """
+        Pushes the frame to the panel, if it changed
+        :param image: the frame
+        :return: the refresh mode used
+        """
+        self.stats["updates"] += 1
+        mode, box = self.plan(image)
+        if mode == SKIP:
+            self.stats["skipped"] += 1
+            return mode
+        if mode == PARTIAL:
+            self._driver.partial(image, box)
+        elif mode == FAST:
+            self._driver.fast(image)
+        else:
+            self._driver.full(image)
+        logging.debug(f"{mode} refresh of {box}")
+
+        self._since_full = 0 if mode == FULL else self._since_full + 1
+        self._frame = image.copy()
+        self._digest = frame_digest(image)
+        self.stats[mode] += 1
+        self.stats["bytes"] += pushed_bytes(mode, box)
+        return mode
+
+    def reset(self):
+        """Forgets the last frame (e.g. the panel was cleared): next refresh is full"""
+        self._frame = None
+        self._digest = None
+
+    def force_full(self):
+        """
+        Makes the next refresh full, e.g. when the panel controller lost the frame
+        partial refreshes are based on. Identical frames are still skipped
+        """
+        self._since_full = self._full_every
+
+
+class DisplaySession(object):
+    """
+    Pushes the frames to the panel from a worker thread, so that showing a frame
+    does not block. Only the latest frame matters: frames superseded before the
+    worker gets to them are dropped. The panel is put to sleep after idle_timeout
+    seconds without refresh, and woken up by the next refresh.
+    """
+
+    def __init__(self, updater: FrameUpdater, idle_timeout=60.0, on_sleep=None):
+        """
+        :param updater: pushes the frames to the panel
+        :param idle_timeout: seconds without refresh before the panel sleeps
+        :param on_sleep: called after the panel was put to sleep, on the worker thread
+        """
+        self._updater = updater
+        self._idle_timeout = idle_timeout
+        self._on_sleep = on_sleep
+        self._condition = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._stopping = False
+        self._asleep = True
+        self._worker = None
+        self.stats = {"shown": 0, "dropped": 0, "sleeps": 0, "errors": 0}
+
+    @property
+    def updater(self):
+        return self._updater
+
+    @property
+    def asleep(self):
+        return self._asleep
+
+    def start(self):
+        with self._condition:
+            if self._worker is not None:
+                return
+            self._stopping = False
+            self._worker = threading.Thread(
+                target=self._run, name="yaticker-display", daemon=True
+            )
+            self._worker.start()
+
+    def stop(self, timeout=None):
+        """Pushes the pending frame, puts the panel to sleep and stops the worker"""
+        with self._condition:
+            worker = self._worker
+            self._stopping = True
+            self._condition.notify_all()
+        if worker is not None:
+            worker.join(timeout)
+        self._worker = None
+
+    def show(self, image):
+        """
+        Queues the frame to be pushed, replacing the one not pushed yet if any
+        :param image: the frame
+        """
+        with self._condition:
+            self.stats["shown"] += 1
+            if self._pending is not None:
+                self.stats["dropped"] += 1
+            self._pending = image
+            self._condition.notify_all()
+
+    def flush(self, timeout=None) -> bool:
+        """
+        Waits until the queued frame was pushed
+        :return: False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._pending is None and not self._busy, timeout
+            )
+
+    def _run(self):
+        idle_since = time.monotonic()
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    remaining = idle_since + self._idle_timeout - time.monotonic()
+                    if not self._asleep and remaining <= 0:
+                        break
+                    self._condition.wait(remaining if not self._asleep else None)
+                image, self._pending = self._pending, None
+                self._busy = image is not None
+                stopping = self._stopping
+
+            if image is not None:
+                self._push(image)
+                idle_since = time.monotonic()
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+                if not stopping:
+                    continue
+            if not self._asleep:
+                self._sleep()
+            if stopping:
+                return
+
+    def _push(self, image):
+        try:
+            start = time.perf_counter()
+            mode = self._updater.update(image)
+            if mode != SKIP:
+                metrics.registry.observe(f"refresh_{mode}", time.perf_counter() - start)
+                self._asleep = False
+        except Exception as e:
+            self.stats["errors"] += 1
+            metrics.increment("refresh_errors")
+            logging.error("Unable to refresh the display")
+            logging.error(e, exc_info=True)
+
+    def _sleep(self):
+        # the controller may lose the frame partial refreshes are based on
+        self._updater.force_full()
+        self._asleep = True
+        try:
+            self._updater.driver.sleep()
+            self.stats["sleeps"] += 1
+            if self._on_sleep is not None:
+                self._on_sleep()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logging.error("Unable to put the display to sleep")
+            logging.error(e, exc_info=True)
@@ -0,0 +1,136 @@
+import io
+
+# how the columns of a bar are aggregated when downsampling
+AGGREGATIONS = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+}
+
+
+def select_columns(data, columns: list):
+    """
+    Keeps only the requested columns (case insensitive)
+    :raises ValueError: if a column does not exist
+    """
+    by_name = {str(column).lower(): column for column in data.columns}
+    unknown = [column for column in columns if column.lower() not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return data[[by_name[column.lower()] for column in columns]]
+
+
+def parse_timestamp(value: str, tz=None):
+    """
+    Parses a POSIX timestamp (in seconds) or an ISO 8601 date/time
+    :param value: the timestamp to parse
+    :param tz: timezone of date/times without one. UTC if None
+    :return: a timezone aware pd.Timestamp
+    :raises ValueError: if the value cannot be parsed
+    """
+    import pandas as pd
+
+    try:
+        return pd.Timestamp(float(value), unit="s", tz="UTC")
+    except ValueError:
+        pass
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize(tz or "UTC")
+    return timestamp
+
+
+def since(data, timestamp):
+    """Keeps the bars after timestamp"""
+    if data.empty:
+        # e.g. unknown symbol, not even indexed by timestamp
+        return data
+    if data.index.tz is None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return data[data.index > timestamp]
+
+
+def downsample(data, max_points: int):
+    """
+    Merges consecutive bars so that there are at most max_points of them.
+    Open is the first of the merged bars, High the max, Low the min, Close the last
+    and Volume the sum. Bars are timestamped by their first bar.
+    """
+    if max_points <= 0:
+        raise ValueError("The maximum number of points must be positive")
+    if len(data) <= max_points:
+        return data
+    import numpy as np
+
+    buckets = np.arange(len(data)) * max_points // len(data)
+    aggregations = {column: AGGREGATIONS.get(column, "last") for column in data.columns}
+    merged = data.groupby(buckets).agg(aggregations)
+    merged.index = data.index[np.searchsorted(buckets, merged.index)]
+    return merged
+
+
+def _epoch_millis(index):
+    import pandas as pd
+
+    if len(index) == 0:
+        return pd.Index([], dtype="int64")
+    if index.tz is not None:
+        index = index.tz_convert("UTC")
+    epoch = pd.Timestamp("1970-01-01", tz=index.tz)
+    return (index - epoch) // pd.Timedelta(milliseconds=1)
+
+
+def to_index_json(data) -> str:
+    """One object per bar, keyed by timestamp (the historical format)"""
+    return data.to_json(orient="index")
+
+
+def to_columns_json(data) -> str:
+    """One array per column, plus a "timestamp" array in epoch milliseconds"""
+    import pandas as pd
+
+    arrays = [
+        f'"timestamp":{pd.Series(_epoch_millis(data.index)).to_json(orient="values")}'
+    ]
+    for column in data.columns:
+        values = data[column].to_json(orient="values")
+        arrays.append(f'"{column}":{values}')
+    return "{" + ",".join(arrays) + "}"
+
+
+def to_csv(data) -> str:
+    return data.to_csv()
+
+
+def to_msgpack(data) -> bytes:
+    """Same layout as to_columns_json, requires the msgpack package"""
+    import msgpack
+
+    columns = {"timestamp": _epoch_millis(data.index).tolist()}
+    for column in data.columns:
+        values = data[column].astype(object)
+        columns[str(column)] = values.where(data[column].notna(), None).tolist()
+    return msgpack.packb(columns)
+
+
+def to_arrow(data) -> bytes:
+    """Arrow IPC stream of the bars and their timestamp, requires the pyarrow package"""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(data.rename_axis("timestamp").reset_index())
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+# format name: (serializer, content type)
+FORMATS = {
+    "json": (to_index_json, "application/json"),
+    "columns": (to_columns_json, "application/json"),
+    "csv": (to_csv, "text/csv"),
+    "msgpack": (to_msgpack, "application/msgpack"),
+    "arrow": (to_arrow, "application/vnd.apache.arrow.stream"),
+}
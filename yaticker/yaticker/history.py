@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+
+
+class HistoryStore(object):
+    """
+    On-disk store of bars, one file per (symbol, interval).
+    Bars are stored column by column in a float64 .npy array (the first row being
+    the timestamps in seconds) so that they can be memory mapped back without copy.
+    A json file next to it keeps the column names, timezone and period covered.
+    """
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def _path(self, symbol: str, interval: str, extension: str) -> str:
+        name = f"{symbol.upper()}_{interval}".replace(os.sep, "-")
+        return os.path.join(self._directory, f"{name}.{extension}")
+
+    def load(self, symbol: str, interval: str):
+        """
+        Loads the stored bars of symbol
+        :param symbol: symbol of the stock
+        :param interval: granularity of the data
+        :return: tuple (bars, period), None if nothing is stored or the files are unreadable
+        """
+        import numpy as np
+        import pandas as pd
+
+        try:
+            with open(self._path(symbol, interval, "json")) as f:
+                meta = json.load(f)
+            values = np.load(self._path(symbol, interval, "npy"), mmap_mode="r")
+            # the two files are replaced one after the other: a crash in between
+            # leaves a sidecar that does not describe the array, handled as a miss
+            if values.ndim != 2 or values.shape[0] != len(meta["columns"]) + 1:
+                logging.error(
+                    f"Mismatching history files of {symbol} ({interval}), ignoring them"
+                )
+                return None
+            index = pd.to_datetime(values[0].astype("int64"), unit="s", utc=True)
+            if meta.get("tz") is not None:
+                index = index.tz_convert(meta["tz"])
+            else:
+                index = index.tz_localize(None)
+            # values[1:].T has the (columns, rows) layout pandas uses internally: no copy
+            bars = pd.DataFrame(
+                values[1:].T, index=index, columns=meta["columns"], copy=False
+            )
+            return bars, meta["period"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Unable to load the history of {symbol} ({interval})")
+            logging.error(e, exc_info=True)
+            return None
+
+    def save(self, symbol: str, interval: str, bars, period: str):
+        """
+        Stores the bars of symbol, replacing the previous ones (each file atomically)
+        :param symbol: symbol of the stock
+        :param interval: granularity of the data
+        :param bars: bars indexed by timestamp
+        :param period: time period covered by the bars
+        :return:
+        """
+        import numpy as np
+        import pandas as pd
+
+        columns = [c for c in bars.columns if pd.api.types.is_numeric_dtype(bars[c])]
+        values = np.empty((len(columns) + 1, len(bars)), dtype="float64")
+        tz = bars.index.tz
+        index = bars.index.tz_convert("UTC") if tz is not None else bars.index
+        epoch = pd.Timestamp("1970-01-01", tz=index.tz)
+        values[0] = (index - epoch) // pd.Timedelta(seconds=1)
+        for row, column in enumerate(columns, start=1):
+            values[row] = bars[column].to_numpy(dtype="float64", na_value=np.nan)
+        meta = {
+            "columns": columns,
+            "tz": str(tz) if tz is not None else None,
+            "period": period,
+        }
+
+        npy_path = self._path(symbol, interval, "npy")
+        json_path = self._path(symbol, interval, "json")
+        with open(f"{npy_path}.tmp", "wb") as f:
+            np.save(f, values)
+        with open(f"{json_path}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{npy_path}.tmp", npy_path)
+        os.replace(f"{json_path}.tmp", json_path)
+
+    def delete(self, symbol: str, interval: str):
+        for extension in ("npy", "json"):
+            try:
+                os.remove(self._path(symbol, interval, extension))
+            except FileNotFoundError:
+                pass
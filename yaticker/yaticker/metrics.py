@@ -0,0 +1,242 @@
+import functools
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+# quantiles of the stage durations, as reported by the /metrics route and the logs
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram(object):
+    """
+    Durations of a stage: count and sum of every sample, quantiles of the last window
+    samples (recent durations matter more than the ones of the first hours)
+    """
+
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: quantile, between 0 and 1
+        :return: the nearest-rank quantile of the window, 0 if empty
+        """
+        samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def snapshot(self) -> dict:
+        snapshot = {"count": self.count, "sum": self.sum}
+        for q in QUANTILES:
+            snapshot[f"p{round(q * 100)}"] = self.quantile(q)
+        return snapshot
+
+
+class _Timer(object):
+    def __init__(self, registry, name: str):
+        self._registry = registry
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._registry.observe(self._name, time.perf_counter() - self._start)
+        if exc_type is not None:
+            self._registry.increment(f"{self._name}_errors")
+        return False
+
+
+class _NullTimer(object):
+    """Timer doing nothing, returned while the registry is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Registry(object):
+    """
+    Timings of the stages (fetch, chart, refresh...), error counters and gauges (e.g.
+    cache hit ratios) of the process. Disabled, timers and counters do nothing: the
+    hooks left in the code only cost a check of enabled.
+    """
+
+    def __init__(self, enabled: bool = False, window: int = 1024):
+        """
+        :param enabled: whether timings and counters are recorded
+        :param window: number of durations the quantiles of a stage are computed on
+        """
+        self.enabled = enabled
+        self._window = window
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def timer(self, name: str):
+        """
+        Times a block, e.g. with registry.timer("chart"): ... Exceptions raised by the
+        block are counted in name_errors
+        :param name: name of the stage
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name: str):
+        """Decorator timing every call of a function, as timer"""
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Timer(self, name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def observe(self, name: str, seconds: float):
+        """Records a duration of the stage name"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self._window)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: int = 1):
+        """Increments the counter name, e.g. the errors of a stage"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def gauge(self, name: str, function):
+        """
+        Registers a gauge, read when the metrics are collected
+        :param name: name of the gauge
+        :param function: function returning the value of the gauge, None if unknown
+        """
+        with self._lock:
+            self._gauges[name] = function
+
+    def clear(self):
+        """Forgets the timings and counters recorded so far (not the gauges)"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def collect(self) -> dict:
+        """
+        :return: dict with the "timings" (dict stage -> count, sum, p50, p95 and p99
+            in seconds), "counters" and "gauges" of the process
+        """
+        with self._lock:
+            timings = {
+                name: histogram.snapshot()
+                for name, histogram in self._histograms.items()
+            }
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        values = {}
+        for name, function in gauges.items():
+            try:
+                values[name] = function()
+            except Exception as e:
+                logging.error(f"Problem reading the gauge {name}: {e!r}")
+        return {"timings": timings, "counters": counters, "gauges": values}
+
+    def prometheus(self, prefix: str = "yaticker") -> str:
+        """
+        The metrics in the Prometheus text format: the stage durations as a summary
+        labelled by stage, then one metric per counter and gauge
+        """
+        metrics = self.collect()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Duration of the stages",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, timing in sorted(metrics["timings"].items()):
+            label = f'stage="{stage}"'
+            for q in QUANTILES:
+                value = timing[f"p{round(q * 100)}"]
+                lines.append(
+                    f'{prefix}_stage_seconds{{{label},quantile="{q}"}} {value}'
+                )
+            lines.append(f"{prefix}_stage_seconds_sum{{{label}}} {timing['sum']}")
+            lines.append(f"{prefix}_stage_seconds_count{{{label}}} {timing['count']}")
+        for name, value in sorted(metrics["counters"].items()):
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in sorted(metrics["gauges"].items()):
+            if value is None:
+                continue
+            metric = f"{prefix}_{_metric_name(name)}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """One line summary of the metrics, for the logs"""
+        metrics = self.collect()
+        parts = [
+            f"{stage} n={timing['count']} p50={timing['p50'] * 1000:.1f}ms "
+            f"p95={timing['p95'] * 1000:.1f}ms p99={timing['p99'] * 1000:.1f}ms"
+            for stage, timing in sorted(metrics["timings"].items())
+        ]
+        parts += [
+            f"{name}={value}" for name, value in sorted(metrics["counters"].items())
+        ]
+        parts += [
+            f"{name}={value:.2f}"
+            for name, value in sorted(metrics["gauges"].items())
+            if value is not None
+        ]
+        return "; ".join(parts)
+
+    def log_summary(self):
+        logging.info(f"Metrics: {self.summary()}")
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def hit_ratio(hits: int, misses: int):
+    """Share of the lookups found in a cache, None before the first lookup"""
+    lookups = hits + misses
+    return hits / lookups if lookups else None
+
+
+# metrics of the process, shared by the dashboard, the web app and the cli
+registry = Registry()
+timer = registry.timer
+timed = registry.timed
+increment = registry.increment
+gauge = registry.gauge
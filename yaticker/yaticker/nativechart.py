@@ -0,0 +1,258 @@
+import math
+
+import numpy as np
+from PIL import Image, ImageDraw
+from util import fonts
+
+# grayscale levels of the colors of the mplfinance "binance" style
+LINE_GRAY = 99
+VOLUME_UP_GRAY = 132
+VOLUME_DOWN_GRAY = 83
+
+# font of the axis labels, as matplotlib's
+LABEL_FONT = "DejaVuSans"
+
+
+def datetime_format(index) -> str:
+    """Day/month for dates spanning several days, hours:minutes otherwise"""
+    if (index[-1] - index[0]).days > 1:
+        return "%-d/%-m"
+    return "%H:%M"
+
+
+def minmax_downsample(values, columns):
+    """
+    Reduces the values to the first, min, max and last value of each pixel column,
+    which draws exactly the same pixels as the whole line (M4 aggregation)
+    :param values: values to draw, evenly spaced
+    :param columns: number of pixel columns they are drawn on
+    :return: tuple (x, y) of the points to draw, x being the pixel column
+    """
+    count = len(values)
+    if count <= columns:
+        return np.linspace(0, columns - 1, count), values
+    column = np.arange(count) * columns // count
+    starts = np.flatnonzero(np.diff(column, prepend=-1))
+    ends = np.append(starts[1:], count) - 1
+    x = np.repeat(column[starts], 4).astype("float64")
+    y = np.empty(len(x))
+    y[0::4] = values[starts]
+    y[1::4] = np.minimum.reduceat(values, starts)
+    y[2::4] = np.maximum.reduceat(values, starts)
+    y[3::4] = values[ends]
+    return x, y
+
+
+def lttb_downsample(values, columns):
+    """
+    Reduces the values to one point per pixel column with the Largest Triangle Three
+    Buckets algorithm, which keeps the shape of the line with fewer points than
+    minmax_downsample but can miss isolated spikes
+    :param values: values to draw, evenly spaced
+    :param columns: number of pixel columns they are drawn on
+    :return: tuple (x, y) of the points to draw, x being the pixel column
+    """
+    count = len(values)
+    if count <= columns or columns < 3:
+        return minmax_downsample(values, columns)
+    positions = np.arange(count, dtype="float64")
+    # first and last points are kept, the others are split in columns - 2 buckets
+    edges = np.linspace(1, count - 1, columns - 1).astype(int)
+    selected = np.empty(columns, dtype=int)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = 0
+    for bucket in range(columns - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else count
+        average_x = positions[end:next_end].mean()
+        average_y = values[end:next_end].mean()
+        # twice the area of the triangles previous point, candidate, next average
+        base_x = positions[previous] - average_x
+        base_y = average_y - values[previous]
+        areas = base_x * (values[start:end] - values[previous])
+        areas += (positions[start:end] - positions[previous]) * base_y
+        areas = np.abs(areas)
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected * (columns - 1) / (count - 1), values[selected]
+
+
+DOWNSAMPLERS = {"minmax": minmax_downsample, "lttb": lttb_downsample}
+
+
+def nice_ticks(low, high, count=3):
+    """
+    Round values between low and high for the axis labels
+    :param low: lowest value of the axis
+    :param high: highest value of the axis
+    :param count: maximum number of values
+    :return: tuple (ticks, decimals needed to print them)
+    """
+    span = high - low
+    if span <= 0:
+        return np.array([low]), 2
+    raw_step = span / count
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(
+        factor * magnitude
+        for factor in (1, 2, 2.5, 5, 10)
+        if factor * magnitude >= raw_step
+    )
+    ticks = np.arange(math.ceil(low / step), math.floor(high / step) + 1) * step
+    decimals = max(0, -math.floor(math.log10(step)))
+    if round(step, decimals) != step:
+        decimals += 1
+    return ticks, decimals
+
+
+def date_ticks(index, date_format):
+    """
+    Positions of the bars starting a new day (or hour for intraday charts)
+    :param index: dates of the bars
+    :param date_format: format of the labels, as returned by datetime_format
+    """
+    keys = (index.year * 10000 + index.month * 100 + index.day).to_numpy()
+    if date_format == "%H:%M":
+        keys = keys * 100 + index.hour.to_numpy()
+    return np.flatnonzero(np.diff(keys, prepend=-1))
+
+
+class NativeChartRenderer(object):
+    """
+    Line chart of the close price (and optionally the volume) drawn directly in a PIL
+    image, without matplotlib. Values are downsampled to the pixel columns of the
+    chart before drawing, so thousands of bars cost about as much as a few hundred.
+    Same interface and look as yaticker.chart.ChartRenderer.
+    """
+
+    def __init__(
+        self,
+        width=264,
+        height=116,
+        dpi=117,
+        show_volume=False,
+        downsample="minmax",
+        font_size=8,
+    ):
+        if downsample not in DOWNSAMPLERS:
+            raise ValueError(f"Unknown downsampling {downsample}")
+        self._width = width
+        self._height = height
+        self._show_volume = show_volume
+        self._downsample = DOWNSAMPLERS[downsample]
+        self._font_px = round(font_size * dpi / 72)
+        self._font = fonts.get_font(LABEL_FONT, self._font_px)
+
+    @property
+    def size(self):
+        return self._width, self._height
+
+    @property
+    def show_volume(self):
+        return self._show_volume
+
+    def render(self, data):
+        """
+        Draws the data
+        :param data: stock data, with at least a Close column (and Open and Volume to
+            show the volume)
+        :return: the chart, as a grayscale PIL image
+        """
+        close = data["Close"].to_numpy(dtype="float64")
+        valid = np.isfinite(close)
+        index = data.index[valid]
+        close = close[valid]
+
+        image = Image.new("L", self.size, 255)
+        if not len(close):
+            return image
+        draw = ImageDraw.Draw(image)
+
+        low, high = close.min(), close.max()
+        padding = (high - low) * 0.05 or abs(high) * 0.01 or 1
+        low, high = low - padding, high + padding
+        ticks, decimals = nice_ticks(low, high)
+        labels = [f"{tick:,.{decimals}f}" for tick in ticks]
+
+        # the price labels on the left, the dates below and half a label above
+        widths = [
+            fonts.text_size(LABEL_FONT, self._font_px, label)[0] for label in labels
+        ]
+        left = max(widths) + 4
+        right = self._font_px
+        top = self._font_px // 2
+        bottom = self._height - self._font_px - 6
+        plot_width = self._width - left - right
+        price_bottom = bottom
+        if self._show_volume:
+            volume_height = (bottom - top - 2) // 4
+            price_bottom = bottom - volume_height - 2
+
+        scale = (price_bottom - top) / (high - low)
+        x, y = self._downsample(close, plot_width)
+        points = np.empty((len(x), 2))
+        points[:, 0] = left + x
+        points[:, 1] = price_bottom - (y - low) * scale
+        if len(points) == 1:
+            draw.point(tuple(points[0]), fill=LINE_GRAY)
+        else:
+            draw.line(points.ravel().tolist(), fill=LINE_GRAY, width=1)
+
+        for tick, label in zip(ticks, labels):
+            tick_y = price_bottom - (tick - low) * scale
+            label_width, label_height = fonts.text_size(
+                LABEL_FONT, self._font_px, label
+            )
+            draw.line((left - 3, tick_y, left - 1, tick_y), fill=0)
+            draw.text(
+                (left - 4 - label_width, tick_y - label_height / 2),
+                label,
+                font=self._font,
+                fill=0,
+            )
+
+        if self._show_volume:
+            self._draw_volume(
+                draw, data[valid], left, plot_width, bottom, volume_height
+            )
+        self._draw_dates(draw, index, left, plot_width, bottom)
+        return image
+
+    def _draw_volume(self, draw, data, left, plot_width, bottom, height):
+        volume = data["Volume"].to_numpy(dtype="float64")
+        volume = np.nan_to_num(volume)
+        up = data["Close"].to_numpy() >= data["Open"].to_numpy()
+        count = len(volume)
+        column = np.arange(count) * min(plot_width, count) // count
+        if count > 1 and count <= plot_width:
+            column = np.round(np.arange(count) * (plot_width - 1) / (count - 1))
+        starts = np.flatnonzero(np.diff(column, prepend=-1))
+        # one bar per pixel column: the total volume, colored by its last bar
+        totals = np.add.reduceat(volume, starts)
+        ends = np.append(starts[1:], count) - 1
+        tops = bottom - totals * height / max(totals.max(), 1)
+        grays = np.where(up[ends], VOLUME_UP_GRAY, VOLUME_DOWN_GRAY)
+        for bar_x, bar_top, gray in zip(left + column[starts], tops, grays):
+            draw.line((bar_x, bottom, bar_x, bar_top), fill=int(gray))
+
+    def _draw_dates(self, draw, index, left, plot_width, bottom):
+        date_format = datetime_format(index)
+        count = len(index)
+        last_right = -self._width
+        for position in date_ticks(index, date_format):
+            if count > 1:
+                tick_x = left + position * (plot_width - 1) / (count - 1)
+            else:
+                tick_x = left
+            label = index[position].strftime(date_format)
+            label_width, _ = fonts.text_size(LABEL_FONT, self._font_px, label)
+            label_left = tick_x - label_width / 2
+            # labels must not overlap nor go out of the image
+            if label_left < last_right + 6 or label_left + label_width > self._width:
+                continue
+            if label_left < 0:
+                continue
+            last_right = label_left + label_width
+            draw.line((tick_x, bottom + 1, tick_x, bottom + 2), fill=0)
+            draw.text((label_left, bottom + 3), label, font=self._font, fill=0)
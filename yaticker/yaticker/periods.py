@@ -0,0 +1,27 @@
+import re
+
+# yfinance expresses periods and intervals as "<amount><unit>", e.g. "1m", "5d", "3mo"
+_PATTERN = re.compile(r"^(\d+)(m|h|d|wk|mo|y)$")
+_UNIT_SECONDS = {
+    "m": 60,
+    "h": 60 * 60,
+    "d": 24 * 60 * 60,
+    "wk": 7 * 24 * 60 * 60,
+    "mo": 30 * 24 * 60 * 60,
+    "y": 365 * 24 * 60 * 60,
+}
+
+
+def to_seconds(value: str) -> int:
+    """
+    Converts a yfinance period or interval string to a number of seconds.
+    Months and years are approximated to 30 and 365 days.
+    :param value: period or interval, e.g. "1m", "1h", "5d", "1mo"
+    :return: the duration in seconds
+    :raises ValueError: if the value has no fixed duration (e.g. "max", "ytd")
+    """
+    match = _PATTERN.match(str(value).strip().lower())
+    if match is None:
+        raise ValueError(f"Unsupported period/interval: {value}")
+    amount, unit = match.groups()
+    return int(amount) * _UNIT_SECONDS[unit]
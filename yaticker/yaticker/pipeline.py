@@ -0,0 +1,368 @@
+import logging
+import queue
+import threading
+import time
+from concurrent import futures
+
+
+class FramePrefetcher(object):
+    """
+    Fetches and renders the next symbols of a watchlist ahead of time into a bounded
+    queue of ready frames, so that the display loop only pops and shows them.
+    Fetches run concurrently on a pool of workers. Rendering happens on a single
+    thread (matplotlib is not thread safe), in watchlist order except for symbols
+    still being fetched, which are rendered once ready instead of stalling the others.
+    After a symbol could not be prepared, the next one waits (backoff doubling up to
+    max_backoff, until a frame is prepared again) not to hammer a failing provider.
+    Frames found too old when popped are dropped, and their symbol is prepared again
+    by the render thread ahead of the watchlist.
+    """
+
+    def __init__(
+        self,
+        symbols,
+        fetch,
+        render,
+        depth: int = 3,
+        workers: int = 3,
+        backoff: float = 1.0,
+        max_backoff: float = 300.0,
+    ):
+        """
+        :param symbols: iterator over the symbols to display, e.g. itertools.cycle(watchlist)
+        :param fetch: fetch(symbol) returns the data needed to render symbol, None to skip it
+        :param render: render(symbol, data) returns the frame to display, None to skip it
+        :param depth: how many symbols are fetched / frames rendered ahead
+        :param workers: how many fetches run concurrently
+        :param backoff: seconds waited after the first symbol that could not be prepared
+        :param max_backoff: longest wait after consecutive failures
+        """
+        self._symbols = symbols
+        self._fetch = fetch
+        self._render = render
+        self._depth = depth
+        self._frames = queue.Queue(maxsize=depth)
+        # symbols whose frame was too old, prepared again before the next ones
+        self._stale = queue.SimpleQueue()
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="yaticker-fetch"
+        )
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="yaticker-prefetch", daemon=True
+        )
+
+    @property
+    def depth(self):
+        return self._depth
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        # unblock the producer if it is waiting for room in the queue
+        try:
+            self._frames.get_nowait()
+        except queue.Empty:
+            pass
+        self._executor.shutdown(wait=False)
+
+    def get(self, timeout: float = None, max_age: float = None):
+        """
+        Returns the next ready frame, waiting for it if needed
+        :param timeout: seconds to wait, 0 not to wait. Waits forever if None
+        :param max_age: frames prepared more than max_age seconds ago are skipped, and
+            their symbol handed back to the render thread to be prepared again. Frames
+            are never too old if None
+        :return: tuple (symbol, frame)
+        :raises queue.Empty: if no fresh enough frame is ready before timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = (
+                None if deadline is None else max(0, deadline - time.monotonic())
+            )
+            symbol, frame, prepared = self._frames.get(timeout=remaining)
+            if max_age is None or time.monotonic() - prepared <= max_age:
+                return symbol, frame
+            logging.debug(f"Prefetched frame of {symbol} too old, preparing it again")
+            self._stale.put(symbol)
+
+    def _run(self):
+        pending = []
+        delay = 0
+        while not self._stopped.is_set():
+            while len(pending) < self._depth:
+                symbol = self._next_symbol()
+                if symbol is None:
+                    break
+                pending.append((symbol, self._executor.submit(self._fetch, symbol)))
+            if not pending:
+                # the watchlist is over: only the stale frames are left to prepare
+                try:
+                    symbol = self._stale.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                pending.append((symbol, self._executor.submit(self._fetch, symbol)))
+
+            futures.wait([f for _, f in pending], return_when=futures.FIRST_COMPLETED)
+            # the first completed in watchlist order, so that slow symbols do not stall
+            symbol, future = next((p for p in pending if p[1].done()))
+            pending.remove((symbol, future))
+            frame = self._render_frame(symbol, future)
+            if frame is not None:
+                delay = 0
+                self._put((symbol, frame, time.monotonic()))
+                continue
+            delay = min(max(delay * 2, self._backoff), self._max_backoff)
+            logging.info(f"Waiting {delay:.1f}s before preparing the next frame")
+            self._stopped.wait(delay)
+
+    def _next_symbol(self):
+        try:
+            return self._stale.get_nowait()
+        except queue.Empty:
+            return next(self._symbols, None)
+
+    def _render_frame(self, symbol, future):
+        try:
+            data = future.result()
+            return None if data is None else self._render(symbol, data)
+        except Exception as e:
+            logging.error(f"Problem preparing the frame for {symbol}... Skipping")
+            logging.error(e, exc_info=True)
+            return None
+
+    def _put(self, frame):
+        while not self._stopped.is_set():
+            try:
+                self._frames.put(frame, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+
+class DisplayPipeline(object):
+    """
+    Displays symbols through three stages linked by bounded queues: fetch (I/O bound,
+    on a pool of threads), render (CPU bound, on render_executor, e.g. a process pool
+    as matplotlib is not thread safe) and display (a single sink thread). Frames are
+    displayed in submission order, and every stage can work on a different symbol.
+    When the queues are full, submit blocks (the slowest stage sets the pace) or
+    replaces the oldest symbol waiting to be fetched.
+    cancel drops every symbol submitted so far, wherever it is in the pipeline.
+    """
+
+    def __init__(
+        self,
+        fetch,
+        render,
+        display,
+        depth: int = 2,
+        fetch_workers: int = 3,
+        render_executor=None,
+    ):
+        """
+        :param fetch: fetch(symbol) returns the data needed to render symbol, None to skip it
+        :param render: render(symbol, data) returns the frame to display, None to skip
+            it. Must be picklable if render_executor is a process pool
+        :param display: display(frame) shows the frame (the display sink)
+        :param depth: how many symbols can wait between two stages
+        :param fetch_workers: how many fetches run concurrently
+        :param render_executor: executor running the renders, a single thread if None
+        """
+        self._fetch = fetch
+        self._render = render
+        self._display = display
+        self._fetch_executor = futures.ThreadPoolExecutor(
+            max_workers=fetch_workers, thread_name_prefix="yaticker-fetch"
+        )
+        self._render_executor = render_executor or futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="yaticker-render"
+        )
+        self._fetched = queue.Queue(maxsize=depth)
+        self._rendered = queue.Queue(maxsize=depth)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._finished = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._render_stage, name="yaticker-render-stage"),
+            threading.Thread(target=self._display_stage, name="yaticker-display-stage"),
+        ]
+        for thread in self._threads:
+            thread.daemon = True
+        self.stats = {
+            "submitted": 0,
+            "displayed": 0,
+            "cancelled": 0,
+            "skipped": 0,
+            "failed": 0,
+        }
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        """Stops the stages, dropping the symbols not displayed yet"""
+        self._stopped.set()
+        self.cancel()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._fetch_executor.shutdown(wait=False)
+        self._render_executor.shutdown(wait=False)
+
+    def submit(
+        self,
+        symbol,
+        block: bool = True,
+        timeout: float = None,
+        replace_oldest: bool = False,
+    ):
+        """
+        Queues symbol to be displayed after the symbols already submitted
+        :param block: whether to wait for room in the pipeline
+        :param timeout: seconds to wait for room. Waits forever if None
+        :param replace_oldest: if the pipeline is full, drops the oldest symbol still
+            waiting to be rendered to make room, instead of waiting
+        :raises queue.Full: if the pipeline stays full
+        """
+        with self._lock:
+            generation = self._generation
+        future = self._fetch_executor.submit(self._fetch, symbol)
+        item = (generation, symbol, future)
+        try:
+            if replace_oldest:
+                self._replace_oldest(item)
+            else:
+                self._fetched.put(item, block, timeout)
+        except queue.Full:
+            future.cancel()
+            raise
+        self._count("submitted")
+
+    def _replace_oldest(self, item):
+        while True:
+            try:
+                self._fetched.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            try:
+                _, symbol, future = self._fetched.get_nowait()
+            except queue.Empty:
+                # the render stage just took it
+                continue
+            future.cancel()
+            self._count("cancelled")
+            logging.info(f"Pipeline full, dropping {symbol}")
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Waits until every symbol submitted was displayed, skipped or dropped
+        :return: False on timeout
+        """
+        with self._finished:
+            return self._finished.wait_for(self._idle, timeout)
+
+    def _idle(self) -> bool:
+        stats = self.stats
+        done = stats["displayed"] + stats["cancelled"]
+        done += stats["skipped"] + stats["failed"]
+        return done >= stats["submitted"]
+
+    def _count(self, key):
+        with self._finished:
+            self.stats[key] += 1
+            self._finished.notify_all()
+
+    def cancel(self):
+        """Drops the symbols submitted so far, e.g. when the watchlist advances"""
+        with self._lock:
+            self._generation += 1
+        # frees the queues now, the stages drop what they already took
+        for stage in (self._fetched, self._rendered):
+            while True:
+                try:
+                    _, _, future = stage.get_nowait()
+                except queue.Empty:
+                    break
+                future.cancel()
+                self._count("cancelled")
+
+    def _dropped(self, generation) -> bool:
+        """Whether the symbols of generation were cancelled, or the pipeline stopped"""
+        with self._lock:
+            return generation != self._generation or self._stopped.is_set()
+
+    def _next(self, stage):
+        """Next item of a stage whose future succeeded, None when stopping"""
+        while not self._stopped.is_set():
+            try:
+                generation, symbol, future = stage.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # cancelled symbols are dropped without waiting for the previous stage
+            while not future.done() and not self._dropped(generation):
+                futures.wait([future], timeout=0.1)
+            if self._dropped(generation):
+                future.cancel()
+                self._count("cancelled")
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                self._count("failed")
+                logging.error(f"Problem preparing the frame for {symbol}... Skipping")
+                logging.error(e, exc_info=True)
+                continue
+            if result is None:
+                self._count("skipped")
+                continue
+            return generation, symbol, result
+        return None
+
+    def _put(self, stage, item):
+        while not self._stopped.is_set():
+            try:
+                stage.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if self._dropped(item[0]):
+                    item[2].cancel()
+                    self._count("cancelled")
+                    return False
+        return False
+
+    def _render_stage(self):
+        while True:
+            item = self._next(self._fetched)
+            if item is None:
+                return
+            generation, symbol, data = item
+            try:
+                future = self._render_executor.submit(self._render, symbol, data)
+            except RuntimeError:
+                # the executor was shut down
+                return
+            self._put(self._rendered, (generation, symbol, future))
+
+    def _display_stage(self):
+        while True:
+            item = self._next(self._rendered)
+            if item is None:
+                return
+            _, symbol, frame = item
+            try:
+                self._display(frame)
+                self._count("displayed")
+            except Exception as e:
+                self._count("failed")
+                logging.error(f"Problem displaying {symbol}")
+                logging.error(e, exc_info=True)
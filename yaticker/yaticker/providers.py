@@ -0,0 +1,271 @@
+import json
+import os
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+
+from yaticker import history, metrics, periods
+
+
+class Provider(ABC):
+    """Source of market data used by YaTicker"""
+
+    @abstractmethod
+    def download(self, tickers: list, period: str, interval: str):
+        """
+        Returns the data of several tickers at once
+        :param tickers: list of symbols
+        :param period: time period to retrieve
+        :param interval: granularity of the data
+        :return: data with (ticker, column) columns
+        """
+
+    @abstractmethod
+    def history(self, ticker: str, interval: str, period: str = None, start=None):
+        """
+        Returns the data of a ticker, either for the last period or since start
+        :param ticker: symbol of the stock
+        :param interval: granularity of the data
+        :param period: time period to retrieve
+        :param start: POSIX timestamp (in seconds) of the first bar to retrieve
+        :return:
+        """
+
+    @abstractmethod
+    def info(self, ticker: str) -> dict:
+        """Returns the ticker info"""
+
+
+class YFinanceProvider(Provider):
+    """
+    Retrieves the data from Yahoo Finance. yfinance (and requests, for the session)
+    are only imported on the first request, they are slow to import
+    """
+
+    def __init__(self, pool_size: int = None, timeout: float = 10):
+        """
+        :param pool_size: number of HTTP connections kept alive and shared by concurrent
+            requests. The requests default (10) if None
+        :param timeout: seconds to wait for Yahoo Finance to connect or answer: unlike
+            a timeout around the call, it ends the request
+        """
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def _get_session(self):
+        with self._session_lock:
+            if self._session is None:
+                self._session = session(self._pool_size, self._timeout)
+            return self._session
+
+    def _ticker(self, ticker: str):
+        import yfinance as yf
+
+        return yf.Ticker(ticker, session=self._get_session())
+
+    @metrics.timed("yfinance_download")
+    def download(self, tickers: list, period: str, interval: str):
+        import yfinance as yf
+
+        return yf.download(
+            tickers=" ".join(tickers),
+            period=period,
+            interval=interval,
+            group_by="ticker",
+            timeout=self._timeout,
+            session=self._get_session(),
+        )
+
+    @metrics.timed("yfinance_history")
+    def history(self, ticker: str, interval: str, period: str = None, start=None):
+        if start is not None:
+            return self._ticker(ticker).history(
+                start=start, interval=interval, timeout=self._timeout
+            )
+        return self._ticker(ticker).history(
+            period=period, interval=interval, timeout=self._timeout
+        )
+
+    @metrics.timed("yfinance_info")
+    def info(self, ticker: str) -> dict:
+        return self._ticker(ticker).info
+
+
+def session(pool_size: int = None, timeout: float = None):
+    """
+    HTTP session whose requests time out after timeout seconds unless they set their
+    own, e.g. the ones yfinance sends without any
+    :param pool_size: number of connections kept alive. The requests default if None
+    :param timeout: default timeout of the requests, in seconds. None to wait forever
+    :return: a requests.Session
+    """
+    import requests
+
+    class TimeoutAdapter(requests.adapters.HTTPAdapter):
+        def send(self, request, **kwargs):
+            if kwargs.get("timeout") is None:
+                kwargs["timeout"] = timeout
+            return super().send(request, **kwargs)
+
+    pool = {}
+    if pool_size is not None:
+        pool = {"pool_connections": pool_size, "pool_maxsize": pool_size}
+    adapter = TimeoutAdapter(**pool)
+    http = requests.Session()
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
+
+
+class ReplayProvider(Provider):
+    """
+    Serves data without network access, for tests and benchmarks.
+    Bars are replayed from a directory of recorded data (see record) when available,
+    otherwise generated: a deterministic random walk per symbol.
+    """
+
+    # last bar of the generated data, fixed so that runs are reproducible
+    END = "2021-06-24 16:00"
+    TIMEZONE = "America/New_York"
+
+    def __init__(
+        self,
+        directory: str = None,
+        latency: float = 0.0,
+        max_bars: int = 10000,
+        seed: int = 0,
+        end=None,
+    ):
+        """
+        :param directory: directory of recorded data. Only generated data if None
+        :param latency: seconds every call waits, to simulate the network
+        :param max_bars: maximum number of bars returned per ticker
+        :param seed: seed of the generated data
+        :param end: timestamp of the last generated bar, in TIMEZONE if naive
+        """
+        self._directory = directory
+        self._store = history.HistoryStore(directory) if directory else None
+        self._latency = latency
+        self._max_bars = max_bars
+        self._seed = seed
+        self._end = end if end is not None else self.END
+
+    @property
+    def latency(self):
+        return self._latency
+
+    def _wait(self):
+        if self._latency > 0:
+            time.sleep(self._latency)
+
+    def _bars(self, ticker: str, interval: str, period: str):
+        if self._store is not None:
+            recorded = self._store.load(ticker, interval)
+            if recorded is not None:
+                return recorded[0].tail(self._max_bars)
+        return self.generate(ticker, interval, period)
+
+    def generate(self, ticker: str, interval: str, period: str = None):
+        """
+        Generates bars for ticker: the same ticker always gets the same bars
+        :param ticker: symbol of the stock
+        :param interval: granularity of the data
+        :param period: time period to generate. Generates max_bars if None or unbounded
+        :return:
+        """
+        step = periods.to_seconds(interval)
+        count = self._max_bars
+        try:
+            count = min(count, max(1, periods.to_seconds(period) // step))
+        except ValueError:
+            pass
+        import numpy as np
+        import pandas as pd
+
+        seed = zlib.crc32(f"{self._seed}:{ticker.upper()}".encode())
+        rng = np.random.default_rng(seed)
+
+        end = pd.Timestamp(self._end)
+        if end.tz is None:
+            end = end.tz_localize(self.TIMEZONE)
+        index = pd.date_range(end=end.floor(f"{step}s"), periods=count, freq=f"{step}s")
+        start_price = rng.uniform(10, 1000)
+        returns = rng.normal(0, 0.002 * np.sqrt(step / 60), count)
+        close = start_price * np.exp(np.cumsum(returns))
+        open_ = np.concatenate(([start_price], close[:-1]))
+        spread = np.abs(rng.normal(0, 0.001, count)) * close
+        return pd.DataFrame(
+            {
+                "Open": open_,
+                "High": np.maximum(open_, close) + spread,
+                "Low": np.minimum(open_, close) - spread,
+                "Close": close,
+                "Volume": rng.integers(1000, 100000, count).astype("float64"),
+            },
+            index=index,
+        )
+
+    def download(self, tickers: list, period: str, interval: str):
+        import pandas as pd
+
+        self._wait()
+        return pd.concat(
+            {ticker: self._bars(ticker, interval, period) for ticker in tickers},
+            axis=1,
+        )
+
+    def history(self, ticker: str, interval: str, period: str = None, start=None):
+        import pandas as pd
+
+        self._wait()
+        bars = self._bars(ticker, interval, period)
+        if start is not None:
+            return bars[bars.index >= pd.Timestamp(start, unit="s", tz="UTC")]
+        return bars
+
+    def info(self, ticker: str) -> dict:
+        self._wait()
+        if self._directory is not None:
+            try:
+                with open(_info_path(self._directory, ticker)) as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                pass
+        bars = self.generate(ticker, "1d", "5d")
+        return {
+            "symbol": ticker.upper(),
+            "shortName": ticker.upper(),
+            "currency": "USD",
+            "previousClose": float(bars["Close"].iloc[-2]),
+        }
+
+
+def _info_path(directory: str, ticker: str) -> str:
+    return os.path.join(directory, f"{ticker.upper()}_info.json")
+
+
+def record(
+    tickers: list,
+    period: str,
+    interval: str,
+    directory: str,
+    provider: Provider = None,
+):
+    """
+    Records the data and info of tickers to directory, to be replayed by ReplayProvider
+    :param tickers: list of symbols
+    :param period: time period to record
+    :param interval: granularity of the data
+    :param directory: directory to record to
+    :param provider: provider to record from. Defaults to Yahoo Finance
+    :return:
+    """
+    provider = provider if provider is not None else YFinanceProvider()
+    store = history.HistoryStore(directory)
+    for ticker in tickers:
+        store.save(ticker, interval, provider.history(ticker, interval, period), period)
+        with open(_info_path(directory, ticker), "w") as f:
+            json.dump(provider.info(ticker), f, default=str)
@@ -0,0 +1,313 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+
+class Timer(object):
+    """Handle of a callback scheduled by EventLoop.call_later or call_every"""
+
+    def __init__(self, when: float, interval, callback, args):
+        self.when = when
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class JobWorker(object):
+    """
+    Runs the long jobs (fetching, rendering and displaying a stock) on a thread of
+    their own. One job runs at a time, the pending ones in submission order. A job
+    submitted while the same function is pending replaces it (only the latest stock
+    or message matters), so the periodic jobs never drop a button job.
+    """
+
+    def __init__(self, name="yaticker-jobs"):
+        self._name = name
+        self._condition = threading.Condition()
+        # function -> arguments of its pending job, in submission order
+        self._pending = {}
+        self._busy = False
+        self._stopping = False
+        self._thread = None
+        self.stats = {"jobs": 0, "dropped": 0, "errors": 0}
+
+    def start(self):
+        with self._condition:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(
+                    target=self._run, name=self._name, daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops once the running job is done, dropping the pending one"""
+        with self._condition:
+            thread = self._thread
+            self._stopping = True
+            self._pending.clear()
+            self._condition.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+
+    def submit(self, job, *args):
+        with self._condition:
+            if job in self._pending:
+                self.stats["dropped"] += 1
+            self._pending[job] = args
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout=None) -> bool:
+        """
+        Waits until every submitted job ran
+        :return: False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._busy, timeout
+            )
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopping)
+                if self._stopping:
+                    return
+                job = next(iter(self._pending))
+                args = self._pending.pop(job)
+                self._busy = True
+            try:
+                job(*args)
+                self.stats["jobs"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.error(e, exc_info=True)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+
+class EventLoop(object):
+    """
+    Single scheduler of the dashboard: button events and timers are run one at a
+    time on the thread calling run, which sleeps until the next one is due (no busy
+    waiting). Callbacks must be quick: long jobs are handed to the JobWorker with
+    submit, so that button presses are handled even while a stock is rendered.
+    """
+
+    def __init__(self, timer=time.monotonic):
+        self._timer = timer
+        self._condition = threading.Condition()
+        self._ready = deque()
+        self._timers = []
+        self._sequence = itertools.count()
+        self._stopping = False
+        self._on_stop = []
+        self._jobs = JobWorker()
+        self.stats = {"callbacks": 0, "wakeups": 0, "errors": 0}
+
+    @property
+    def jobs(self):
+        return self._jobs
+
+    def call_soon(self, callback, *args):
+        """Runs callback on the loop thread as soon as possible. Thread safe"""
+        with self._condition:
+            self._ready.append((callback, args))
+            self._condition.notify()
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        """Runs callback on the loop thread in delay seconds. Thread safe"""
+        return self._schedule(Timer(self._timer() + delay, None, callback, args))
+
+    def call_every(self, interval: float, callback, *args, delay=None) -> Timer:
+        """
+        Runs callback on the loop thread every interval seconds. Thread safe
+        :param delay: seconds before the first run, interval if None
+        """
+        delay = interval if delay is None else delay
+        return self._schedule(Timer(self._timer() + delay, interval, callback, args))
+
+    def submit(self, job, *args):
+        """Runs job on the job worker, replacing the job of the same function still waiting if any"""
+        self._jobs.submit(job, *args)
+
+    def on_stop(self, callback):
+        """Runs callback when the loop stops"""
+        self._on_stop.append(callback)
+
+    def _schedule(self, timer: Timer) -> Timer:
+        with self._condition:
+            heapq.heappush(self._timers, (timer.when, next(self._sequence), timer))
+            self._condition.notify()
+        return timer
+
+    def _next_callbacks(self):
+        """Waits for the callbacks due, None when stopping"""
+        with self._condition:
+            while True:
+                if self._stopping:
+                    return None
+                now = self._timer()
+                while self._timers and self._timers[0][2].cancelled:
+                    heapq.heappop(self._timers)
+                while self._timers and self._timers[0][0] <= now:
+                    _, _, timer = heapq.heappop(self._timers)
+                    if timer.cancelled:
+                        continue
+                    self._ready.append((timer.callback, timer.args))
+                    if timer.interval is not None:
+                        # missed runs are skipped, not caught up
+                        timer.when = max(timer.when + timer.interval, now)
+                        heapq.heappush(
+                            self._timers, (timer.when, next(self._sequence), timer)
+                        )
+                if self._ready:
+                    callbacks = list(self._ready)
+                    self._ready.clear()
+                    return callbacks
+                timeout = self._timers[0][0] - now if self._timers else None
+                self._condition.wait(timeout)
+                self.stats["wakeups"] += 1
+
+    def run(self):
+        """Runs the callbacks until stop is called"""
+        self._jobs.start()
+        try:
+            while True:
+                callbacks = self._next_callbacks()
+                if callbacks is None:
+                    return
+                for callback, args in callbacks:
+                    try:
+                        callback(*args)
+                        self.stats["callbacks"] += 1
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        logging.error(e, exc_info=True)
+        finally:
+            self._jobs.stop(timeout=0)
+            for callback in self._on_stop:
+                callback()
+
+    def stop(self):
+        """Makes run return, once the running callback is done. Thread safe"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+
+
+class Buttons(object):
+    """
+    Push buttons wired between GPIO pins and the ground. Presses are detected on the
+    falling edge by the GPIO backend (RPi.GPIO or FakeGPIO), debounced, and their
+    handler is run on the event loop.
+    """
+
+    def __init__(self, gpio, loop: EventLoop, handlers: dict, debounce=0.2):
+        """
+        :param gpio: the GPIO backend, e.g. the RPi.GPIO module
+        :param loop: loop running the handlers
+        :param handlers: dict pin (BCM numbering) -> function called on press
+        :param debounce: seconds during which the presses following a press are
+            ignored (contacts bounce)
+        """
+        self._gpio = gpio
+        self._loop = loop
+        self._handlers = handlers
+        self._debounce = debounce
+        self._lock = threading.Lock()
+        self._last_press = {}
+        self.stats = {"presses": 0, "bounces": 0}
+
+    def setup(self):
+        """Sets the pins up, again after the GPIOs were released"""
+        self._gpio.setmode(self._gpio.BCM)
+        for pin in self._handlers:
+            self._gpio.setup(pin, self._gpio.IN, pull_up_down=self._gpio.PUD_UP)
+            self._gpio.remove_event_detect(pin)
+            self._gpio.add_event_detect(
+                pin,
+                self._gpio.FALLING,
+                callback=self._pressed,
+                bouncetime=int(self._debounce * 1000),
+            )
+
+    def teardown(self):
+        for pin in self._handlers:
+            self._gpio.remove_event_detect(pin)
+
+    def _pressed(self, pin):
+        # called on the thread of the GPIO backend
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_press.get(pin, float("-inf")) < self._debounce:
+                self.stats["bounces"] += 1
+                return
+            self._last_press[pin] = now
+            self.stats["presses"] += 1
+        self._loop.call_soon(self._handlers[pin])
+
+
+class FakeGPIO(object):
+    """
+    Stand-in for the RPi.GPIO module on machines without GPIO (tests, emulator).
+    press simulates a button press, contact bounces included.
+    """
+
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+
+    def __init__(self):
+        self.mode = None
+        self._levels = {}
+        self._callbacks = {}
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setup(self, pin, direction, pull_up_down=None):
+        self._levels[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+
+    def input(self, pin):
+        return self._levels[pin]
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        if pin in self._callbacks:
+            raise RuntimeError("Conflicting edge detection already enabled")
+        self._callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        self._callbacks.pop(pin, None)
+
+    def cleanup(self, pins=None):
+        for pin in list(self._levels) if pins is None else pins:
+            self._levels.pop(pin, None)
+            self._callbacks.pop(pin, None)
+
+    def press(self, pin, bounces=0):
+        """
+        Presses and releases the button of pin
+        :param bounces: number of extra falling edges caused by the contacts bouncing
+        """
+        for _ in range(1 + bounces):
+            self._levels[pin] = self.LOW
+            callback = self._callbacks.get(pin)
+            if callback is not None:
+                callback(pin)
+            self._levels[pin] = self.HIGH
@@ -0,0 +1,188 @@
+import io
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+
+class Sink(ABC):
+    """
+    Where the emulator sends its frames. Every frame written is counted, so that the
+    frame rate of the dashboard can be measured whatever the sink.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames = 0
+
+    def write(self, image):
+        """
+        Outputs a frame. Thread safe
+        :param image: the frame
+        """
+        with self._lock:
+            self._write(image)
+            self.frames += 1
+
+    @abstractmethod
+    def _write(self, image):
+        pass
+
+    def close(self):
+        """Flushes the frames not output yet"""
+
+
+class ViewerSink(Sink):
+    """Opens every frame in the image viewer of the system"""
+
+    def _write(self, image):
+        image.show()
+
+
+class DirectorySink(Sink):
+    """Saves the frames as numbered files (frame-000001.png, ...) in a directory"""
+
+    FORMATS = ("png", "pbm")
+
+    def __init__(self, directory, image_format="png"):
+        """
+        :param directory: where the frames are saved, created if needed
+        :param image_format: "png", or "pbm" for uncompressed black and white frames
+        """
+        super().__init__()
+        if image_format not in self.FORMATS:
+            raise ValueError(f"Unknown image format {image_format}")
+        self._directory = directory
+        self._format = image_format
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, number: int):
+        """Path of the frame number (starting at 1)"""
+        return os.path.join(self._directory, f"frame-{number:06d}.{self._format}")
+
+    def _write(self, image):
+        if self._format == "pbm":
+            image = image.convert("1")
+        image.save(self.path(self.frames + 1))
+
+
+class MemorySink(Sink):
+    """Keeps the last frames in memory, e.g. to check them in tests"""
+
+    def __init__(self, size: int = 100):
+        """
+        :param size: number of frames kept, the older ones are dropped
+        """
+        super().__init__()
+        self._images = deque(maxlen=size)
+
+    @property
+    def images(self):
+        """The frames kept, oldest first"""
+        with self._lock:
+            return list(self._images)
+
+    def _write(self, image):
+        self._images.append(image.copy())
+
+
+class AnimationSink(Sink):
+    """Saves all the frames in an animated GIF, written on close"""
+
+    def __init__(self, path, duration: int = 500):
+        """
+        :param path: path of the GIF
+        :param duration: milliseconds each frame is shown
+        """
+        super().__init__()
+        self._path = path
+        self._duration = duration
+        self._images = []
+
+    def _write(self, image):
+        self._images.append(image.convert("L"))
+
+    def close(self):
+        with self._lock:
+            if not self._images:
+                return
+            first, *others = self._images
+            first.save(
+                self._path,
+                save_all=True,
+                append_images=others,
+                duration=self._duration,
+                loop=0,
+            )
+
+
+class MultipartSink(Sink):
+    """
+    Streams the frames as a multipart/x-mixed-replace response, which browsers show
+    as a live image (each part replacing the previous one). Clients only get the
+    latest frame: the frames written while they are still receiving one are skipped.
+    """
+
+    BOUNDARY = "frame"
+    CONTENT_TYPE = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+
+    def __init__(self):
+        super().__init__()
+        self._condition = threading.Condition(self._lock)
+        self._part = None
+        self._closed = False
+
+    def _write(self, image):
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        png = buffer.getvalue()
+        header = (
+            f"--{self.BOUNDARY}\r\n"
+            f"Content-Type: image/png\r\n"
+            f"Content-Length: {len(png)}\r\n\r\n"
+        )
+        self._part = (self.frames + 1, header.encode() + png + b"\r\n")
+        self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def stream(self, timeout: float = None):
+        """
+        Parts of the response, starting with the latest frame
+        :param timeout: seconds to wait for a new frame before ending the response.
+            Waits until the sink is closed if None
+        """
+        number = 0
+        while True:
+            with self._condition:
+                ready = self._condition.wait_for(
+                    lambda: self._closed or (self._part and self._part[0] > number),
+                    timeout,
+                )
+                if self._closed or not ready:
+                    return
+                number, part = self._part
+            yield part
+
+
+def open_sink(kind: str, output=None):
+    """
+    Creates a sink from its name, as given on the command line
+    :param kind: "viewer", "png", "pbm", "memory", "gif" or "multipart"
+    :param output: directory of the png and pbm frames, path of the GIF
+    :return: the sink
+    """
+    if kind == "viewer":
+        return ViewerSink()
+    if kind in DirectorySink.FORMATS:
+        return DirectorySink(output or "frames", image_format=kind)
+    if kind == "memory":
+        return MemorySink()
+    if kind == "gif":
+        return AnimationSink(output or "frames.gif")
+    if kind == "multipart":
+        return MultipartSink()
+    raise ValueError(f"Unknown sink {kind}")
@@ -0,0 +1,212 @@
+import json
+import logging
+import queue
+import threading
+
+from yaticker import formats
+
+# how many updates a subscriber can lag behind before missing some (it is then sent
+# a new snapshot once it has caught up)
+MAX_PENDING_UPDATES = 100
+
+
+def bar_delta(old, new):
+    """
+    Returns the bars of new that are not in old: the bars after the last bar of old,
+    and that last bar too if it changed (e.g. it was still forming)
+    :param old: previously known bars, may be None
+    :param new: refreshed bars
+    :return:
+    """
+    if old is None or old.empty:
+        return new
+    last = old.index[-1]
+    delta = new[new.index >= last]
+    if len(delta) and delta.index[0] == last and delta.iloc[0].equals(old.iloc[-1]):
+        delta = delta.iloc[1:]
+    return delta
+
+
+class BarFeed(object):
+    """
+    Refreshes the bars of a symbol on a single thread, however many subscribers there
+    are, and pushes the new or updated bars to every subscriber queue. A subscriber
+    whose queue was full misses those bars: its next update is a snapshot of them all
+    """
+
+    def __init__(self, symbol: str, period: str, interval: str, fetch, refresh: float):
+        """
+        :param symbol: symbol of the stock
+        :param period: time period of the bars
+        :param interval: granularity of the bars
+        :param fetch: fetch(symbol, period, interval) returns the up to date bars
+        :param refresh: seconds between refreshes
+        """
+        self._symbol = symbol
+        self._period = period
+        self._interval = interval
+        self._fetch = fetch
+        self._refresh = refresh
+        self._bars = None
+        self._subscribers = []
+        # subscribers that missed an update
+        self._lagging = set()
+        self._lock = threading.Lock()
+        self._stopped = None
+
+    @property
+    def symbol(self):
+        return self._symbol
+
+    @property
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self, updates: queue.Queue):
+        """
+        Adds a subscriber, starting the refreshes if it is the first one
+        :param updates: queue receiving (event, symbol, bars) tuples: "bars" events
+            with the new or updated bars, "snapshot" events with all the bars
+        :return: the current bars (the snapshot the updates apply to)
+        """
+        with self._lock:
+            if self._bars is None:
+                self._bars = self._fetch(self._symbol, self._period, self._interval)
+            self._subscribers.append(updates)
+            if self._stopped is None:
+                self._stopped = threading.Event()
+                threading.Thread(
+                    target=self._run,
+                    args=(self._stopped,),
+                    name=f"yaticker-feed-{self._symbol}",
+                    daemon=True,
+                ).start()
+            return self._bars
+
+    def unsubscribe(self, updates: queue.Queue) -> int:
+        """Removes a subscriber, stopping the refreshes if it was the last one. Returns how many are left"""
+        with self._lock:
+            if updates in self._subscribers:
+                self._subscribers.remove(updates)
+            self._lagging.discard(updates)
+            if not self._subscribers and self._stopped is not None:
+                self._stopped.set()
+                self._stopped = None
+            return len(self._subscribers)
+
+    def refresh(self):
+        """Refreshes the bars and pushes the changes to the subscribers"""
+        bars = self._fetch(self._symbol, self._period, self._interval)
+        with self._lock:
+            delta = bar_delta(self._bars, bars)
+            self._bars = bars
+            for updates in self._subscribers:
+                if updates in self._lagging:
+                    update = ("snapshot", self._symbol, bars)
+                elif delta.empty:
+                    continue
+                else:
+                    update = ("bars", self._symbol, delta)
+                try:
+                    updates.put_nowait(update)
+                    self._lagging.discard(updates)
+                except queue.Full:
+                    logging.warning(f"A subscriber of {self._symbol} is lagging behind")
+                    self._lagging.add(updates)
+
+    def _run(self, stopped: threading.Event):
+        while not stopped.wait(self._refresh):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Problem refreshing the data for {self._symbol}")
+                logging.error(e, exc_info=True)
+
+
+class FeedHub(object):
+    """Shares a single BarFeed per (symbol, period, interval) between all subscribers"""
+
+    def __init__(self, fetch, refresh):
+        """
+        :param fetch: fetch(symbol, period, interval) returns the up to date bars
+        :param refresh: refresh(interval) returns the seconds between refreshes
+        """
+        self._fetch = fetch
+        self._refresh = refresh
+        self._feeds = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._feeds)
+
+    def subscribe(self, symbol: str, period: str, interval: str, updates: queue.Queue):
+        """Subscribes updates to the feed of symbol. Returns the current bars"""
+        key = (symbol.upper(), period, interval)
+        while True:
+            with self._lock:
+                feed = self._feeds.get(key)
+                if feed is None:
+                    feed = BarFeed(
+                        key[0], period, interval, self._fetch, self._refresh(interval)
+                    )
+                    self._feeds[key] = feed
+            # not under the lock: the first subscription fetches the bars
+            try:
+                bars = feed.subscribe(updates)
+            except Exception:
+                # do not keep a feed whose first fetch failed
+                with self._lock:
+                    if self._feeds.get(key) is feed and feed.subscribers == 0:
+                        del self._feeds[key]
+                raise
+            with self._lock:
+                if self._feeds.get(key) is feed:
+                    return bars
+            # its last subscriber left in between, and the feed was dropped
+            feed.unsubscribe(updates)
+
+    def unsubscribe(
+        self, symbol: str, period: str, interval: str, updates: queue.Queue
+    ):
+        key = (symbol.upper(), period, interval)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is not None and feed.unsubscribe(updates) == 0:
+                del self._feeds[key]
+
+    def events(self, symbols: list, period: str, interval: str, heartbeat: float = 15):
+        """
+        Server-sent events stream of the bars of symbols: a "snapshot" event per symbol
+        with its current bars, then "bars" events with the new or updated bars (or a
+        new "snapshot" if the client lagged behind and missed some)
+        :param symbols: list of symbols
+        :param period: time period of the bars
+        :param interval: granularity of the bars
+        :param heartbeat: seconds between keep alive comments when nothing changes
+        :return: generator of events
+        """
+        updates = queue.Queue(maxsize=MAX_PENDING_UPDATES)
+        subscribed = []
+        try:
+            for symbol in symbols:
+                bars = self.subscribe(symbol, period, interval, updates)
+                subscribed.append(symbol)
+                yield sse_event("snapshot", symbol.upper(), bars)
+            while True:
+                try:
+                    event, symbol, bars = updates.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_event(event, symbol, bars)
+        finally:
+            for symbol in subscribed:
+                self.unsubscribe(symbol, period, interval, updates)
+
+
+def sse_event(event: str, symbol: str, bars) -> str:
+    """Formats bars as a server-sent event, bars being in the "columns" format"""
+    data = f'{{"symbol":{json.dumps(symbol)},"bars":{formats.to_columns_json(bars)}}}'
+    return f"event: {event}\ndata: {data}\n\n"
@@ -0,0 +1,261 @@
+import gzip
+import hashlib
+import importlib
+import json
+import logging
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from bottle import HTTPError, HTTPResponse, ServerAdapter, request
+
+from yaticker import formats, periods
+
+# responses smaller than this are not worth compressing
+MIN_GZIP_SIZE = 1024
+# production servers tried, in order, by the "auto" server mode
+SERVERS = [("waitress", "waitress"), ("cheroot", "cheroot"), ("paste", "paste")]
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(*args, **kw):
+        pass
+
+
+class ThreadingWSGIRefServer(ServerAdapter):
+    """
+    The standard library WSGI server, handling every request on its own thread.
+    Does not support keep-alive: install waitress or cheroot for that.
+    """
+
+    def run(self, app):
+        handler = WSGIRequestHandler if not self.quiet else _QuietHandler
+        server = make_server(
+            self.host,
+            self.port,
+            app,
+            server_class=_ThreadingWSGIServer,
+            handler_class=handler,
+        )
+        self.port = server.server_port
+        server.serve_forever()
+
+
+def server_adapter(mode: str = "auto"):
+    """
+    Returns the server to run the web app with
+    :param mode: "auto" for the first production server installed (waitress, cheroot,
+        paste) falling back to "threaded", "threaded" for the multi-threaded standard
+        library server, or any server name supported by bottle ("wsgiref" being the
+        single-threaded development server)
+    :return: a server name or adapter class, as accepted by bottle.run
+    """
+    if mode == "threaded":
+        return ThreadingWSGIRefServer
+    if mode != "auto":
+        return mode
+    for name, module in SERVERS:
+        try:
+            importlib.import_module(module)
+            return name
+        except ImportError:
+            continue
+    logging.info("No production server installed, using the threaded server")
+    return ThreadingWSGIRefServer
+
+
+def cache_validators(data, interval: str):
+    """
+    Computes the ETag and Last-Modified of the data
+    :param data: bars indexed by timestamp
+    :param interval: granularity of the data
+    :return: tuple (etag, last modified as a POSIX timestamp), (None, None) if empty
+    """
+    if data.empty:
+        return None, None
+    digest = hashlib.md5(f"{len(data)}:{data.index[0]}:{data.index[-1]}".encode())
+    # the still forming last bar changes without changing the index
+    digest.update(data.iloc[-1].to_numpy(dtype="float64", na_value=0).tobytes())
+    # the last bar is modified until its interval is over
+    last_modified = data.index[-1].timestamp()
+    try:
+        last_modified += periods.to_seconds(interval)
+    except ValueError:
+        pass
+    # weak: the representation depends on the requested format and encoding
+    return f'W/"{digest.hexdigest()}"', min(last_modified, time.time())
+
+
+def is_not_modified(etag: str, last_modified: float) -> bool:
+    """Whether the client copy (If-None-Match / If-Modified-Since) is still current"""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or etag[2:] in tags
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def compress(body: bytes, headers: dict) -> bytes:
+    """Gzips the body if the client accepts it and it is large enough"""
+    headers["Vary"] = "Accept-Encoding"
+    accept_encoding = request.headers.get("Accept-Encoding", "")
+    if len(body) < MIN_GZIP_SIZE or "gzip" not in accept_encoding:
+        return body
+    headers["Content-Encoding"] = "gzip"
+    return gzip.compress(body, compresslevel=6)
+
+
+def data_response(data, interval: str, serialize, content_type: str):
+    """
+    Builds the response for data, answering 304 Not Modified without serializing
+    when the client copy is current, and compressing the body when possible
+    :param data: bars indexed by timestamp
+    :param interval: granularity of the data
+    :param serialize: callable returning the body (str or bytes)
+    :param content_type: content type of the body
+    :return:
+    """
+    etag, last_modified = cache_validators(data, interval)
+    return validated_response(etag, last_modified, serialize, content_type)
+
+
+def validated_response(etag: str, last_modified: float, serialize, content_type: str):
+    """Same as data_response, from already computed cache validators"""
+    headers = {"Cache-Control": "no-cache"}
+    if etag is not None:
+        headers["ETag"] = etag
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+        if is_not_modified(etag, last_modified):
+            return HTTPResponse(status=304, headers=headers)
+
+    body = serialize()
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    body = compress(body, headers)
+    headers["Content-Type"] = content_type
+    headers["Content-Length"] = str(len(body))
+    return HTTPResponse(body, headers=headers)
+
+
+def query_format(names=None):
+    """
+    Returns the serializer and content type of the format query parameter (json by default)
+    :param names: formats allowed. All formats.FORMATS if None
+    :return:
+    """
+    format_name = request.query.get("format", default="json")
+    if format_name not in (names or formats.FORMATS):
+        raise HTTPError(400, f"Unsupported format {format_name}")
+    serializer, content_type = formats.FORMATS[format_name]
+
+    def serialize(data):
+        try:
+            return serializer(data)
+        except ImportError as e:
+            raise HTTPError(406, f"The {format_name} format is not available: {e}")
+
+    return serialize, content_type
+
+
+def query_slicer(tz=None):
+    """
+    Parses the columns (comma separated), since (POSIX timestamp or ISO 8601 date/time)
+    and maxpoints query parameters
+    :param tz: timezone of the since date/time when it has none
+    :return: a function slicing data according to them
+    """
+    columns = request.query.get("columns", default=None)
+    since = request.query.get("since", default=None)
+    max_points = request.query.get("maxpoints", default=None)
+    try:
+        if since is not None:
+            since = formats.parse_timestamp(since, tz=tz)
+        if max_points is not None:
+            max_points = int(max_points)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+
+    def slice_data(data):
+        try:
+            if columns is not None:
+                data = formats.select_columns(data, columns.split(","))
+            if since is not None:
+                data = formats.since(data, since)
+            if max_points is not None:
+                data = formats.downsample(data, max_points)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return data
+
+    return slice_data
+
+
+def index_tz(data):
+    """Timezone of the bars, None if naive or not indexed by timestamp (e.g. empty)"""
+    return getattr(data.index, "tz", None)
+
+
+def query_data_response(data, interval: str):
+    """
+    Builds the response for data, shaped by the query parameters:
+    format (json, columns, csv, msgpack or arrow), columns (comma separated),
+    since (POSIX timestamp or ISO 8601 date/time) and maxpoints
+    :param data: bars indexed by timestamp
+    :param interval: granularity of the data
+    :return:
+    """
+    serialize, content_type = query_format()
+    slice_data = query_slicer(tz=index_tz(data))
+    return data_response(
+        data, interval, lambda: serialize(slice_data(data)), content_type
+    )
+
+
+def query_tickers_response(tickers_data: dict, interval: str):
+    """
+    Builds the response for the data of several tickers: a JSON object mapping each
+    symbol to its data, shaped by the same query parameters as query_data_response
+    (only the json and columns formats are supported)
+    :param tickers_data: dict mapping symbols to their bars
+    :param interval: granularity of the data
+    :return:
+    """
+    serialize, content_type = query_format(names=("json", "columns"))
+    # empty frames (unknown symbols) have no timestamps, hence no timezone
+    tz = next(
+        (index_tz(data) for data in tickers_data.values() if index_tz(data)), None
+    )
+    slice_data = query_slicer(tz=tz)
+
+    validators = [
+        (symbol, cache_validators(data, interval))
+        for symbol, data in tickers_data.items()
+    ]
+    etag, last_modified = None, None
+    if validators and all(tag is not None for _, (tag, _) in validators):
+        digest = hashlib.md5(
+            ",".join(f"{symbol}={tag}" for symbol, (tag, _) in validators).encode()
+        )
+        etag = f'W/"{digest.hexdigest()}"'
+        last_modified = max(modified for _, (_, modified) in validators)
+
+    def serialize_all():
+        bodies = [
+            f"{json.dumps(symbol)}:{serialize(slice_data(data))}"
+            for symbol, data in tickers_data.items()
+        ]
+        return "{" + ",".join(bodies) + "}"
+
+    return validated_response(etag, last_modified, serialize_all, content_type)
@@ -1,51 +1,431 @@
-import yfinance as yf
-from bottle import request, route, run
+import asyncio
+import logging
+from concurrent import futures
+
+import click
+from bottle import HTTPError, request, response, route, run
+
+from yaticker import barstore, cache, history, metrics, providers, stream, web
+
+# blocking calls of the async API run concurrently, and HTTP connections kept alive
+IO_WORKERS = 16
+# columns of the cached bars, whichever provider call retrieved them
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
 
 
 class YaTicker(object):
+    # shared by every client (dashboard, web route, cli) of the process
+    cache = cache.TTLCache(maxsize=256)
+    bar_store = barstore.BarStore()
+    provider = providers.YFinanceProvider(pool_size=IO_WORKERS)
+    # one refresh loop per streamed (symbol, period, interval)
+    feeds = stream.FeedHub(
+        fetch=lambda symbol, period, interval: YaTicker.get_ticker_data(
+            symbol, period=period, interval=interval, incremental=True
+        ),
+        refresh=lambda interval: cache.data_ttl(interval),
+    )
+    # runs the blocking calls of the async API
+    executor = futures.ThreadPoolExecutor(
+        max_workers=IO_WORKERS, thread_name_prefix="yaticker-io"
+    )
+
     def __init__(self):
         return
 
     @staticmethod
+    @metrics.timed("tickers_data")
     def get_tickers_data(
         tickers_string: str = "AMZN", period: str = "7d", interval: str = "5m"
     ):
         """Return the list of tickers data."""
-        data = yf.download(
-            tickers=tickers_string, period=period, interval=interval, group_by="ticker"
+        return YaTicker._get_tickers_data(tickers_string, period, interval)
+
+    @staticmethod
+    def _get_tickers_data(
+        tickers_string: str, period: str, interval: str, count: bool = True
+    ):
+        symbols = tuple(sorted(set(tickers_string.upper().replace(",", " ").split())))
+        return YaTicker.cache.get_or_load(
+            ("tickers", symbols, period, interval),
+            lambda: YaTicker.provider.download(
+                list(symbols), period=period, interval=interval
+            ),
+            ttl=cache.data_ttl(interval),
+            count=count,
         )
-        return data
 
     @staticmethod
+    @metrics.timed("watchlist_data")
+    def get_watchlist_data(
+        watchlist: list, period: str = "5d", interval: str = "1h"
+    ) -> dict:
+        """
+        Fetches the data of every symbol of the watchlist in a single batched request.
+        Symbols whose data is already cached are not requested again, and the data of
+        each symbol is cached as if retrieved by get_ticker_data.
+        :param watchlist: list of symbols
+        :param period: time period to retrieve
+        :param interval: granularity of the data
+        :return: dict mapping each (upper case) symbol to its data
+        """
+        symbols = [symbol.upper() for symbol in watchlist]
+        watchlist_data = {}
+        missing = []
+        for symbol in symbols:
+            data = YaTicker.cache.get(("data", symbol, period, interval))
+            if data is None:
+                missing.append(symbol)
+            else:
+                watchlist_data[symbol] = data
+
+        if missing:
+            # the lookups of the missing symbols were already counted as misses
+            tickers_data = YaTicker._get_tickers_data(
+                " ".join(missing), period, interval, count=False
+            )
+            ttl = cache.data_ttl(interval)
+            # rows where none of the symbols traded, dropped once for all of them
+            tickers_data = tickers_data.dropna(how="all")
+            for symbol, data in YaTicker.split_tickers_data(
+                tickers_data, missing
+            ).items():
+                # symbols trading at different hours than the others have empty rows,
+                # the others are kept as they are (column selections, not copies)
+                traded = data.notna().any(axis=1)
+                if not traded.all():
+                    data = data[traded]
+                data = YaTicker.bar_columns(data)
+                YaTicker.cache.set(("data", symbol, period, interval), data, ttl)
+                watchlist_data[symbol] = data
+        return {s: watchlist_data[s] for s in symbols if s in watchlist_data}
+
+    @staticmethod
+    def split_tickers_data(data, symbols: list) -> dict:
+        """
+        Splits the data returned by get_tickers_data into per symbol frames.
+        Frames are column selections of data, they are not copied.
+        Rows where a symbol was not trading are all NaN.
+        :param data: data grouped by ticker
+        :param symbols: symbols that were requested
+        :return: dict mapping each symbol to its data
+        """
+        if data.columns.nlevels == 1:
+            # a single symbol is returned without the ticker level
+            return {symbols[0]: data} if symbols else {}
+        available = set(data.columns.get_level_values(0))
+        return {symbol: data[symbol] for symbol in symbols if symbol in available}
+
+    @staticmethod
+    def bar_columns(data):
+        """
+        Keeps the BAR_COLUMNS of data: the history of a ticker also has the dividends
+        and splits, a batched download may have the adjusted close. The data cached
+        for a symbol is then the same whichever call retrieved it.
+        """
+        columns = [column for column in BAR_COLUMNS if column in data.columns]
+        if len(columns) == len(data.columns):
+            return data
+        return data[columns]
+
+    @staticmethod
+    @metrics.timed("ticker_info")
     def get_ticker_info(ticker: str = "AMZN") -> dict:
         """Returns the ticker info"""
-        ticker = yf.Ticker(ticker)
-        return ticker.info
+        return YaTicker.cache.get_or_load(
+            ("info", ticker.upper()),
+            lambda: YaTicker.provider.info(ticker),
+            ttl=cache.INFO_TTL,
+        )
 
     @staticmethod
+    @metrics.timed("ticker_data")
     def get_ticker_data(
+        ticker: str = "AMZN",
+        period: str = "1440m",
+        interval: str = "1m",
+        incremental: bool = False,
+        stale_while_revalidate: bool = False,
+    ):
+        """
+        Return the ticker data.
+        :param ticker: symbol of the stock
+        :param period: time period to retrieve
+        :param interval: granularity of the data
+        :param incremental: only download the bars newer than the ones already retrieved
+        :param stale_while_revalidate: return slightly stale data (up to twice its
+            time to live) without waiting, while it is refreshed in the background
+        :return:
+        """
+        ttl = cache.data_ttl(interval)
+        stale_ttl = ttl if stale_while_revalidate else 0
+        if incremental:
+            return YaTicker.cache.get_or_load(
+                ("bars", ticker.upper(), period, interval),
+                lambda: YaTicker.update_ticker_data(ticker, period, interval),
+                ttl=ttl,
+                stale_ttl=stale_ttl,
+            )
+        return YaTicker.cache.get_or_load(
+            ("data", ticker.upper(), period, interval),
+            lambda: YaTicker.bar_columns(
+                YaTicker.provider.history(ticker, period=period, interval=interval)
+            ),
+            ttl=ttl,
+            stale_ttl=stale_ttl,
+        )
+
+    @staticmethod
+    def update_ticker_data(
         ticker: str = "AMZN", period: str = "1440m", interval: str = "1m"
     ):
-        """Return the ticker data."""
-        ticker_data = yf.Ticker(ticker)
-        data = ticker_data.history(period=period, interval=interval)
-        return data
+        """
+        Updates the ticker bars kept in the bar store, downloading the whole period
+        the first time and then only the bars since the last one.
+        """
+
+        def fetch(period=None, start=None):
+            return YaTicker.provider.history(
+                ticker, interval=interval, period=period, start=start
+            )
+
+        return YaTicker.bar_store.update(ticker, period, interval, fetch)
+
+    @staticmethod
+    def get_stored_ticker_data(
+        ticker: str = "AMZN", period: str = "1440m", interval: str = "1m"
+    ):
+        """Returns the ticker bars already retrieved (or stored on disk), without network access"""
+        return YaTicker.bar_store.known(ticker, period, interval)
+
+    @staticmethod
+    async def _run_async(function, *args, timeout: float = None, semaphore=None):
+        """
+        Runs the blocking function on YaTicker.executor
+        :param timeout: seconds before giving up, raises asyncio.TimeoutError. No limit if None
+        :param semaphore: asyncio.Semaphore bounding the number of concurrent calls
+        :return: the result of function(*args)
+        """
+        loop = asyncio.get_running_loop()
+        if semaphore is None:
+            future = loop.run_in_executor(YaTicker.executor, function, *args)
+            return await asyncio.wait_for(future, timeout)
+        async with semaphore:
+            future = loop.run_in_executor(YaTicker.executor, function, *args)
+            return await asyncio.wait_for(future, timeout)
+
+    @staticmethod
+    async def get_ticker_info_async(
+        ticker: str = "AMZN", timeout: float = 30, semaphore=None
+    ) -> dict:
+        """Async variant of get_ticker_info"""
+        return await YaTicker._run_async(
+            YaTicker.get_ticker_info, ticker, timeout=timeout, semaphore=semaphore
+        )
+
+    @staticmethod
+    async def get_ticker_data_async(
+        ticker: str = "AMZN",
+        period: str = "1440m",
+        interval: str = "1m",
+        incremental: bool = False,
+        timeout: float = 30,
+        semaphore=None,
+    ):
+        """Async variant of get_ticker_data"""
+        return await YaTicker._run_async(
+            YaTicker.get_ticker_data,
+            ticker,
+            period,
+            interval,
+            incremental,
+            timeout=timeout,
+            semaphore=semaphore,
+        )
+
+    @staticmethod
+    async def get_watchlist_data_async(
+        watchlist: list,
+        period: str = "5d",
+        interval: str = "1h",
+        incremental: bool = False,
+        concurrency: int = 8,
+        timeout: float = 30,
+    ) -> dict:
+        """
+        Fetches the data of every symbol of the watchlist concurrently
+        :param watchlist: list of symbols
+        :param period: time period to retrieve
+        :param interval: granularity of the data
+        :param incremental: only download the bars newer than the ones already retrieved
+        :param concurrency: maximum number of symbols fetched at the same time
+        :param timeout: seconds before giving up on a symbol
+        :return: dict mapping each (upper case) symbol to its data. Symbols that could
+            not be retrieved in time are left out
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        symbols = [symbol.upper() for symbol in watchlist]
+        results = await asyncio.gather(
+            *[
+                YaTicker.get_ticker_data_async(
+                    symbol,
+                    period=period,
+                    interval=interval,
+                    incremental=incremental,
+                    timeout=timeout,
+                    semaphore=semaphore,
+                )
+                for symbol in symbols
+            ],
+            return_exceptions=True,
+        )
+        watchlist_data = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logging.error(f"Problem retrieving the data for {symbol}: {result!r}")
+                continue
+            watchlist_data[symbol] = result
+        return watchlist_data
+
+    @staticmethod
+    def set_provider(provider: providers.Provider):
+        """
+        Changes where the data comes from, e.g. a ReplayProvider to work offline.
+        Drops the data retrieved from the previous provider.
+        """
+        YaTicker.provider = provider
+        YaTicker.invalidate()
+
+    @staticmethod
+    def set_history_dir(directory: str = None):
+        """
+        Persists the bars retrieved in incremental mode to directory, so that they
+        survive restarts and are served when the network is unavailable
+        :param directory: where to store the bars. Disables persistence if None
+        :return:
+        """
+        YaTicker.bar_store.history = (
+            history.HistoryStore(directory) if directory is not None else None
+        )
+
+    @staticmethod
+    def invalidate(ticker: str = None) -> int:
+        """
+        Drops cached data so that the next call hits the network again
+        :param ticker: symbol to invalidate. Invalidates everything if None
+        :return: number of cache entries removed
+        """
+        YaTicker.bar_store.clear(ticker)
+        if ticker is None:
+            removed = len(YaTicker.cache)
+            YaTicker.cache.clear()
+            return removed
+        symbol = ticker.upper()
+        return YaTicker.cache.invalidate_if(
+            lambda key: key[1] == symbol or (key[0] == "tickers" and symbol in key[1])
+        )
 
     @route("/ticker/<symbol>")
     def ticker(symbol="amzn"):
+        """
+        Returns the ticker data, see web.query_data_response for the query parameters
+        shaping the response (format, columns, since, maxpoints)
+        """
         period = request.query.get("period", default="1d")
         interval = request.query.get("interval", default="1m")
-        data = YaTicker.get_ticker_data(ticker=symbol, interval=interval, period=period)
-        data_json = data.to_json(orient="index")
-        return data_json
+        # concurrent requests share a single download, and never wait for a refresh
+        # when slightly stale data is available
+        data = YaTicker.get_ticker_data(
+            ticker=symbol,
+            interval=interval,
+            period=period,
+            stale_while_revalidate=True,
+        )
+        return web.query_data_response(data, interval)
+
+    @route("/tickers")
+    def tickers():
+        """
+        Returns the data of several symbols (symbols query parameter, comma separated),
+        fetched in a single batched request. See web.query_tickers_response
+        """
+        symbols = request.query.get("symbols", default="").replace(",", " ").split()
+        if not symbols:
+            raise HTTPError(400, "No symbols requested")
+        period = request.query.get("period", default="1d")
+        interval = request.query.get("interval", default="1m")
+        tickers_data = YaTicker.get_watchlist_data(
+            symbols, period=period, interval=interval
+        )
+        return web.query_tickers_response(tickers_data, interval)
+
+    @route("/stream")
+    def stream_bars():
+        """
+        Server-sent events stream of the bars of several symbols (symbols query parameter,
+        comma separated): a snapshot of each symbol first, then only new or updated bars
+        """
+        symbols = request.query.get("symbols", default="").replace(",", " ").split()
+        if not symbols:
+            raise HTTPError(400, "No symbols to stream")
+        period = request.query.get("period", default="1d")
+        interval = request.query.get("interval", default="1m")
+        response.content_type = "text/event-stream"
+        response.set_header("Cache-Control", "no-cache")
+        return YaTicker.feeds.events(symbols, period, interval)
+
+    @route("/metrics")
+    def metrics_route():
+        """
+        Timings of the stages, error counters and cache hit ratios, in the Prometheus
+        text format. Timings are only recorded when metrics are enabled
+        """
+        response.content_type = "text/plain; version=0.0.4; charset=utf-8"
+        return metrics.registry.prometheus()
+
+    def run(
+        self,
+        host: str = "localhost",
+        port: int = 8080,
+        server: str = "auto",
+        debug: bool = False,
+    ):
+        """
+        Serves the web app
+        :param host: interface to listen on
+        :param port: port to listen on
+        :param server: server mode, see web.server_adapter
+        :param debug: bottle debug mode
+        :return:
+        """
+        run(host=host, port=port, server=web.server_adapter(server), debug=debug)
+
+
+def _cache_hit_ratio():
+    stats = YaTicker.cache.stats
+    return metrics.hit_ratio(stats["hits"] + stats["stale_hits"], stats["misses"])
+
 
-    def run(self):
-        run(host="localhost", port=8080, debug=True)
+metrics.gauge("cache_hit_ratio", _cache_hit_ratio)
 
 
-def main():
+@click.command()
+@click.option("--host", default="localhost", help="Interface to listen on")
+@click.option("--port", default=8080, help="Port to listen on")
+@click.option(
+    "--server",
+    default="auto",
+    help="auto, threaded, or a bottle server name (wsgiref for the development server)",
+)
+@click.option("--debug", is_flag=True, help="Bottle debug mode")
+@click.option(
+    "--metrics", "timings", is_flag=True, help="Records the timings of /metrics"
+)
+def main(host, port, server, debug, timings):
+    """Web server for yaticker"""
+    metrics.registry.enable(timings)
     yaticker = YaTicker()
-    yaticker.run()
+    yaticker.run(host=host, port=port, server=server, debug=debug)
 
 
 if __name__ == "__main__":